@@ -0,0 +1,335 @@
+"""
+Bulk enrollment of users from a face gallery.
+
+Reads a manifest (CSV with a header row, or JSON Lines) whose records hold an
+email, a password and the path of a face image inside a directory, a zip
+archive or a tar archive:
+
+    python -m api.cli.enroll manifest.csv gallery.tar --report failures.jsonl
+
+Records are processed in chunks by a pool of worker processes. Each worker
+validates its images, runs face detection and one batched forward pass of
+the recognition model, and hashes the passwords. The main process then
+inserts each chunk in a single transaction.
+
+Emails already in the database are skipped, so an interrupted import is
+resumed by running the same command again. Records that fail are written to
+the report with their manifest line and the reason, and the import carries on.
+
+The API loads the face index at startup, so restart it once the import is done.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import IO, Iterable, Iterator, Optional
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, col
+from api.database import engine, create_db_and_tables
+from api.models import User, BiometricProfile
+from api.utils.deepface_utils import generate_facial_embeddings, warm_up_facial_model
+from api.utils.password_hasher import password_hasher
+from api.validators.field_validators import validate_password, validate_image_bytes
+
+email_adapter = TypeAdapter(EmailStr)
+
+@dataclass
+class EnrollmentRecord:
+    """A manifest entry, with the image bytes once they have been read."""
+    line: int
+    email: str
+    password: str
+    image: str
+    image_bytes: bytes = b""
+
+
+@dataclass
+class EnrollmentResult:
+    """Outcome of processing one record in a worker."""
+    line: int
+    email: str
+    password_hash: Optional[str] = None
+    facial_embedding: Optional[bytes] = None
+    error: Optional[str] = None
+
+
+def read_manifest(path: str) -> Iterator[EnrollmentRecord]:
+    """
+    Yield the records of a CSV or JSON Lines manifest.
+
+    Args:
+        path: Manifest path; files ending in .jsonl or .ndjson are read as JSON Lines
+
+    Yields:
+        EnrollmentRecord: One record per row, numbered by manifest line
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line, text in enumerate(file, start=1):
+                if text.strip():
+                    row = json.loads(text)
+                    yield EnrollmentRecord(line, str(row.get("email", "")), str(row.get("password", "")), str(row.get("image", "")))
+        else:
+            # Line 1 is the header
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                yield EnrollmentRecord(line, row.get("email") or "", row.get("password") or "", row.get("image") or "")
+
+
+class ImageSource:
+    """Reads gallery images from a directory, a zip archive or a tar archive."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+
+        if os.path.isdir(path):
+            return
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+        elif tarfile.is_tarfile(path):
+            self._tar = tarfile.open(path)
+        else:
+            raise ValueError(f"{path} is neither a directory nor a zip or tar archive")
+
+    def read(self, name: str) -> bytes:
+        """
+        Return the content of an image.
+
+        Raises:
+            ValueError: If the image doesn't exist in the source
+        """
+        try:
+            if self._zip is not None:
+                return self._zip.read(name)
+            if self._tar is not None:
+                member = self._tar.extractfile(name)
+                if member is None:
+                    raise KeyError(name)
+                return member.read()
+
+            # Don't follow paths out of the gallery directory
+            root = os.path.realpath(self.path)
+            full_path = os.path.realpath(os.path.join(root, name))
+            if os.path.commonpath([root, full_path]) != root:
+                raise KeyError(name)
+            with open(full_path, "rb") as file:
+                return file.read()
+        except (KeyError, OSError):
+            raise ValueError(f"Image {name!r} not found in the gallery")
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+
+
+def process_chunk(records: list[EnrollmentRecord]) -> list[EnrollmentResult]:
+    """
+    Validate, embed and hash a chunk of records. Runs in a worker process.
+
+    Every record gets a result; failures carry an error instead of raising,
+    so one bad image doesn't discard the rest of the chunk.
+    """
+    results = [EnrollmentResult(record.line, record.email) for record in records]
+    pending, images = [], []
+
+    for record, result in zip(records, results):
+        try:
+            # Stored as normalized by EmailStr, like RegisterDto does, so the login lookup finds it
+            result.email = email_adapter.validate_python(record.email)
+            validate_password(record.password)
+            images.append(validate_image_bytes(record.image_bytes))
+            pending.append((record, result))
+        except ValidationError:
+            result.error = "Invalid email address"
+        except ValueError as e:
+            result.error = str(e)
+
+    # One batched forward pass for all the valid images of the chunk
+    embeddings = generate_facial_embeddings(images) if images else []
+
+    for (record, result), embedding in zip(pending, embeddings):
+        if isinstance(embedding, ValueError):
+            result.error = str(embedding)
+        else:
+            result.facial_embedding = embedding
+            result.password_hash = password_hasher.hasher.hash(record.password)
+
+    return results
+
+
+def _normalize_email(email: str) -> str:
+    """The email as RegisterDto stores it, or as given if invalid (its worker reports it)."""
+    try:
+        return email_adapter.validate_python(email)
+    except ValidationError:
+        return email
+
+
+def _chunks(records: Iterable[EnrollmentRecord], size: int) -> Iterator[list[EnrollmentRecord]]:
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class BulkEnrollment:
+    """
+    Drives an import: reads the manifest, feeds the workers and stores the results.
+
+    Args:
+        manifest: Path of the CSV or JSON Lines manifest
+        images: Path of the gallery directory or archive
+        report: Optional JSON Lines file receiving one line per failed record
+        workers: Number of worker processes
+        chunk_size: Records per worker job and per insert transaction
+    """
+
+    def __init__(self, manifest: str, images: str, report: Optional[IO[str]], workers: int, chunk_size: int):
+        self.manifest = manifest
+        self.source = ImageSource(images)
+        self.report = report
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.enrolled = 0
+        self.skipped = 0
+        self.failed = 0
+        self._seen: set[str] = set()
+
+    def _fail(self, line: int, email: str, error: str) -> None:
+        self.failed += 1
+        if self.report is not None:
+            self.report.write(json.dumps({"line": line, "email": email, "error": error}) + "\n")
+            self.report.flush()
+
+    def _prepare(self, session: Session, chunk: list[EnrollmentRecord]) -> list[EnrollmentRecord]:
+        """Drop records already enrolled or repeated in the manifest, and read their images."""
+        emails = [_normalize_email(record.email) for record in chunk]
+        existing = set(session.exec(select(User.email).where(col(User.email).in_(set(emails)))))
+
+        prepared = []
+        for record, email in zip(chunk, emails):
+            if email in existing:
+                self.skipped += 1
+            elif email in self._seen:
+                self._fail(record.line, record.email, "Duplicate email in the manifest")
+            else:
+                self._seen.add(email)
+                try:
+                    record.image_bytes = self.source.read(record.image)
+                    prepared.append(record)
+                except ValueError as e:
+                    self._fail(record.line, record.email, str(e))
+        return prepared
+
+    def _store(self, session: Session, results: list[EnrollmentResult]) -> None:
+        """Insert the successful results of a chunk in one transaction."""
+        enrolled = []
+        for result in results:
+            if result.error is not None:
+                self._fail(result.line, result.email, result.error)
+            else:
+                enrolled.append(result)
+
+        if not enrolled:
+            return
+
+        try:
+            self._insert(session, enrolled)
+            self.enrolled += len(enrolled)
+        except IntegrityError:
+            # Someone registered one of these emails meanwhile, insert one by one to isolate it
+            session.rollback()
+            for result in enrolled:
+                try:
+                    self._insert(session, [result])
+                    self.enrolled += 1
+                except IntegrityError:
+                    session.rollback()
+                    self._fail(result.line, result.email, "Email already registered")
+
+    @staticmethod
+    def _insert(session: Session, results: list[EnrollmentResult]) -> None:
+        users = [User(email=result.email, password=result.password_hash) for result in results]
+        session.add_all(users)
+        session.flush()
+        session.add_all([
+            BiometricProfile(user_id=user.id, facial_embedding=result.facial_embedding)
+            for user, result in zip(users, results)
+        ])
+        session.commit()
+
+    def run(self) -> None:
+        """Import the whole manifest, keeping every worker busy."""
+        # Spawn instead of fork: TensorFlow state doesn't survive a fork
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up_facial_model
+        )
+        in_flight: set[Future] = set()
+
+        try:
+            with Session(engine) as session:
+                for chunk in _chunks(read_manifest(self.manifest), self.chunk_size):
+                    prepared = self._prepare(session, chunk)
+                    if prepared:
+                        in_flight.add(executor.submit(process_chunk, prepared))
+
+                    # Bound the number of chunks held in memory
+                    while len(in_flight) >= 2 * self.workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._store(session, future.result())
+
+                for future in in_flight:
+                    self._store(session, future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.source.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m api.cli.enroll", description="Enroll users in bulk from a face gallery.")
+    parser.add_argument("manifest", help="CSV (email,password,image) or JSON Lines manifest")
+    parser.add_argument("images", help="Directory, zip or tar archive holding the images")
+    parser.add_argument("--report", help="JSON Lines file receiving the failed records")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=32, help="Records per batch (default: 32)")
+    args = parser.parse_args(argv)
+
+    report = open(args.report, "a", encoding="utf-8") if args.report else None
+    try:
+        enrollment = BulkEnrollment(args.manifest, args.images, report, max(1, args.workers), max(1, args.chunk_size))
+    except ValueError as e:
+        parser.error(str(e))
+
+    create_db_and_tables()
+    started_at = time.perf_counter()
+    try:
+        enrollment.run()
+    finally:
+        if report is not None:
+            report.close()
+
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"Enrolled {enrollment.enrolled}, skipped {enrollment.skipped} already enrolled, "
+        f"failed {enrollment.failed} in {elapsed:.1f}s",
+        file=sys.stderr
+    )
+    return 1 if enrollment.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
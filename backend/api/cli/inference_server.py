@@ -0,0 +1,126 @@
+"""
+Local inference server shared by every API worker process.
+
+Loads TensorFlow and the facial models once, then serves the functions
+listed in REMOTE_FUNCTIONS to API workers running with the 'remote'
+inference executor, over an authenticated Unix socket:
+
+    INFERENCE_SERVER_AUTHKEY=... python -m api.cli.inference_server --socket /run/faceauth/inference.sock
+
+The socket is only accessible to the user running the server, and clients
+must also prove they know the authkey before anything they send is read.
+Each connection is served by its own thread, and at most --workers calls run
+the models at the same time.
+
+python -m api.cli.serve starts this server alongside the API workers.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener
+from typing import Optional
+from api.config import settings
+from api.utils.deepface_utils import warm_up_facial_model
+from api.utils.inference_pool import REMOTE_FUNCTIONS
+from api.utils.metrics import resident_memory_bytes
+
+class InferenceServer:
+    """Runs inference jobs received from remote inference pools."""
+
+    def __init__(self, address: str, authkey: bytes, max_workers: int):
+        self.address = address
+        self.authkey = authkey
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._listener: Optional[Listener] = None
+
+    def bind(self) -> None:
+        """Create the listening socket."""
+        # A socket left behind by a previous run would make binding fail
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+        # Create the socket owner-only from the start, so no one else can connect
+        previous_umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(previous_umask)
+
+    def serve_forever(self) -> None:
+        """Accept connections until interrupted, serving each from its own thread."""
+        if self._listener is None:
+            self.bind()
+
+        with self._listener:
+            while True:
+                try:
+                    connection = self._listener.accept()
+                except (AuthenticationError, EOFError, OSError):
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+    def _serve_connection(self, connection: Connection) -> None:
+        with connection:
+            while True:
+                try:
+                    name, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    fn = REMOTE_FUNCTIONS.get(name)
+                    if fn is None:
+                        raise TypeError(f"{name} can't run on the inference server")
+                    with self._slots:
+                        reply = (True, fn(*args))
+                except Exception as e:
+                    reply = (False, e)
+
+                try:
+                    connection.send(reply)
+                except (EOFError, OSError):
+                    return
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m api.cli.inference_server", description="Serve facial inference to API workers.")
+    parser.add_argument("--socket", default=settings.inference_server_socket, help="Unix socket path (default: INFERENCE_SERVER_SOCKET)")
+    parser.add_argument("--workers", type=int, default=settings.inference_max_workers, help="Concurrent model calls (default: INFERENCE_MAX_WORKERS)")
+    args = parser.parse_args(argv)
+
+    if not settings.inference_server_authkey:
+        parser.error("INFERENCE_SERVER_AUTHKEY must be set")
+
+    # Load the models before accepting connections
+    started_at = time.perf_counter()
+    warm_up_facial_model()
+
+    server = InferenceServer(args.socket, settings.inference_server_authkey.encode(), max(1, args.workers))
+    server.bind()
+
+    rss = resident_memory_bytes()
+    print(
+        f"Inference server {os.getpid()} ready on {args.socket} in {time.perf_counter() - started_at:.1f}s"
+        + (f", RSS {rss / 2**20:.0f} MB" if rss is not None else ""),
+        file=sys.stderr,
+        flush=True
+    )
+
+    # Stopped by the launcher with SIGTERM, exit through the cleanup below
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Build the FAR/FRR operating-point table used to pick the verification threshold.
+
+Reads facial embeddings of a labeled local test set (an .npy matrix with one
+float32 embedding per row and an .npy vector with the identity of each row),
+compares every pair of embeddings and writes, for each threshold, the false
+acceptance rate (impostor pairs within the threshold) and the false
+rejection rate (genuine pairs beyond it):
+
+    python -m api.cli.operating_points embeddings.npy labels.npy operating_points.json
+
+Point FACE_VERIFICATION_OPERATING_POINTS_PATH at the output and set
+FACE_VERIFICATION_TARGET_FAR to apply it.
+"""
+import argparse
+import json
+import sys
+from dataclasses import asdict
+from typing import Optional
+import numpy as np
+from api.utils.verification_threshold import OperatingPoint
+
+def compute_operating_points(
+    embeddings: np.ndarray,
+    labels: np.ndarray,
+    thresholds: np.ndarray,
+    chunk_size: int = 1024
+) -> list[OperatingPoint]:
+    """
+    Measure FAR and FRR at each threshold over every pair of embeddings.
+
+    Args:
+        embeddings: Matrix of embeddings, one per row
+        labels: Identity of each embedding
+        thresholds: Increasing cosine distance thresholds to evaluate
+        chunk_size: Rows compared at once, bounds the memory used
+
+    Returns:
+        list[OperatingPoint]: One point per threshold
+    """
+    vectors = embeddings.astype(np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), np.finfo(np.float32).eps)
+
+    # Count pairs by the first threshold accepting them, the last slot holds pairs no threshold accepts
+    genuine = np.zeros(len(thresholds) + 1, dtype=np.int64)
+    impostor = np.zeros(len(thresholds) + 1, dtype=np.int64)
+
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        distances = 1 - chunk @ vectors[start:].T
+        same = labels[start:start + chunk_size, None] == labels[None, start:]
+
+        # Only keep each pair once, above the diagonal
+        upper = np.arange(distances.shape[1])[None, :] > np.arange(len(chunk))[:, None]
+        slots = np.searchsorted(thresholds, distances)
+        genuine += np.bincount(slots[same & upper], minlength=len(genuine))
+        impostor += np.bincount(slots[~same & upper], minlength=len(impostor))
+
+    accepted_genuine = np.cumsum(genuine)[:-1]
+    accepted_impostor = np.cumsum(impostor)[:-1]
+    total_genuine, total_impostor = max(genuine.sum(), 1), max(impostor.sum(), 1)
+
+    return [
+        OperatingPoint(
+            threshold=float(threshold),
+            far=float(accepted_impostor[i] / total_impostor),
+            frr=float(1 - accepted_genuine[i] / total_genuine)
+        )
+        for i, threshold in enumerate(thresholds)
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m api.cli.operating_points", description="Build the FAR/FRR operating-point table.")
+    parser.add_argument("embeddings", help=".npy matrix of float32 embeddings, one per row")
+    parser.add_argument("labels", help=".npy vector with the identity of each embedding")
+    parser.add_argument("output", help="JSON file receiving the operating points")
+    parser.add_argument("--step", type=float, default=0.01, help="Threshold step (default: 0.01)")
+    parser.add_argument("--max-threshold", type=float, default=1.0, help="Largest threshold (default: 1.0)")
+    args = parser.parse_args(argv)
+
+    embeddings, labels = np.load(args.embeddings), np.load(args.labels)
+    if len(embeddings) != len(labels):
+        parser.error("embeddings and labels must have the same length")
+
+    thresholds = np.round(np.arange(args.step, args.max_threshold + args.step / 2, args.step), 6)
+    points = compute_operating_points(embeddings, labels, thresholds)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump([asdict(point) for point in points], file, indent=2)
+
+    # Summary of a few common FAR targets
+    for target in (1e-2, 1e-3, 1e-4):
+        accepted = [point for point in points if point.far <= target]
+        if accepted:
+            point = accepted[-1]
+            print(f"FAR <= {target:g}: threshold {point.threshold:.2f}, FRR {point.frr:.4f}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Multi-worker launcher sharing one copy of the facial models.
+
+Starts the inference server, which alone loads TensorFlow and the model
+weights, waits until it is ready, then runs uvicorn with several API workers
+using the 'remote' inference executor:
+
+    python -m api.cli.serve --workers 4 --host 0.0.0.0 --port 8000
+
+Preloading the model in a parent process and forking the workers isn't an
+option: TensorFlow's runtime doesn't survive a fork. With a shared inference
+server, each API worker only holds the web stack, and adding workers scales
+the request handling without multiplying the model's memory.
+
+Each worker and the inference server log their resident memory once ready.
+An authkey for the inference socket is generated unless
+INFERENCE_SERVER_AUTHKEY is set.
+
+Each worker keeps its own face index for face-only login. Set
+FACE_INDEX_SNAPSHOT_PATH so that the workers share the embedding snapshot
+and pick up the faces registered through the others; without it, a worker
+only identifies users registered through itself until the server restarts.
+"""
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import time
+from typing import Optional
+import uvicorn
+
+def wait_for_socket(server: subprocess.Popen, path: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if server.poll() is not None:
+            raise RuntimeError(f"Inference server exited with code {server.returncode}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Inference server not ready after {timeout:.0f}s")
+        time.sleep(0.2)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m api.cli.serve", description="Run the API with several workers sharing one inference server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="API worker processes (default: CPU count)")
+    parser.add_argument("--inference-workers", type=int, help="Concurrent model calls (default: INFERENCE_MAX_WORKERS)")
+    parser.add_argument("--socket", help="Inference server socket (default: INFERENCE_SERVER_SOCKET)")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the models to load")
+    args = parser.parse_args(argv)
+
+    # Settings are read from the environment by the server and by every worker
+    os.environ["INFERENCE_EXECUTOR"] = "remote"
+    os.environ.setdefault("INFERENCE_SERVER_AUTHKEY", secrets.token_hex(32))
+    if args.socket:
+        os.environ["INFERENCE_SERVER_SOCKET"] = args.socket
+
+    from api.config import settings
+    from api.database import create_db_and_tables
+
+    # Once here, as workers starting together on a fresh database would race to create the tables
+    create_db_and_tables()
+
+    if args.workers > 1 and not settings.face_index_snapshot_path:
+        print(
+            "FACE_INDEX_SNAPSHOT_PATH is not set: face-only login on each worker only finds users registered through it until restart",
+            file=sys.stderr
+        )
+    if args.workers > 1 and settings.refresh_token_rotation and not settings.refresh_token_store_path:
+        print(
+            "REFRESH_TOKEN_STORE_PATH is not set: each worker only detects the reuse of refresh tokens it rotated itself",
+            file=sys.stderr
+        )
+
+    command = [sys.executable, "-m", "api.cli.inference_server"]
+    if args.inference_workers:
+        command += ["--workers", str(args.inference_workers)]
+
+    # The server replaces a stale socket, wait for the one it creates
+    if os.path.exists(settings.inference_server_socket):
+        os.unlink(settings.inference_server_socket)
+
+    server = subprocess.Popen(command)
+    try:
+        wait_for_socket(server, settings.inference_server_socket, args.startup_timeout)
+        uvicorn.run("api.main:app", host=args.host, port=args.port, workers=max(1, args.workers))
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        server.terminate()
+        server.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
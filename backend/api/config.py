@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, Sequence
+from typing import Optional, Sequence, Union
 from datetime import timedelta
 from authx.types import AlgorithmType
 from typing import Literal
@@ -7,14 +7,35 @@ from typing import Literal
 class Settings(BaseSettings):
     """Application settings with environment variable support."""
     
-    # JWT Configuration
+    # JWT Configuration (asymmetric algorithms sign with the PEM private key, the public key is derived from it if not given)
     jwt_secret_key: str = "your-secret-key-change-in-production"
-    jwt_algorithm: AlgorithmType = "HS256"
+    jwt_algorithm: Union[AlgorithmType, Literal['EdDSA']] = "HS256"
+    jwt_private_key_file: Optional[str] = None
+    jwt_public_key_file: Optional[str] = None
     jwt_access_token_expires: timedelta = timedelta(minutes=15)  
     jwt_refresh_token_expires: timedelta = timedelta(minutes=30)
     
+    # Refresh Token Rotation Configuration (several workers need the SQLite store to detect reuse across workers)
+    refresh_token_rotation: bool = True
+    refresh_token_store_path: Optional[str] = None
+    refresh_token_store_bucket_seconds: int = 60
+
+    # Batch Verification Configuration (kiosks and services send one of these keys in X-API-Key for detailed results and tokens)
+    batch_verification_api_keys: Sequence[str] = []
+
     # Database Configuration
     database_url: Optional[str] = None
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_pre_ping: bool = True
+    database_echo: bool = False
+
+    # SQLite Configuration (only applied when the database is SQLite)
+    sqlite_journal_mode: Literal['WAL', 'DELETE', 'TRUNCATE', 'MEMORY'] = 'WAL'
+    sqlite_synchronous: Literal['OFF', 'NORMAL', 'FULL'] = 'NORMAL'
+    sqlite_mmap_size: int = 268435456  # 256 MB
+    sqlite_cache_size: int = -65536  # Negative values are in KiB (64 MB)
+    sqlite_busy_timeout_ms: int = 5000
     
     # CORS Configuration
     cors_origins: Sequence[str] = ["http://localhost:3000", "https://localhost:3001"]
@@ -27,6 +48,65 @@ class Settings(BaseSettings):
     cookie_secure: bool = True
     cookie_samesite: Literal['lax', 'strict', 'none'] = 'strict'
     cookie_path: str = '/'
+
+    # Password Hashing Configuration (caps concurrent Argon2 calls at budget / memory_cost)
+    password_hashing_memory_budget_mb: int = 512
+
+    # Inference Configuration
+    inference_executor: Literal['thread', 'process', 'remote'] = 'thread'
+    inference_max_workers: int = 2
+    inference_max_queue_size: int = 16
+    inference_retry_after_seconds: int = 5
+    inference_warm_up: bool = True
+    embedding_batch_window_ms: float = 10
+    embedding_batch_max_size: int = 8
+
+    # Inference Server Configuration (used by the 'remote' executor, shared by every API worker)
+    inference_server_socket: str = "/tmp/faceauth-inference.sock"
+    inference_server_authkey: Optional[str] = None
+
+    # Face Detection Configuration (images are downscaled to max_side for detection, 0 disables it)
+    face_detector_backend: Literal[
+        'opencv', 'ssd', 'dlib', 'mtcnn', 'retinaface', 'mediapipe', 'yolov8', 'yunet', 'centerface', 'skip'
+    ] = 'opencv'
+    face_detector_align: bool = True
+    face_detection_max_side: int = 640
+    face_detection_crop_margin: float = 0.25
+
+    # Embedding Cache Configuration (disable to never keep biometric data in memory)
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_mb: float = 16
+    embedding_cache_ttl_seconds: float = 60
+
+    # User Cache Configuration (profiles served by /auth/me without a database query)
+    user_cache_enabled: bool = True
+    user_cache_max_entries: int = 10000
+    user_cache_ttl_seconds: float = 30
+
+    # Embedding Storage Configuration (float16 halves and int8 quarters the size of stored embeddings)
+    embedding_storage_dtype: Literal['float32', 'float16', 'int8'] = 'float32'
+
+    # Face Verification Configuration (threshold override, or the operating point meeting a target FAR)
+    face_verification_threshold: Optional[float] = None
+    face_verification_operating_points_path: Optional[str] = None
+    face_verification_target_far: Optional[float] = None
+
+    # Face Enrollment Configuration (several frames are stored as their centroid, or as templates compared by min or mean distance)
+    face_enrollment_aggregation: Literal['centroid', 'templates'] = 'centroid'
+    face_enrollment_max_templates: int = 5
+    face_verification_template_reduction: Literal['min', 'mean'] = 'min'
+
+    # Face Identification Configuration (a match must beat the runner-up by min_margin, and the runner-up must be over the threshold)
+    face_identification_min_margin: float = 0.05
+    face_index_backend: Literal['exact', 'ivf'] = 'exact'
+    face_index_ivf_lists: int = 1024
+    face_index_ivf_probes: int = 16
+    face_index_path: Optional[str] = None
+    face_index_dtype: Literal['float32', 'float16', 'int8'] = 'float32'
+    face_index_snapshot_path: Optional[str] = None
+
+    # Metrics Configuration (Prometheus text format on /metrics, keep it off public networks)
+    metrics_enabled: bool = True
     
     class Config:
         env_file = ".env"
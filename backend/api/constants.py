@@ -12,5 +12,23 @@ MIN_IMAGE_RESOLUTION = (100, 100)
 # Maximum image resolution for facial recognition (width x height)
 MAX_IMAGE_RESOLUTION = (4096, 4096)
 
+# Maximum number of pixels an image may decode to, guards against decompression bombs
+MAX_IMAGE_PIXELS = MAX_IMAGE_RESOLUTION[0] * MAX_IMAGE_RESOLUTION[1]
+
+# Maximum request body size in bytes: one image plus room for the other form fields
+MAX_REQUEST_BODY_SIZE = MAX_IMAGE_SIZE_MB * 1024 * 1024 + 64 * 1024
+
+# Maximum number of frames a user can enroll with at once
+MAX_ENROLLMENT_FRAMES = 5
+
+# Maximum registration request body size in bytes: one image per frame plus the other form fields
+MAX_ENROLLMENT_REQUEST_BODY_SIZE = MAX_ENROLLMENT_FRAMES * MAX_IMAGE_SIZE_MB * 1024 * 1024 + 64 * 1024
+
+# Maximum number of (subject, image) pairs in one batch verification request
+MAX_BATCH_VERIFICATION_ITEMS = 16
+
+# Maximum batch verification request body size in bytes: one image per item plus the other form fields
+MAX_BATCH_REQUEST_BODY_SIZE = MAX_BATCH_VERIFICATION_ITEMS * MAX_IMAGE_SIZE_MB * 1024 * 1024 + 64 * 1024
+
 # Default model name for facial embeddings
 DEFAULT_MODEL_NAME = "Facenet512"
\ No newline at end of file
@@ -1,15 +1,115 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from api import models # Side-effect import to ensure models are registered
+from api.config import settings
+from api.utils.metrics import observe_stage
 
-# Database URL - using SQLite for simplicity
-DATABASE_URL = "sqlite:///biometrics_auth.db"
+# Database URL - defaults to a local SQLite file for simplicity
+DATABASE_URL = settings.database_url or "sqlite:///biometrics_auth.db"
 
-# Create engine
+# Whether the configured database is SQLite, which needs extra tuning
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+# Async drivers used for each supported database backend, each one a dependency in requirements.txt
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite"
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Swap the driver of a database URL for its asyncio counterpart.
+
+    Args:
+        database_url: Synchronous database URL, e.g. sqlite:///app.db
+
+    Returns:
+        str: The same URL using the async driver, e.g. sqlite+aiosqlite:///app.db
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend for async access: {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def _is_in_memory_sqlite(database_url: str) -> bool:
+    """Whether a URL names an in-memory SQLite database, which SQLAlchemy serves from a StaticPool."""
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+def _pool_options(database_url: str) -> dict:
+    """Return the pool sizing settings, unless the database uses a pool that doesn't accept them."""
+    if _is_in_memory_sqlite(database_url):
+        return {}
+    return {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow
+    }
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection for concurrent use.
+
+    WAL lets readers run alongside a writer, and busy_timeout makes a second
+    writer wait for the lock instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+    cursor.execute(f"PRAGMA cache_size={settings.sqlite_cache_size}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.close()
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+def _observe_query(conn, cursor, statement, parameters, context, executemany):
+    observe_stage("db_query", time.perf_counter() - context._query_started_at)
+
+def _observe_failed_query(exception_context):
+    context = exception_context.execution_context
+    if context is not None and hasattr(context, "_query_started_at"):
+        observe_stage("db_query", time.perf_counter() - context._query_started_at, "error")
+
+def _tune_engine(engine: Engine) -> None:
+    """Register the connection hooks required by the configured database."""
+    if IS_SQLITE:
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+def _instrument_engine(engine: Engine) -> None:
+    """
+    Record the duration of every query as the "db_query" pipeline stage.
+
+    The hooks run in the caller's context, so queries made while serving a
+    request are attributed to its endpoint.
+    """
+    event.listen(engine, "before_cursor_execute", _start_query_timer)
+    event.listen(engine, "after_cursor_execute", _observe_query)
+    event.listen(engine, "handle_error", _observe_failed_query)
+
+# Create engine, used for schema creation and startup jobs
 engine = create_engine(
     DATABASE_URL, 
-    echo=True,  # Set to False in production
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    echo=settings.database_echo,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {}  # Needed for SQLite
 )
+_tune_engine(engine)
+
+# Create async engine, used by request handlers so queries don't block the event loop
+async_engine = create_async_engine(
+    get_async_database_url(DATABASE_URL),
+    echo=settings.database_echo,
+    pool_pre_ping=settings.database_pool_pre_ping,
+    **_pool_options(DATABASE_URL)
+)
+_tune_engine(async_engine.sync_engine)
+_instrument_engine(async_engine.sync_engine)
 
 def create_db_and_tables():
     """Create database tables based on SQLModel definitions."""
@@ -18,4 +118,13 @@ def create_db_and_tables():
 def get_session():
     """Get a database session."""
     with Session(engine) as session:
-        yield session 
\ No newline at end of file
+        yield session
+
+async def get_async_session():
+    """Get an async database session."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+async def dispose_async_engine():
+    """Close every pooled async connection."""
+    await async_engine.dispose()
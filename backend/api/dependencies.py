@@ -1,23 +1,29 @@
-from typing import Annotated
-from fastapi import Depends
-from sqlmodel import Session
-from api.database import get_session
+import secrets
+from typing import Annotated, Optional
+from fastapi import Depends, Security
+from fastapi.security import APIKeyHeader
+from sqlmodel.ext.asyncio.session import AsyncSession
+from api.database import get_async_session
 from api.services import AuthService
 from authx import AuthX, AuthXConfig
 from api.config import settings
+from api.errors import UnauthorizedError
+from api.utils.token_service import token_service
 
 # Database session dependency that can be used across all routers
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 # AuthX Configuration - Global singleton
 authx_config = AuthXConfig(
-    JWT_ALGORITHM=settings.jwt_algorithm,
     JWT_SECRET_KEY=settings.jwt_secret_key,
     JWT_TOKEN_LOCATION=["headers", "cookies"],
     JWT_ACCESS_TOKEN_EXPIRES=settings.jwt_access_token_expires,
     JWT_REFRESH_TOKEN_EXPIRES=settings.jwt_refresh_token_expires,
 )
 
+# Verify with the algorithm and key prepared by the token service
+token_service.configure(authx_config)
+
 # Global AuthX instance
 authx = AuthX(config=authx_config)
 
@@ -26,4 +32,24 @@ AuthXDep = Annotated[AuthX, Depends(lambda: authx)]
 def create_auth_service(session: SessionDep, authx: AuthXDep) -> AuthService:
     return AuthService(session, authx)
 
-AuthServiceDep = Annotated[AuthService, Depends(create_auth_service)]
\ No newline at end of file
+AuthServiceDep = Annotated[AuthService, Depends(create_auth_service)]
+
+# Service API key sent by kiosks and other trusted callers
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+def is_trusted_service(api_key: Optional[str] = Security(api_key_header)) -> bool:
+    """
+    Whether the caller presented one of the configured service API keys.
+
+    Raises:
+        UnauthorizedError: If a key is presented but isn't one of them
+    """
+    if api_key is None:
+        return False
+    # Compare with every key, so the time taken doesn't tell which one is closest
+    matches = [secrets.compare_digest(api_key.encode(), key.encode()) for key in settings.batch_verification_api_keys]
+    if not any(matches):
+        raise UnauthorizedError("Invalid API key")
+    return True
+
+TrustedServiceDep = Annotated[bool, Depends(is_trusted_service)]
\ No newline at end of file
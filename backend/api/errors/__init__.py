@@ -3,7 +3,9 @@ from .http_exceptions import (
     UnauthorizedError,
     ForbiddenError,
     NotFoundError,
-    InternalServerError
+    PayloadTooLargeError,
+    InternalServerError,
+    ServiceUnavailableError
 )
 
 __all__ = [
@@ -11,5 +13,7 @@ __all__ = [
     "UnauthorizedError", 
     "ForbiddenError",
     "NotFoundError",
-    "InternalServerError"
+    "PayloadTooLargeError",
+    "InternalServerError",
+    "ServiceUnavailableError"
 ]
@@ -21,7 +21,11 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         status_code=422,
         content=ValidationError(
             message="Please check your input and try again. Some fields may be missing or contain invalid data.",
-            details=exc.errors()
+            # Blank the raw input (uploads, passwords) and drop the exception objects in ctx
+            details=[
+                {**{key: value for key, value in error.items() if key != "ctx"}, "input": None}
+                for error in exc.errors()
+            ]
         ).model_dump()
     )
 
@@ -32,5 +36,6 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         status_code=exc.status_code,
         content=HttpError(
             message=exc.detail if isinstance(exc.detail, str) else str(exc.detail)
-        ).model_dump()
+        ).model_dump(),
+        headers=exc.headers
     ) 
\ No newline at end of file
@@ -25,7 +25,20 @@ class NotFoundError(HTTPException):
         super().__init__(status_code=404, detail=detail)
 
 
+class PayloadTooLargeError(HTTPException):
+    """HTTP 413 Payload Too Large error."""
+    def __init__(self, detail: str = "Payload Too Large"):
+        super().__init__(status_code=413, detail=detail)
+
+
 class InternalServerError(HTTPException):
     """HTTP 500 Internal Server Error."""
     def __init__(self, detail: str = "Internal Server Error"):
-        super().__init__(status_code=500, detail=detail) 
\ No newline at end of file
+        super().__init__(status_code=500, detail=detail)
+
+
+class ServiceUnavailableError(HTTPException):
+    """HTTP 503 Service Unavailable error."""
+    def __init__(self, detail: str = "Service Unavailable", retry_after: int | None = None):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        super().__init__(status_code=503, detail=detail, headers=headers)
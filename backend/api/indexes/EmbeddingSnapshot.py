@@ -0,0 +1,310 @@
+import fcntl
+import os
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+import numpy as np
+from api.constants import DEFAULT_MODEL_NAME
+from api.utils.embedding_codec import EmbeddingCodec, EmbeddingDType
+
+@dataclass(frozen=True)
+class SnapshotPosition:
+    """
+    End of the records read from a snapshot file, to read what is appended after it.
+
+    The file is kept open, so a file replacing it can't be given its inode.
+    """
+
+    file: BinaryIO
+    offset: int
+
+
+@dataclass(frozen=True)
+class SnapshotContent:
+    """Latest row of every user found in a snapshot file."""
+
+    user_ids: np.ndarray
+    sequences: np.ndarray
+    rows: np.ndarray
+    scales: np.ndarray
+    # Highest sequence number written to the file, including replaced and removed rows
+    sequence: int
+    # Records superseded by a later one for the same user
+    dead_records: int
+    # Where the records read end, when read to follow the file
+    position: Optional[SnapshotPosition] = None
+
+
+class EmbeddingSnapshot:
+    """
+    Append-only file of face index rows, memory-mapped to fill the index at startup.
+
+    Rebuilding the index from the database means reading every biometric
+    profile and decoding, normalizing and quantizing its embedding. The
+    snapshot keeps the rows exactly as the index stores them, so the index
+    can be filled from a memory map instead.
+
+    The file is a fixed header followed by fixed-size records:
+
+        header  <4sBBH32s> magic b"FSNP", version, dtype code, dimension,
+                           model name, padded to HEADER_SIZE bytes
+        record  sequence int64, user_id int64, scale float32, flags uint32,
+                vector (dimension values of the dtype)
+
+    The sequence of a record is the ID of the biometric profile it was read
+    from. Profile IDs are never reused (the table is AUTOINCREMENT), so the
+    highest sequence in the file tells which profiles were inserted after the
+    snapshot was last written. Records are only ever appended: a user's latest
+    record wins, and a record flagged REMOVED drops the user. compact()
+    rewrites the file without superseded records.
+
+    Appends and rewrites take an exclusive flock on the file, so several
+    processes can share one snapshot, and read_since() lets each of them
+    follow the rows the others append. The file operations block, call them
+    from a worker thread while serving requests.
+    """
+
+    MAGIC = b"FSNP"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBBH32s")
+    HEADER_SIZE = 64
+
+    # Record flags
+    ADDED = 0
+    REMOVED = 1
+
+    def __init__(
+        self,
+        path: str,
+        dimension: int = 512,
+        dtype: EmbeddingDType = 'float32',
+        model_name: str = DEFAULT_MODEL_NAME
+    ):
+        self.path = path
+        self.dimension = dimension
+        self.dtype = dtype
+        self.model_name = model_name
+        self.record_dtype = np.dtype([
+            ("sequence", "<i8"),
+            ("user_id", "<i8"),
+            ("scale", "<f4"),
+            ("flags", "<u4"),
+            ("vector", np.dtype(dtype).newbyteorder("<"), (dimension,))
+        ])
+
+    def _header(self) -> bytes:
+        header = self.HEADER.pack(
+            self.MAGIC,
+            self.VERSION,
+            EmbeddingCodec.DTYPES[self.dtype],
+            self.dimension,
+            self.model_name.encode()
+        )
+        return header.ljust(self.HEADER_SIZE, b"\0")
+
+    def _records(
+        self,
+        sequences: np.ndarray,
+        user_ids: np.ndarray,
+        rows: np.ndarray,
+        scales: np.ndarray,
+        flags: int = ADDED
+    ) -> np.ndarray:
+        records = np.zeros(len(user_ids), dtype=self.record_dtype)
+        records["sequence"] = sequences
+        records["user_id"] = user_ids
+        records["scale"] = scales
+        records["flags"] = flags
+        records["vector"] = rows
+        return records
+
+    def read(self, follow: bool = False) -> SnapshotContent:
+        """
+        Memory-map the file and find the latest row of every user.
+
+        When no record was superseded, the rows returned are a read-only view
+        of the memory map; otherwise the live rows are copied out of it.
+
+        Args:
+            follow: Also return the position the records read end at, for
+                read_since(); its file is left open until closed by the caller
+
+        Raises:
+            OSError: If the file is missing or unreadable
+            ValueError: If the file isn't a snapshot, or was written for another
+                model, dtype or dimension
+        """
+        file = open(self.path, "rb")
+        try:
+            header = file.read(self.HEADER_SIZE)
+            size = os.fstat(file.fileno()).st_size
+
+            if header != self._header():
+                if len(header) < self.HEADER.size or not header.startswith(self.MAGIC):
+                    raise ValueError(f"{self.path} is not an embedding snapshot")
+                raise ValueError(f"{self.path} was written for another model, dtype or dimension")
+
+            # A record cut short by a crash while appending is ignored
+            count = (size - self.HEADER_SIZE) // self.record_dtype.itemsize
+            if count == 0:
+                records = np.zeros(0, dtype=self.record_dtype)
+            else:
+                records = np.memmap(file, dtype=self.record_dtype, mode="r", offset=self.HEADER_SIZE, shape=(count,))
+        except BaseException:
+            file.close()
+            raise
+
+        position = None
+        if follow:
+            position = SnapshotPosition(file, self.HEADER_SIZE + count * self.record_dtype.itemsize)
+        else:
+            file.close()
+
+        # Latest record of each user, in file order
+        _, last_from_end = np.unique(records["user_id"][::-1], return_index=True)
+        latest = np.sort(count - 1 - last_from_end)
+        live = latest[records["flags"][latest] == self.ADDED]
+
+        if len(live) == count:
+            selected = records
+        else:
+            selected = records[live]
+
+        return SnapshotContent(
+            user_ids=selected["user_id"],
+            sequences=selected["sequence"],
+            rows=selected["vector"],
+            scales=selected["scale"],
+            sequence=int(records["sequence"].max()) if count else 0,
+            dead_records=count - len(live),
+            position=position
+        )
+
+    def read_since(self, position: SnapshotPosition) -> Optional[tuple[np.ndarray, SnapshotPosition]]:
+        """
+        Read the records appended after a position, in file order.
+
+        A shared lock keeps out a record being appended; when nothing was
+        appended, only the file is stat-ed.
+
+        Args:
+            position: Where the records already read end, from read(follow=True)
+                or an earlier call
+
+        Returns:
+            Optional[tuple[np.ndarray, SnapshotPosition]]: (records, position)
+            up to the last whole record, or None if the file was replaced
+            since, in which case it has to be read() again
+
+        Raises:
+            OSError: If the file is missing or unreadable
+        """
+        fd = position.file.fileno()
+        if os.stat(self.path).st_ino != os.fstat(fd).st_ino:
+            return None
+
+        itemsize = self.record_dtype.itemsize
+        if os.fstat(fd).st_size < position.offset + itemsize:
+            return np.zeros(0, dtype=self.record_dtype), position
+
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            count = max(0, os.fstat(fd).st_size - position.offset) // itemsize
+            data = os.pread(fd, count * itemsize, position.offset)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+        count = len(data) // itemsize
+        records = np.frombuffer(data, dtype=self.record_dtype, count=count)
+        return records, SnapshotPosition(position.file, position.offset + count * itemsize)
+
+    @contextmanager
+    def _locked(self) -> Iterator[int]:
+        """Open the file with an exclusive lock, creating it if needed, and yield its descriptor."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+                # Another process may have replaced the file while waiting for the lock
+                try:
+                    replaced = os.stat(self.path).st_ino != os.fstat(fd).st_ino
+                except FileNotFoundError:
+                    replaced = True
+                if not replaced:
+                    yield fd
+                    return
+            finally:
+                os.close(fd)
+
+    def _append(self, records: np.ndarray) -> None:
+        with self._locked() as fd:
+            size = os.fstat(fd).st_size
+
+            # Drop a header or record cut short by a crash, so appends stay aligned
+            if size < self.HEADER_SIZE:
+                os.ftruncate(fd, 0)
+                data = self._header() + records.tobytes()
+            else:
+                torn = (size - self.HEADER_SIZE) % self.record_dtype.itemsize
+                if torn:
+                    os.ftruncate(fd, size - torn)
+                data = records.tobytes()
+
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+
+    def append(self, sequences: np.ndarray, user_ids: np.ndarray, rows: np.ndarray, scales: np.ndarray) -> None:
+        """
+        Append rows, creating the file if needed.
+
+        Args:
+            sequences: ID of the biometric profile each row was read from
+            user_ids: The user ID of each row
+            rows: L2-normalized vectors in the snapshot dtype
+            scales: The scale of each row
+        """
+        if len(user_ids):
+            self._append(self._records(sequences, user_ids, rows, scales))
+
+    def append_removals(self, user_ids: np.ndarray, sequence: int = 0) -> None:
+        """Append records removing users from the snapshot."""
+        if len(user_ids):
+            rows = np.zeros((len(user_ids), self.dimension), dtype=self.dtype)
+            self._append(self._records(sequence, user_ids, rows, 1.0, flags=self.REMOVED))
+
+    def _replace(self, sequences: np.ndarray, user_ids: np.ndarray, rows: np.ndarray, scales: np.ndarray) -> None:
+        """Write the rows under a temporary name and rename it over the file. Called with the lock held."""
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        records = self._records(sequences, user_ids, rows, scales)
+        with open(temporary_path, "wb") as file:
+            os.chmod(temporary_path, 0o600)
+            file.write(self._header())
+            file.write(records.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_path, self.path)
+
+    def write(self, sequences: np.ndarray, user_ids: np.ndarray, rows: np.ndarray, scales: np.ndarray) -> None:
+        """
+        Replace the file with the given rows.
+
+        The new file is written under a temporary name and then renamed, so a
+        snapshot currently memory-mapped stays valid. The lock on the old file
+        is held meanwhile, and appends waiting for it go to the new file.
+        """
+        with self._locked():
+            self._replace(sequences, user_ids, rows, scales)
+
+    def compact(self) -> None:
+        """Rewrite the file keeping only the latest row of every user."""
+        with self._locked():
+            content = self.read()
+            self._replace(content.sequences, content.user_ids, content.rows, content.scales)
@@ -0,0 +1,127 @@
+import threading
+from typing import Iterable
+import numpy as np
+from api.utils.embedding_codec import EmbeddingDType
+from .FaceIndex import FaceIndex
+
+class ExactFaceIndex(FaceIndex):
+    """
+    Exact in-memory 1:N identification index over the enrolled facial embeddings.
+
+    Embeddings are L2-normalized once on insert and kept in a contiguous
+    matrix, so a search is a single matrix-vector product followed by a
+    partial sort for the top candidates.
+
+    The scan runs without the lock: a search only takes references to the
+    buffers and the row count under it. Inserting a new user writes past the
+    rows a search can see, or into new buffers when they grow, but replacing
+    or removing a user rewrites rows in place, so those bump a version and a
+    search that overlapped one scans again.
+    """
+
+    def __init__(self, dimension: int = 512, dtype: EmbeddingDType = 'float32', initial_capacity: int = 1024):
+        super().__init__(dimension, dtype)
+        self._matrix = np.empty((initial_capacity, dimension), dtype=dtype)
+        self._scales = np.empty(initial_capacity, dtype=np.float32)
+        self._user_ids = np.empty(initial_capacity, dtype=np.int64)
+        self._rows: dict[int, int] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._matrix)
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+
+        matrix = np.empty((capacity, self.dimension), dtype=self.dtype)
+        scales = np.empty(capacity, dtype=np.float32)
+        user_ids = np.empty(capacity, dtype=np.int64)
+        count = len(self._rows)
+        matrix[:count] = self._matrix[:count]
+        scales[:count] = self._scales[:count]
+        user_ids[:count] = self._user_ids[:count]
+        self._matrix, self._scales, self._user_ids = matrix, scales, user_ids
+
+    def load(self, profiles: Iterable[tuple[int, bytes]]) -> None:
+        user_ids, matrix, scales, count = self._read_profiles(profiles)
+
+        # Keep the spare rows of the buffers for later inserts
+        with self._lock:
+            self._matrix, self._scales, self._user_ids = matrix, scales, user_ids
+            self._rows = {user_id: row for row, user_id in enumerate(user_ids[:count].tolist())}
+            self._version += 1
+
+    def load_rows(self, user_ids: np.ndarray, rows: np.ndarray, scales: np.ndarray) -> None:
+        count = len(user_ids)
+        capacity = max(count, 1024)
+        matrix = np.empty((capacity, self.dimension), dtype=self.dtype)
+        matrix_scales = np.empty(capacity, dtype=np.float32)
+        matrix_user_ids = np.empty(capacity, dtype=np.int64)
+        matrix[:count] = rows
+        matrix_scales[:count] = scales
+        matrix_user_ids[:count] = user_ids
+
+        with self._lock:
+            self._matrix, self._scales, self._user_ids = matrix, matrix_scales, matrix_user_ids
+            self._rows = {user_id: row for row, user_id in enumerate(matrix_user_ids[:count].tolist())}
+            self._version += 1
+
+    def add_row(self, user_id: int, row: np.ndarray, scale: float) -> None:
+        with self._lock:
+            position = self._rows.get(user_id)
+            if position is None:
+                position = len(self._rows)
+                self._reserve(position + 1)
+                self._rows[user_id] = position
+                self._user_ids[position] = user_id
+            else:
+                self._version += 1
+            self._matrix[position] = row
+            self._scales[position] = scale
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return
+            self._version += 1
+
+            # Move the last row into the gap to keep the matrix contiguous
+            last = len(self._rows)
+            if row != last:
+                moved_user_id = int(self._user_ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._scales[row] = self._scales[last]
+                self._user_ids[row] = moved_user_id
+                self._rows[moved_user_id] = row
+
+    def user_ids(self) -> set[int]:
+        with self._lock:
+            return set(self._rows)
+
+    def search(self, facial_embedding: bytes, k: int = 2) -> list[tuple[int, float]]:
+        query = self._decode(facial_embedding)
+
+        while True:
+            with self._lock:
+                count = len(self._rows)
+                matrix, scales, user_ids, version = self._matrix, self._scales, self._user_ids, self._version
+            if count == 0:
+                return []
+
+            similarities = self._similarities(matrix[:count], scales[:count], query)
+            k = min(k, count)
+            top = np.argpartition(similarities, count - k)[count - k:]
+            top = top[np.argsort(similarities[top])[::-1]]
+            candidates = [(int(user_ids[row]), float(1 - similarities[row])) for row in top]
+
+            # Rows seen by the scan were rewritten meanwhile, scan again
+            with self._lock:
+                if self._version == version:
+                    return candidates
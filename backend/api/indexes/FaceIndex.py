@@ -0,0 +1,259 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable, Optional
+import numpy as np
+from api.utils.embedding_codec import EmbeddingDType, embedding_codec
+
+@dataclass(frozen=True)
+class FaceMatch:
+    """Best candidate returned by a face identification search."""
+
+    user_id: int
+    distance: float
+    margin: float
+
+
+class FaceIndex(ABC):
+    """
+    Base class for 1:N identification indexes over facial embeddings.
+
+    Implementations store L2-normalized vectors, so cosine distance reduces
+    to one minus a dot product. Vectors are kept as float32, float16 or int8
+    with a per-row scale; the smaller dtypes cut the index memory by 2x and
+    4x, and are only converted to float32 a chunk at a time while searching.
+    """
+
+    # Rows converted at once when the stored dtype isn't float32
+    CHUNK_SIZE = 16384
+
+    def __init__(self, dimension: int = 512, dtype: EmbeddingDType = 'float32'):
+        self.dimension = dimension
+        self.dtype = dtype
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, np.finfo(np.float32).eps)
+
+    def _decode(self, facial_embedding: bytes) -> np.ndarray:
+        """Return a stored embedding as an L2-normalized float32 vector."""
+        embedding = embedding_codec.decode(facial_embedding)
+        if embedding.normalized and embedding.dtype == 'float32':
+            return embedding.values
+
+        # Quantized values are only close to unit length, normalize them again
+        return self._normalize(embedding.to_float32())
+
+    def prepare(self, facial_embedding: bytes) -> tuple[np.ndarray, float]:
+        """
+        Convert a stored embedding to the row the index keeps for it.
+
+        Returns:
+            tuple[np.ndarray, float]: (row, scale), the L2-normalized vector in
+            the storage dtype and its int8 scale
+        """
+        rows, scales = self._quantize(self._decode(facial_embedding))
+        return rows[0], float(scales[0])
+
+    def _quantize(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Convert normalized float32 rows to the storage dtype.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: (rows, scales), the scales being 1
+            unless the rows are int8
+        """
+        vectors = np.atleast_2d(vectors)
+        if self.dtype != 'int8':
+            return vectors.astype(self.dtype), np.ones(len(vectors), dtype=np.float32)
+
+        peaks = np.max(np.abs(vectors), axis=1)
+        scales = np.where(peaks > 0, peaks / 127, 1).astype(np.float32)
+        rows = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return rows, scales
+
+    @staticmethod
+    def _dequantize(rows: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Convert stored rows back to float32."""
+        if rows.dtype == np.float32:
+            return rows
+        vectors = rows.astype(np.float32)
+        if rows.dtype == np.int8:
+            vectors *= scales[:, None]
+        return vectors
+
+    def _similarities(self, rows: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot products between stored rows and a normalized float32 query."""
+        if rows.dtype == np.float32:
+            return rows @ query
+
+        similarities = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), self.CHUNK_SIZE):
+            chunk = rows[start:start + self.CHUNK_SIZE]
+            similarities[start:start + self.CHUNK_SIZE] = chunk.astype(np.float32) @ query
+        if rows.dtype == np.int8:
+            similarities *= scales
+        return similarities
+
+    def _read_profiles(self, profiles: Iterable[tuple[int, bytes]]) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Stack stored embeddings into one matrix of L2-normalized rows in the storage dtype.
+
+        Rows are decoded into a float32 staging chunk, then normalized and
+        converted into a growing buffer, so neither the raw BLOBs nor a full
+        float32 copy of the gallery need to be held at once.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray, int]: (user_ids, rows,
+            scales, count), where the buffers may have spare rows past count
+        """
+        capacity = 1024
+        rows = np.empty((capacity, self.dimension), dtype=self.dtype)
+        scales = np.empty(capacity, dtype=np.float32)
+        user_ids = np.empty(capacity, dtype=np.int64)
+        staging = np.empty((self.CHUNK_SIZE, self.dimension), dtype=np.float32)
+        staged = count = 0
+
+        def flush() -> None:
+            chunk = self._normalize(staging[:staged])
+            rows[count - staged:count], scales[count - staged:count] = self._quantize(chunk)
+
+        for user_id, facial_embedding in profiles:
+            if count == capacity:
+                capacity *= 2
+                rows = np.resize(rows, (capacity, self.dimension))
+                scales = np.resize(scales, capacity)
+                user_ids = np.resize(user_ids, capacity)
+            staging[staged] = embedding_codec.to_float32(facial_embedding)
+            user_ids[count] = user_id
+            staged += 1
+            count += 1
+
+            if staged == self.CHUNK_SIZE:
+                flush()
+                staged = 0
+
+        if staged:
+            flush()
+
+        return user_ids, rows, scales, count
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def load(self, profiles: Iterable[tuple[int, bytes]]) -> None:
+        """
+        Replace the index content with the given embeddings.
+
+        Args:
+            profiles: Pairs of (user_id, facial_embedding) as stored in the database
+        """
+
+    @abstractmethod
+    def load_rows(self, user_ids: np.ndarray, rows: np.ndarray, scales: np.ndarray) -> None:
+        """
+        Replace the index content with rows already in the storage dtype.
+
+        Used to fill the index from a snapshot without decoding every stored
+        embedding again. The arrays may be read-only memory maps, they are
+        copied as needed.
+
+        Args:
+            user_ids: The user ID of each row
+            rows: L2-normalized vectors, as returned by prepare()
+            scales: The scale of each row
+        """
+
+    def add(self, user_id: int, facial_embedding: bytes) -> None:
+        """Insert or replace the embedding of a user."""
+        self.add_row(user_id, *self.prepare(facial_embedding))
+
+    @abstractmethod
+    def add_row(self, user_id: int, row: np.ndarray, scale: float) -> None:
+        """
+        Insert or replace the row of a user, already in the storage dtype.
+
+        Args:
+            user_id: The user ID of the row
+            row: L2-normalized vector, as returned by prepare()
+            scale: The scale of the row
+        """
+
+    @abstractmethod
+    def remove(self, user_id: int) -> None:
+        """Remove the embedding of a user, if present."""
+
+    @abstractmethod
+    def user_ids(self) -> set[int]:
+        """Return the IDs of every user in the index."""
+
+    @abstractmethod
+    def search(self, facial_embedding: bytes, k: int = 2) -> list[tuple[int, float]]:
+        """
+        Find the enrolled users closest to an embedding.
+
+        Args:
+            facial_embedding: Query embedding as bytes
+            k: Number of candidates to return
+
+        Returns:
+            list[tuple[int, float]]: (user_id, cosine_distance) pairs, closest first
+        """
+
+    def closest(self, facial_embedding: bytes) -> Optional[FaceMatch]:
+        """
+        Find the enrolled user closest to an embedding, whatever the distance.
+
+        Args:
+            facial_embedding: Query embedding as bytes
+
+        Returns:
+            Optional[FaceMatch]: The best candidate and its margin over the
+            runner-up, or None if the index is empty
+        """
+        candidates = self.search(facial_embedding, k=2)
+        if not candidates:
+            return None
+
+        # With a single enrolled user there is nobody to be confused with
+        user_id, distance = candidates[0]
+        margin = candidates[1][1] - distance if len(candidates) > 1 else float("inf")
+        return FaceMatch(user_id=user_id, distance=distance, margin=margin)
+
+    @staticmethod
+    def accepts(match: Optional[FaceMatch], threshold: float, min_margin: float = 0.0) -> bool:
+        """
+        Whether a candidate returned by closest() identifies its user.
+
+        The best candidate must be within the threshold while the runner-up
+        isn't, and ahead of it by at least min_margin: two enrolled faces both
+        close enough to the query can't tell who is logging in.
+
+        Args:
+            match: The best candidate
+            threshold: Maximum cosine distance accepted as a match
+            min_margin: Minimum distance gap required between the best and
+                second-best candidates
+        """
+        if match is None or match.distance > threshold:
+            return False
+        return match.margin >= min_margin and match.distance + match.margin > threshold
+
+    def identify(self, facial_embedding: bytes, threshold: float, min_margin: float = 0.0) -> Optional[FaceMatch]:
+        """
+        Identify the enrolled user matching an embedding.
+
+        Args:
+            facial_embedding: Query embedding as bytes
+            threshold: Maximum cosine distance accepted as a match
+            min_margin: Minimum distance gap required between the best and
+                second-best candidates, to reject ambiguous matches
+
+        Returns:
+            Optional[FaceMatch]: The best match, or None if no candidate is close
+            enough or the match is ambiguous
+        """
+        match = self.closest(facial_embedding)
+        return match if self.accepts(match, threshold, min_margin) else None
@@ -0,0 +1,306 @@
+import fcntl
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+import numpy as np
+from api.utils.embedding_codec import EmbeddingDType
+from .FaceIndex import FaceIndex
+
+class IVFFaceIndex(FaceIndex):
+    """
+    Approximate 1:N identification index using an inverted file (IVF-Flat).
+
+    A spherical k-means coarse quantizer splits the gallery into cells, and
+    each cell keeps its own contiguous float32 matrix. A search only scans the
+    cells whose centroids are closest to the query, so it touches a fraction
+    of the gallery at the cost of a little recall. Raising n_probes trades
+    latency back for recall.
+
+    Cells are trained by load(). Embeddings added later are assigned to the
+    existing cells, so the index should be rebuilt once the gallery has grown
+    well past the size it was trained on.
+    """
+
+    # File names used by save() and restore()
+    FILES = ("centroids", "vectors", "scales", "user_ids", "offsets", "as_of")
+
+    # Locked exclusively by save() and shared by restore(), so neither sees the files of two saves mixed
+    LOCK_FILE = "index.lock"
+
+    def __init__(
+        self,
+        dimension: int = 512,
+        dtype: EmbeddingDType = 'float32',
+        n_lists: int = 1024,
+        n_probes: int = 16,
+        min_list_size: int = 39,
+        train_iterations: int = 10,
+        seed: int = 0
+    ):
+        super().__init__(dimension, dtype)
+        self.n_lists = n_lists
+        self.n_probes = n_probes
+        self.min_list_size = min_list_size
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self._lock = threading.Lock()
+
+        # Untrained index: a single cell, which makes search exact
+        self._reset(np.zeros((1, dimension), dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def _reset(self, centroids: np.ndarray) -> None:
+        self._centroids = centroids
+        self._vectors = [np.empty((0, self.dimension), dtype=self.dtype) for _ in centroids]
+        self._scales = [np.empty(0, dtype=np.float32) for _ in centroids]
+        self._ids = [np.empty(0, dtype=np.int64) for _ in centroids]
+        self._counts = [0] * len(centroids)
+        self._locations: dict[int, tuple[int, int]] = {}
+
+    def _assign(self, vectors: np.ndarray, scales: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Return the index of the closest centroid for each stored vector."""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), self.CHUNK_SIZE):
+            end = start + self.CHUNK_SIZE
+            chunk = self._dequantize(vectors[start:end], scales[start:end])
+            assignments[start:end] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def _train(self, vectors: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Run spherical k-means on a sample of the stored vectors and return the centroids."""
+        n_lists = max(1, min(self.n_lists, len(vectors) // self.min_list_size))
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), n_lists * 256)
+        rows = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+        sample = self._dequantize(vectors[rows], scales[rows])
+        sample_scales = np.ones(sample_size, dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assignments = self._assign(sample, sample_scales, centroids)
+            order = np.argsort(assignments, kind="stable")
+            cells, starts = np.unique(assignments[order], return_index=True)
+
+            # Cells left empty keep their previous centroid
+            sums = centroids.copy()
+            sums[cells] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = self._normalize(sums).astype(np.float32)
+
+        return centroids
+
+    def _reserve(self, cell: int, size: int) -> None:
+        """Make sure a cell can hold size vectors and can be written to."""
+        vectors = self._vectors[cell]
+        if size <= len(vectors) and vectors.flags.writeable:
+            return
+
+        capacity = max(size, 2 * len(vectors), 16)
+        count = self._counts[cell]
+        grown_vectors = np.empty((capacity, self.dimension), dtype=self.dtype)
+        grown_scales = np.empty(capacity, dtype=np.float32)
+        grown_ids = np.empty(capacity, dtype=np.int64)
+        grown_vectors[:count] = vectors[:count]
+        grown_scales[:count] = self._scales[cell][:count]
+        grown_ids[:count] = self._ids[cell][:count]
+        self._vectors[cell], self._scales[cell], self._ids[cell] = grown_vectors, grown_scales, grown_ids
+
+    def _set_cells(
+        self,
+        centroids: np.ndarray,
+        vectors: np.ndarray,
+        scales: np.ndarray,
+        user_ids: np.ndarray,
+        offsets: np.ndarray
+    ) -> None:
+        """Point every cell to its slice of vectors sorted by cell."""
+        self._centroids = centroids
+        self._vectors = [vectors[offsets[cell]:offsets[cell + 1]] for cell in range(len(centroids))]
+        self._scales = [scales[offsets[cell]:offsets[cell + 1]] for cell in range(len(centroids))]
+        self._ids = [user_ids[offsets[cell]:offsets[cell + 1]] for cell in range(len(centroids))]
+        self._counts = [int(offsets[cell + 1] - offsets[cell]) for cell in range(len(centroids))]
+        self._locations = {}
+        for cell, ids in enumerate(self._ids):
+            for position, user_id in enumerate(ids.tolist()):
+                self._locations[user_id] = (cell, position)
+
+    def load(self, profiles: Iterable[tuple[int, bytes]]) -> None:
+        user_ids, vectors, scales, count = self._read_profiles(profiles)
+        self.load_rows(user_ids[:count], vectors[:count], scales[:count])
+
+    def load_rows(self, user_ids: np.ndarray, vectors: np.ndarray, scales: np.ndarray) -> None:
+        if not len(user_ids):
+            with self._lock:
+                self._reset(np.zeros((1, self.dimension), dtype=np.float32))
+            return
+
+        # Train the cells and store the vectors grouped by cell
+        centroids = self._train(vectors, scales)
+        assignments = self._assign(vectors, scales, centroids)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+
+        with self._lock:
+            self._set_cells(centroids, vectors[order], scales[order], user_ids[order], offsets)
+
+    def add_row(self, user_id: int, row: np.ndarray, scale: float) -> None:
+        vector = self._dequantize(row[None], np.array([scale], dtype=np.float32))[0]
+
+        with self._lock:
+            self._remove(user_id)
+            cell = int(np.argmax(self._centroids @ vector))
+            position = self._counts[cell]
+            self._reserve(cell, position + 1)
+            self._vectors[cell][position] = row
+            self._scales[cell][position] = scale
+            self._ids[cell][position] = user_id
+            self._counts[cell] = position + 1
+            self._locations[user_id] = (cell, position)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id: int) -> None:
+        location = self._locations.pop(user_id, None)
+        if location is None:
+            return
+
+        cell, position = location
+        self._reserve(cell, self._counts[cell])
+
+        # Move the last vector of the cell into the gap
+        last = self._counts[cell] - 1
+        if position != last:
+            moved_user_id = int(self._ids[cell][last])
+            self._vectors[cell][position] = self._vectors[cell][last]
+            self._scales[cell][position] = self._scales[cell][last]
+            self._ids[cell][position] = moved_user_id
+            self._locations[moved_user_id] = (cell, position)
+        self._counts[cell] = last
+
+    def user_ids(self) -> set[int]:
+        with self._lock:
+            return set(self._locations)
+
+    def search(self, facial_embedding: bytes, k: int = 2) -> list[tuple[int, float]]:
+        query = self._decode(facial_embedding)
+
+        with self._lock:
+            if not self._locations:
+                return []
+
+            # Pick the cells whose centroids are closest to the query
+            n_cells = len(self._centroids)
+            n_probes = min(self.n_probes, n_cells)
+            probes = np.argpartition(self._centroids @ query, n_cells - n_probes)[n_cells - n_probes:]
+
+            similarities, user_ids = [], []
+            for cell in probes:
+                count = self._counts[cell]
+                if count:
+                    similarities.append(self._similarities(self._vectors[cell][:count], self._scales[cell][:count], query))
+                    user_ids.append(self._ids[cell][:count])
+
+        if not similarities:
+            return []
+
+        similarities = np.concatenate(similarities)
+        user_ids = np.concatenate(user_ids)
+        count = len(similarities)
+        k = min(k, count)
+        top = np.argpartition(similarities, count - k)[count - k:]
+        top = top[np.argsort(similarities[top])[::-1]]
+        return [(int(user_ids[row]), float(1 - similarities[row])) for row in top]
+
+    @contextmanager
+    def _locked(self, directory: str, operation: int) -> Iterator[None]:
+        """Hold a lock on the lock file of a saved index."""
+        fd = os.open(os.path.join(directory, self.LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    def save(self, directory: str, as_of: float = 0.0) -> None:
+        """
+        Write the index to a directory as .npy files that restore() can memory-map.
+
+        Files are written under temporary names unique to this process and
+        then renamed, so an index currently memory-mapped from the same
+        directory stays valid. Processes saving to the same directory take
+        turns.
+
+        Args:
+            directory: Directory to save the index to
+            as_of: POSIX time up to which the index reflects the stored
+                profiles, returned by restore() to catch up from
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        with self._locked(directory, fcntl.LOCK_EX):
+            with self._lock:
+                counts = np.asarray(self._counts, dtype=np.int64)
+                offsets = np.concatenate([[0], np.cumsum(counts)])
+                total = int(offsets[-1])
+
+                paths = {name: os.path.join(directory, f"{name}.{os.getpid()}.tmp.npy") for name in self.FILES}
+                vectors = np.lib.format.open_memmap(paths["vectors"], mode="w+", dtype=self.dtype, shape=(total, self.dimension))
+                scales = np.lib.format.open_memmap(paths["scales"], mode="w+", dtype=np.float32, shape=(total,))
+                user_ids = np.lib.format.open_memmap(paths["user_ids"], mode="w+", dtype=np.int64, shape=(total,))
+                for cell, count in enumerate(self._counts):
+                    vectors[offsets[cell]:offsets[cell + 1]] = self._vectors[cell][:count]
+                    scales[offsets[cell]:offsets[cell + 1]] = self._scales[cell][:count]
+                    user_ids[offsets[cell]:offsets[cell + 1]] = self._ids[cell][:count]
+                vectors.flush()
+                scales.flush()
+                user_ids.flush()
+                del vectors, scales, user_ids
+
+                np.save(paths["centroids"], self._centroids)
+                np.save(paths["offsets"], offsets)
+                np.save(paths["as_of"], np.float64(as_of))
+
+            for name, path in paths.items():
+                os.replace(path, os.path.join(directory, f"{name}.npy"))
+
+    def restore(self, directory: str, mmap: bool = True) -> float:
+        """
+        Replace the index content with one written by save().
+
+        Args:
+            directory: Directory the index was saved to
+            mmap: Memory-map the vectors instead of reading them into RAM.
+                Cells are copied into memory the first time they change.
+
+        Returns:
+            float: The as_of time the index was saved with
+
+        Raises:
+            OSError: If a file of the index is missing or unreadable
+            ValueError: If the saved vectors don't have the index dtype or dimension
+        """
+        mmap_mode = "r" if mmap else None
+        with self._locked(directory, fcntl.LOCK_SH):
+            arrays = {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                for name in self.FILES
+            }
+
+        vectors = arrays["vectors"]
+        if vectors.dtype != np.dtype(self.dtype) or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Saved face index holds {vectors.dtype} vectors of dimension {vectors.shape[1]}")
+
+        with self._lock:
+            self._set_cells(
+                np.asarray(arrays["centroids"]),
+                vectors,
+                arrays["scales"],
+                arrays["user_ids"],
+                np.asarray(arrays["offsets"])
+            )
+
+        return float(arrays["as_of"])
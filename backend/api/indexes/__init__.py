@@ -0,0 +1,6 @@
+from .FaceIndex import FaceIndex, FaceMatch
+from .ExactFaceIndex import ExactFaceIndex
+from .IVFFaceIndex import IVFFaceIndex
+from .EmbeddingSnapshot import EmbeddingSnapshot, SnapshotContent, SnapshotPosition
+
+__all__ = ["FaceIndex", "FaceMatch", "ExactFaceIndex", "IVFFaceIndex", "EmbeddingSnapshot", "SnapshotContent", "SnapshotPosition"]
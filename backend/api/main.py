@@ -1,11 +1,22 @@
+import logging
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from contextlib import asynccontextmanager
-from api.database import create_db_and_tables
-from api.routers import hello, auth
+from api.database import create_db_and_tables, dispose_async_engine
+from api.utils.inference_pool import inference_pool
+from api.utils.embedding_batcher import embedding_batcher
+from api.utils.face_index import load_face_index, save_face_index
+from api.utils.password_hasher import password_hasher
+from api.utils.refresh_token_store import refresh_token_store
+from api.utils.verification_threshold import verification_threshold, model_default_threshold
+from api.utils.metrics import resident_memory_bytes
+from api.routers import hello, auth, health, metrics
 from api.dependencies import authx
 from api.config import settings
+from api.constants import MAX_REQUEST_BODY_SIZE, MAX_ENROLLMENT_REQUEST_BODY_SIZE, MAX_BATCH_REQUEST_BODY_SIZE
+from api.middleware import BodySizeLimitMiddleware, MetricsMiddleware
 from fastapi import HTTPException
 from fastapi.exceptions import RequestValidationError
 from api.errors.exception_handlers import (
@@ -14,13 +25,60 @@ from api.errors.exception_handlers import (
     server_error_handler
 )
 
-# Lifespan for database initialization
+logger = logging.getLogger("uvicorn.error")
+
+async def resolve_verification_threshold():
+    """
+    Resolve the threshold, asking the inference workers for the model default so this process needn't load DeepFace.
+
+    Raises:
+        RuntimeError: If the inference server can't give the model default;
+            API workers of a remote deployment don't load DeepFace to look it up themselves
+    """
+    model_default = None
+    if verification_threshold.needs_model_default:
+        try:
+            model_default = await inference_pool.run(model_default_threshold, verification_threshold.model_name)
+        except Exception as e:
+            if inference_pool.kind == 'remote':
+                raise RuntimeError(
+                    "Couldn't get the verification threshold from the inference server, "
+                    "check that it is running or set FACE_VERIFICATION_THRESHOLD"
+                ) from e
+            # Looked up locally instead
+    verification_threshold.resolve(model_default)
+
+def report_worker_memory():
+    """Log the resident memory of this worker once it is ready to serve."""
+    rss = resident_memory_bytes()
+    if rss is not None:
+        logger.info(
+            "Worker %d ready with %s inference, RSS %.0f MB",
+            os.getpid(), settings.inference_executor, rss / 2**20
+        )
+
+# Lifespan for database, face index and inference pool initialization
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     create_db_and_tables()
+    load_face_index()
+    refresh_token_store.load()
+    inference_pool.start()
+    if settings.inference_warm_up:
+        # Load the models before accepting requests
+        await inference_pool.warm_up()
+    await resolve_verification_threshold()
+    embedding_batcher.start()
+    report_worker_memory()
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await embedding_batcher.stop()
+    inference_pool.shutdown()
+    save_face_index()
+    password_hasher.shutdown()
+    refresh_token_store.close()
+    await dispose_async_engine()
 
 # FastAPI application instance
 app = FastAPI(
@@ -39,6 +97,16 @@ app.add_exception_handler(Exception, server_error_handler)
 # Configure AuthX error handling
 authx.handle_errors(app)
 
+# Reject oversized request bodies while they stream in (added first, so CORS still wraps its responses)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=MAX_REQUEST_BODY_SIZE,
+    path_limits={
+        "/auth/register": MAX_ENROLLMENT_REQUEST_BODY_SIZE,
+        "/auth/verify/batch": MAX_BATCH_REQUEST_BODY_SIZE
+    }
+)
+
 # CORS configuration to allow requests from configured origins
 app.add_middleware(
     CORSMiddleware,
@@ -48,6 +116,10 @@ app.add_middleware(
     allow_headers=["*"],  
 )
 
+# Time every request by endpoint and status (added last, so it is outermost and sees every response)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # Custom OpenAPI configuration to enable Authorization header persistence
 def custom_openapi():
     if app.openapi_schema:
@@ -85,4 +157,7 @@ app.openapi = custom_openapi
 # Include routers
 app.include_router(hello.router)
 app.include_router(auth.router)
+app.include_router(health.router)
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
     
\ No newline at end of file
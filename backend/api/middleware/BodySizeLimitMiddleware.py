@@ -0,0 +1,61 @@
+from typing import Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api.errors import PayloadTooLargeError
+from api.schemas import HttpError
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies larger than a fixed number of bytes while they stream in.
+
+    A declared Content-Length above the limit is answered with 413 before
+    any of the body is read. Otherwise the body chunks are counted as the
+    application receives them, and reading stops with a 413 as soon as the
+    limit is crossed, so an oversized upload is never buffered or spooled
+    in full.
+
+    Paths taking several images can be given their own, larger limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int, path_limits: Optional[dict[str, int]] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+
+    def _limit(self, scope: Scope) -> int:
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        return self.path_limits.get(path, self.max_body_size)
+
+    @staticmethod
+    def _error(max_body_size: int) -> PayloadTooLargeError:
+        return PayloadTooLargeError(f"Request body must not exceed {max_body_size // (1024 * 1024)} MB")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self._limit(scope)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body_size:
+            error = self._error(max_body_size)
+            response = JSONResponse(status_code=error.status_code, content=HttpError(message=error.detail).model_dump())
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    # Raised while the body is parsed, FastAPI passes HTTP errors through
+                    raise self._error(max_body_size)
+            return message
+
+        await self.app(scope, limited_receive, send)
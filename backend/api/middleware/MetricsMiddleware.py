@@ -0,0 +1,51 @@
+import time
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api.utils.metrics import current_endpoint, request_duration
+
+class MetricsMiddleware:
+    """
+    Records the duration of every HTTP request by endpoint and status code.
+
+    The endpoint is the path template of the matched route, so paths that
+    don't match any route share one "unmatched" label instead of creating a
+    series each. It is also made available to the pipeline stage metrics
+    recorded while the request is served.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @staticmethod
+    def _endpoint(scope: Scope) -> str:
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match != Match.NONE:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        token = current_endpoint.set(endpoint)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_duration.labels(
+                endpoint=endpoint,
+                method=scope["method"],
+                outcome=str(status_code)
+            ).observe(time.perf_counter() - started_at)
+            current_endpoint.reset(token)
@@ -0,0 +1,8 @@
+# Middleware package
+from .BodySizeLimitMiddleware import BodySizeLimitMiddleware
+from .MetricsMiddleware import MetricsMiddleware
+
+__all__ = [
+    "BodySizeLimitMiddleware",
+    "MetricsMiddleware"
+]
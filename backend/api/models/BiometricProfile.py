@@ -2,6 +2,7 @@ from typing import TYPE_CHECKING, Optional
 from sqlmodel import SQLModel, Field, Relationship, Column, BLOB, DateTime, func
 from datetime import datetime, UTC
 import numpy as np
+from api.utils.embedding_codec import embedding_codec
 
 if TYPE_CHECKING:
     from .User import User # Avoid circular import issues
@@ -9,6 +10,9 @@ if TYPE_CHECKING:
 class BiometricProfile(SQLModel, table=True):
     """Biometric profile model for storing user biometric data."""	
 
+    # Never reuse the ID of a deleted profile, the embedding snapshot relies on it
+    __table_args__ = {"sqlite_autoincrement": True}
+
     id: int | None = Field(default=None, primary_key=True, index=True)
     user_id: int | None = Field(default=None, foreign_key="user.id", index=True)
     facial_embedding: bytes = Field(sa_column=Column(BLOB))
@@ -25,12 +29,12 @@ class BiometricProfile(SQLModel, table=True):
 
     user: Optional["User"] = Relationship(back_populates="biometric_profile")
 
-    # Property to handle conversion between bytes and list of floats
+    # Property to handle conversion between the stored blob and a float32 vector
     @property
-    def embedding_array(self) -> list[float]:
-        return np.frombuffer(self.facial_embedding, dtype=np.float32).tolist()
+    def embedding_array(self) -> np.ndarray:
+        return embedding_codec.to_float32(self.facial_embedding)
     
-    # Setter to convert list of floats to bytes
+    # Setter to encode a vector with the configured storage format
     @embedding_array.setter
-    def embedding_array(self, value: list[float]):
-        self.facial_embedding = np.array(value, dtype=np.float32).tobytes()
\ No newline at end of file
+    def embedding_array(self, value: np.ndarray | list[float]):
+        self.facial_embedding = embedding_codec.encode(np.asarray(value, dtype=np.float32))
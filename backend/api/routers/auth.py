@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Form, Request, Depends, Response
-from api.dependencies import AuthServiceDep, authx
+from authx import TokenPayload
+from api.dependencies import AuthServiceDep, TrustedServiceDep, authx
 from api.schemas import (
     LoginDto, 
     RegisterDto, 
@@ -7,6 +8,8 @@ from api.schemas import (
     RefreshTokenDto, 
     NewAccessTokenDto, 
     UserDto,
+    BatchVerificationDto,
+    BatchVerificationResultDto,
     HttpError,
     ValidationError,
     InternalServerError
@@ -20,8 +23,10 @@ router = APIRouter(prefix="/auth", tags=["auth"])
     response_model=AuthenticatedDto,
     responses={
         400: {"model": HttpError},
+        413: {"model": HttpError},
         422: {"model": ValidationError},
-        500: {"model": InternalServerError}
+        500: {"model": InternalServerError},
+        503: {"model": HttpError}
     }
 )
 async def register(
@@ -48,8 +53,10 @@ async def register(
     responses={
         400: {"model": HttpError},
         401: {"model": HttpError},
+        413: {"model": HttpError},
         422: {"model": ValidationError},
-        500: {"model": InternalServerError}
+        500: {"model": InternalServerError},
+        503: {"model": HttpError}
     }
 )
 async def login(
@@ -70,6 +77,26 @@ async def login(
     return result
 
 
+@router.post(
+    "/verify/batch",
+    response_model=BatchVerificationResultDto,
+    responses={
+        400: {"model": HttpError},
+        401: {"model": HttpError},
+        413: {"model": HttpError},
+        422: {"model": ValidationError},
+        500: {"model": InternalServerError},
+        503: {"model": HttpError}
+    }
+)
+async def verify_batch(
+    auth_service: AuthServiceDep,
+    trusted: TrustedServiceDep,
+    request: BatchVerificationDto = Form(..., media_type="multipart/form-data"),
+):
+    return await auth_service.verify_batch(request, trusted)
+
+
 @router.post(
     "/refresh", 
     response_model=NewAccessTokenDto,
@@ -81,17 +108,29 @@ async def login(
     }
 )
 async def refresh(
+    response: Response,
     auth_service: AuthServiceDep,
     request: Request,
     refresh_data: RefreshTokenDto = None
 ):
-    return await auth_service.refresh(request, refresh_data)
+    result = await auth_service.refresh(request, refresh_data)
+    if result.refresh_token:
+        # The refresh token was rotated, replace the cookie
+        response.set_cookie(
+            key=settings.cookie_name,
+            value=result.refresh_token,
+            httponly=settings.cookie_http_only,
+            secure=settings.cookie_secure,
+            samesite=settings.cookie_samesite,
+            max_age=settings.cookie_max_age,
+            path=settings.cookie_path
+        )
+    return result
 
 
 @router.get(
     "/me", 
     response_model=UserDto, 
-    dependencies=[Depends(authx.access_token_required)],
     responses={
         401: {"model": HttpError},
         404: {"model": HttpError},
@@ -101,6 +140,7 @@ async def refresh(
 )
 async def get_current_user(
     auth_service: AuthServiceDep,
-    request: Request,
+    # The token is verified once, here, and its payload handed to the service
+    token_payload: TokenPayload = Depends(authx.access_token_required),
 ):
-    return await auth_service.get_current_user(request)
+    return await auth_service.get_current_user(token_payload)
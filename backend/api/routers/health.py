@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Response
+from api.schemas import ReadinessDto
+from api.utils.inference_pool import inference_pool
+from api.constants import DEFAULT_MODEL_NAME
+from api.config import settings
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+# Liveness probe, only checks that the process serves requests
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+# Readiness probe, reflects whether the facial model is loaded
+@router.get(
+    "/ready",
+    response_model=ReadinessDto,
+    responses={
+        503: {"model": ReadinessDto}
+    }
+)
+async def ready(response: Response):
+    # Without warm-up the model loads lazily on the first request
+    is_ready = inference_pool.ready or not settings.inference_warm_up
+    if not is_ready:
+        response.status_code = 503
+
+    return ReadinessDto(
+        status="ready" if is_ready else "not_ready",
+        model_name=DEFAULT_MODEL_NAME,
+        model_loaded=inference_pool.ready,
+        warm_up_seconds=inference_pool.warm_up_seconds,
+        error=inference_pool.warm_up_error
+    )
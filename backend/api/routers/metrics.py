@@ -0,0 +1,53 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from api.utils.embedding_batcher import embedding_batcher
+from api.utils.embedding_cache import embedding_cache
+from api.utils.inference_pool import inference_pool
+from api.utils.metrics import metrics
+from api.utils.refresh_token_store import refresh_token_store
+from api.utils.user_cache import user_cache
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+# Components keep their own state, the registry reads it at scrape time
+metrics.gauge(
+    "inference_pool_queue_depth",
+    "Inference jobs submitted but not yet finished",
+    lambda: inference_pool.queue_depth
+)
+metrics.gauge(
+    "embedding_batcher_pending_images",
+    "Images waiting for the next embedding batch",
+    lambda: embedding_batcher.queue_depth
+)
+metrics.gauge(
+    "facial_model_loaded",
+    "Whether the facial model is loaded and warmed up",
+    lambda: inference_pool.ready
+)
+metrics.gauge(
+    "facial_model_warm_up_seconds",
+    "Time taken to load and warm up the facial model",
+    lambda: inference_pool.warm_up_seconds
+)
+metrics.counter("embedding_cache_hits_total", "Embedding cache hits", lambda: embedding_cache.hits)
+metrics.counter("embedding_cache_misses_total", "Embedding cache misses", lambda: embedding_cache.misses)
+metrics.counter("embedding_cache_evictions_total", "Embedding cache evictions", lambda: embedding_cache.evictions)
+metrics.counter("user_cache_hits_total", "User profile cache hits", lambda: user_cache.hits)
+metrics.counter("user_cache_misses_total", "User profile cache misses", lambda: user_cache.misses)
+metrics.gauge("refresh_token_store_entries", "Used refresh tokens not yet expired", lambda: len(refresh_token_store))
+metrics.register_histogram(
+    "embedding_batch_size",
+    "Number of images per embedding batch",
+    embedding_batcher.batch_size_histogram
+)
+metrics.register_histogram(
+    "embedding_batch_wait_seconds",
+    "Time images wait before their batch is sent to the inference pool",
+    embedding_batcher.wait_time_histogram
+)
+
+# Prometheus scrape endpoint
+@router.get("", response_class=PlainTextResponse)
+async def scrape():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
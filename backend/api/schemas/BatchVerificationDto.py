@@ -0,0 +1,36 @@
+from typing import Annotated
+from pydantic import BaseModel, Field, model_validator
+from fastapi import UploadFile
+from api.constants import MAX_BATCH_VERIFICATION_ITEMS
+
+# DTO for verifying several (subject, image) pairs in one request
+class BatchVerificationDto(BaseModel):
+    subjects: Annotated[
+        list[str],
+        Field(
+            ...,
+            min_length=1,
+            max_length=MAX_BATCH_VERIFICATION_ITEMS,
+            description="Email or user ID claimed by each image, in the same order as images"
+        )
+    ]
+    images: Annotated[
+        list[UploadFile],
+        Field(
+            ...,
+            min_length=1,
+            max_length=MAX_BATCH_VERIFICATION_ITEMS,
+            description="Uploaded face images, validated one by one so a bad frame only fails its own item"
+        )
+    ]
+    issue_tokens: Annotated[
+        bool,
+        Field(False, description="Issue access and refresh tokens for the items that match")
+    ]
+
+    @model_validator(mode='after')
+    def validate_pairs(self) -> 'BatchVerificationDto':
+        """Ensure every image has a subject"""
+        if len(self.subjects) != len(self.images):
+            raise ValueError("subjects and images must have the same number of items")
+        return self
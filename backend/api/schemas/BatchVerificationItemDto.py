@@ -0,0 +1,33 @@
+from typing import Annotated, Optional
+from pydantic import BaseModel, Field
+
+# DTO for the result of one item of a batch verification
+class BatchVerificationItemDto(BaseModel):
+    subject: Annotated[
+        str,
+        Field(..., description="Email or user ID claimed by the image")
+    ]
+    user_id: Annotated[
+        Optional[int],
+        Field(None, description="ID of the claimed user, if found and the caller is trusted")
+    ]
+    match: Annotated[
+        bool,
+        Field(..., description="Whether the face matches the claimed user")
+    ]
+    distance: Annotated[
+        Optional[float],
+        Field(None, description="Cosine distance to the enrolled face, lower is closer, for trusted callers")
+    ]
+    error: Annotated[
+        Optional[str],
+        Field(None, description="Why the item couldn't be verified, if it couldn't")
+    ]
+    access_token: Annotated[
+        Optional[str],
+        Field(None, description="JWT access token, when requested by a trusted caller and the face matches")
+    ]
+    refresh_token: Annotated[
+        Optional[str],
+        Field(None, description="JWT refresh token, when requested by a trusted caller and the face matches")
+    ]
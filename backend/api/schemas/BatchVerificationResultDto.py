@@ -0,0 +1,14 @@
+from typing import Annotated, Optional
+from pydantic import BaseModel, Field
+from .BatchVerificationItemDto import BatchVerificationItemDto
+
+# DTO for the response of a batch verification
+class BatchVerificationResultDto(BaseModel):
+    threshold: Annotated[
+        Optional[float],
+        Field(None, description="Maximum cosine distance accepted as a match, for trusted callers")
+    ]
+    results: Annotated[
+        list[BatchVerificationItemDto],
+        Field(..., description="Result of each item, in request order")
+    ]
@@ -6,8 +6,8 @@ from api.validators.field_validators import validate_image_data
 # DTO for login with either password or facial recognition
 class LoginDto(BaseModel):
     email: Annotated[
-        EmailStr, 
-        Field(..., description="User email address")
+        Optional[EmailStr], 
+        Field(None, description="User email address, omit it to identify the user from image_data alone")
     ]
     password: Annotated[
         Optional[str],
@@ -27,7 +27,10 @@ class LoginDto(BaseModel):
         if self.password is not None and self.image_data is not None:
             raise ValueError("Cannot provide both password and image_data. Choose one authentication method")
         
+        if self.password is not None and self.email is None:
+            raise ValueError("Email must be provided for password authentication")
+        
         return self
 
-    # Validator to ensure image data is valid
+    # Validator to ensure image data is valid, replaces the upload with a DecodedImage
     _validate_image_data = field_validator("image_data")(validate_image_data)
\ No newline at end of file
@@ -1,8 +1,12 @@
 from pydantic import BaseModel, Field
-from typing import Annotated
+from typing import Annotated, Optional
 
 class NewAccessTokenDto(BaseModel):
     access_token: Annotated[
         str, 
         Field(..., description="New JWT access token for API authentication")
-    ]
\ No newline at end of file
+    ]
+    refresh_token: Annotated[
+        Optional[str],
+        Field(None, description="New JWT refresh token replacing the one used, when refresh tokens are rotated")
+    ]
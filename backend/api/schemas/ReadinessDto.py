@@ -0,0 +1,25 @@
+from typing import Annotated, Literal, Optional
+from pydantic import BaseModel, Field
+
+# DTO for the readiness probe response
+class ReadinessDto(BaseModel):
+    status: Annotated[
+        Literal['ready', 'not_ready'],
+        Field(..., description="Whether the API is ready to serve biometric requests")
+    ]
+    model_name: Annotated[
+        str,
+        Field(..., description="Facial recognition model served by the API")
+    ]
+    model_loaded: Annotated[
+        bool,
+        Field(..., description="Whether the model was loaded and warmed up at startup")
+    ]
+    warm_up_seconds: Annotated[
+        Optional[float],
+        Field(None, description="Time spent loading and warming up the model")
+    ]
+    error: Annotated[
+        Optional[str],
+        Field(None, description="Reason the model failed to load, if any")
+    ]
@@ -1,7 +1,8 @@
-from typing import Annotated
+from typing import Annotated, Optional
 from pydantic import BaseModel, Field, EmailStr, field_validator
 from fastapi import UploadFile
-from api.validators.field_validators import validate_password, validate_image_data
+from api.constants import MAX_ENROLLMENT_FRAMES
+from api.validators.field_validators import validate_password, validate_image_data, validate_image_list
 
 # DTO for user registration
 class RegisterDto(BaseModel):
@@ -14,9 +15,20 @@ class RegisterDto(BaseModel):
         UploadFile,
         Field(..., description="Uploaded image file for facial recognition")
     ]
+    additional_images: Annotated[
+        Optional[list[UploadFile]],
+        Field(
+            None,
+            max_length=MAX_ENROLLMENT_FRAMES - 1,
+            description="More frames of the same face, e.g. from a short burst, enrolled together with image_data"
+        )
+    ]
 
     # Validator to ensure password meets requirements
     _validate_password = field_validator("password")(validate_password)
     
-    # Validator to ensure image data is valid
-    _validate_image_data = field_validator("image_data")(validate_image_data)
\ No newline at end of file
+    # Validator to ensure image data is valid, replaces the upload with a DecodedImage
+    _validate_image_data = field_validator("image_data")(validate_image_data)
+
+    # Validator to ensure every additional frame is valid, replaces the uploads with DecodedImages
+    _validate_additional_images = field_validator("additional_images")(validate_image_list)
\ No newline at end of file
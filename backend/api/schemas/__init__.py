@@ -5,6 +5,10 @@ from .LoginDto import LoginDto
 from .AuthenticatedDto import AuthenticatedDto
 from .RefreshTokenDto import RefreshTokenDto
 from .NewAccessTokenDto import NewAccessTokenDto
+from .ReadinessDto import ReadinessDto
+from .BatchVerificationDto import BatchVerificationDto
+from .BatchVerificationItemDto import BatchVerificationItemDto
+from .BatchVerificationResultDto import BatchVerificationResultDto
 from .errors.http_errors import (
     HttpError,
     ValidationError,
@@ -18,6 +22,10 @@ __all__ = [
     "AuthenticatedDto", 
     "RefreshTokenDto", 
     "NewAccessTokenDto",
+    "ReadinessDto",
+    "BatchVerificationDto",
+    "BatchVerificationItemDto",
+    "BatchVerificationResultDto",
     "HttpError",
     "ValidationError",
     "InternalServerError"
@@ -1,32 +1,76 @@
+import asyncio
+import time
+import numpy as np
 from fastapi import Request
-from sqlmodel import Session, select
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy import Row, or_
+from sqlmodel import col, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 from api.models import User, BiometricProfile
-from api.schemas import LoginDto, RegisterDto, AuthenticatedDto, RefreshTokenDto, NewAccessTokenDto, UserDto
-from api.utils.deepface_utils import generate_facial_embedding, verify_facial_embeddings
-from api.errors import BadRequestError, UnauthorizedError, NotFoundError, InternalServerError
-from argon2 import PasswordHasher
+from api.schemas import (
+    LoginDto, RegisterDto, AuthenticatedDto, RefreshTokenDto, NewAccessTokenDto, UserDto,
+    BatchVerificationDto, BatchVerificationItemDto, BatchVerificationResultDto
+)
+from api.utils.deepface_utils import verify_facial_embeddings, get_verification_threshold, aggregate_facial_embeddings
+from api.utils.embedding_batcher import embedding_batcher
+from api.utils.embedding_codec import embedding_codec
+from api.utils.face_index import identify_face, index_profile
+from api.utils.image_utils import DecodedImage
+from api.utils.password_hasher import password_hasher
+from api.utils.refresh_token_store import refresh_token_store
+from api.utils.metrics import track_stage
+from api.utils.token_service import token_service
+from api.utils.user_cache import user_cache
+from api.validators.field_validators import validate_image_data
+from api.config import settings
+from api.errors import BadRequestError, UnauthorizedError, NotFoundError, InternalServerError, ServiceUnavailableError
 from authx import AuthX, TokenPayload, RequestToken
 from authx.types import TokenLocation
 from authx.exceptions import InvalidToken, JWTDecodeError, TokenTypeError, AccessTokenRequiredError, FreshTokenRequiredError
 
-# Create password hasher instance here to avoid circular import
-_ph = PasswordHasher(
-    time_cost=3,          # Number of iterations
-    memory_cost=65536,    # Memory usage (64MB)
-    parallelism=2,        # Number of parallel threads
-    hash_len=32,          # Hash length (32 bytes = 256 bits)
-    salt_len=16           # Salt length (16 bytes = 128 bits)
-)
+email_adapter = TypeAdapter(EmailStr)
 
 class AuthService:
-    def __init__(self, session: Session, authx: AuthX):
+    def __init__(self, session: AsyncSession, authx: AuthX):
         self.session = session
         self.authx = authx
 
 
     async def _get_user_by_email(self, email: str) -> User | None:
         statement = select(User).where(User.email == email)
-        return self.session.exec(statement).first()
+        return (await self.session.exec(statement)).first()
+
+
+    async def _get_login_credentials(self, email: str) -> Row[tuple[int, str, bytes | None]] | None:
+        """
+        Fetch everything a login needs in a single query.
+
+        Only the user ID, password hash and facial embedding are selected,
+        so no ORM objects are built for the user or the biometric profile.
+
+        Args:
+            email: The email of the user logging in
+
+        Returns:
+            Row | None: (id, password, facial_embedding) with facial_embedding
+            set to None when the user has no biometric profile, or None if no
+            user has this email
+        """
+        statement = (
+            select(User.id, User.password, BiometricProfile.facial_embedding)
+            .outerjoin(BiometricProfile, BiometricProfile.user_id == User.id)
+            .where(User.email == email)
+        )
+        return (await self.session.exec(statement)).first()
+    
+
+    async def _update_password_hash(self, user_id: int, password: str) -> None:
+        """Re-hash a verified password with the current Argon2 parameters and store it."""
+        statement = update(User).where(User.id == user_id).values(
+            password=await password_hasher.hash(password)
+        )
+        await self.session.exec(statement)
+        await self.session.commit()
     
 
     def _generate_auth_tokens(self, user_id: str) -> tuple[str, str]:
@@ -43,15 +87,8 @@ class AuthService:
             InternalServerError: If token generation fails
         """
         try:
-            access_token = self.authx.create_access_token(
-                uid=user_id,
-                expiry=self.authx.config.JWT_ACCESS_TOKEN_EXPIRES
-            )
-            refresh_token = self.authx.create_refresh_token(
-                uid=user_id,
-                expiry=self.authx.config.JWT_REFRESH_TOKEN_EXPIRES
-            )
-            return access_token, refresh_token
+            with track_stage("jwt_issue"):
+                return token_service.issue_pair(user_id)
         except Exception as e:
             raise InternalServerError(f"Failed to generate authentication tokens: {str(e)}")
     
@@ -82,6 +119,33 @@ class AuthService:
             raise InternalServerError(f"Unexpected error during token verification: {str(e)}")
     
 
+    async def _generate_enrollment_embedding(self, images: list[DecodedImage]) -> bytes:
+        """
+        Generate the facial embedding stored for a new user from one or more frames.
+
+        Several frames are embedded in one batch, and those where a face was
+        found are aggregated into a centroid or a template set.
+
+        Args:
+            images: The validated enrollment frames
+
+        Returns:
+            bytes: The embedding or template set to store
+
+        Raises:
+            ValueError: If no frame holds a usable face, or the frames disagree
+        """
+        if len(images) == 1:
+            return await embedding_batcher.submit(images[0])
+
+        results = await embedding_batcher.submit_many(images)
+        embeddings = [result for result in results if not isinstance(result, ValueError)]
+        if not embeddings:
+            raise results[0]
+
+        return aggregate_facial_embeddings(embeddings)
+
+
     async def register(self, request: RegisterDto) -> AuthenticatedDto:
         try:
             # If the user already exists, raise an error
@@ -89,17 +153,19 @@ class AuthService:
                 raise BadRequestError("User already exists")
             
             # Generate facial embedding first to validate the image data
-            facial_embedding = generate_facial_embedding(request.image_data)
+            facial_embedding = await self._generate_enrollment_embedding(
+                [request.image_data, *(request.additional_images or [])]
+            )
 
             # Create user with hashed password
             user = User(
                 email=request.email,
-                password=_ph.hash(request.password)
+                password=await password_hasher.hash(request.password)
             )
 
             # Add the user to the database (but don't commit yet)
             self.session.add(user)
-            self.session.flush()  # Flush to get the user ID without committing
+            await self.session.flush()  # Flush to get the user ID without committing
 
             # Create a new BiometricProfile for the user
             biometric_profile = BiometricProfile(
@@ -111,8 +177,11 @@ class AuthService:
             self.session.add(biometric_profile)
             
             # Commit both user and biometric profile together
-            self.session.commit()
-            self.session.refresh(user)
+            await self.session.commit()
+            await self.session.refresh(user)
+
+            # Make the new face available for face-only login, off the event loop like the searches
+            await asyncio.to_thread(index_profile, biometric_profile.id, user.id, facial_embedding)
 
             # Generate authentication tokens
             access_token, refresh_token = self._generate_auth_tokens(str(user.id))
@@ -126,7 +195,7 @@ class AuthService:
         except BadRequestError as e:
             raise e
         
-        except (UnauthorizedError, InternalServerError) as e:
+        except (UnauthorizedError, InternalServerError, ServiceUnavailableError) as e:
             raise e
         
         except ValueError as e:
@@ -136,33 +205,82 @@ class AuthService:
             raise InternalServerError(str(e))
     
 
+    async def _identify_user(self, image_data: DecodedImage) -> int:
+        """
+        Identify the enrolled user from a face image alone.
+
+        Args:
+            image_data: The validated uploaded image
+
+        Returns:
+            int: The ID of the matching user
+
+        Raises:
+            UnauthorizedError: If no enrolled face matches unambiguously
+        """
+        facial_embedding = await embedding_batcher.submit(image_data)
+
+        # The search scans the whole gallery, keep it off the event loop
+        with track_stage("face_identification"):
+            match = await asyncio.to_thread(
+                identify_face,
+                facial_embedding,
+                get_verification_threshold(),
+                settings.face_identification_min_margin
+            )
+
+        if not match:
+            raise UnauthorizedError("Facial authentication failed")
+
+        return match.user_id
+
+
     async def login(self, request: LoginDto) -> AuthenticatedDto:
         try:
-            user = await self._get_user_by_email(request.email)
+            # Without an email, identify the user from the face alone
+            if request.email is None:
+                user_id = await self._identify_user(request.image_data)
+
+                # Generate authentication tokens
+                access_token, refresh_token = self._generate_auth_tokens(str(user_id))
+
+                return AuthenticatedDto(
+                    access_token=access_token,
+                    refresh_token=refresh_token
+                )
+
+            credentials = await self._get_login_credentials(request.email)
 
             # If the user with the provided email doesn't exist, raise an error
-            if not user:
+            if not credentials:
                 raise UnauthorizedError("Invalid email or password")
             
             # If password is provided, verify it
-            if request.password and not _ph.verify(user.password, request.password):
-                raise UnauthorizedError("Invalid email or password")
+            if request.password:
+                if not await password_hasher.verify(credentials.password, request.password):
+                    raise UnauthorizedError("Invalid email or password")
+
+                # Upgrade hashes made with older Argon2 parameters
+                if password_hasher.needs_rehash(credentials.password):
+                    await self._update_password_hash(credentials.id, request.password)
             
             # If image_data is provided, generate facial embedding
             if request.image_data:
                 # If the user doesn't have a biometric profile, raise an error
-                if not user.biometric_profile:
+                if credentials.facial_embedding is None:
                     raise BadRequestError("No biometric profile found for this user")
                 
                 # Generate embedding from uploaded image
-                facial_embedding = generate_facial_embedding(request.image_data)
+                facial_embedding = await embedding_batcher.submit(request.image_data)
 
                 # Verify the facial embedding against the stored profile
-                if not verify_facial_embeddings(facial_embedding, user.biometric_profile.facial_embedding):
+                with track_stage("cosine_verify"):
+                    is_match = verify_facial_embeddings(facial_embedding, credentials.facial_embedding)
+                if not is_match:
                     raise UnauthorizedError("Facial authentication failed")
             
             # Generate authentication tokens
-            access_token, refresh_token = self._generate_auth_tokens(str(user.id))
+            access_token, refresh_token = self._generate_auth_tokens(str(credentials.id))
 
             # Return the access and refresh tokens for the authenticated user
             return AuthenticatedDto(
@@ -170,7 +288,7 @@ class AuthService:
                 refresh_token=refresh_token
             )
         
-        except (BadRequestError, UnauthorizedError, InternalServerError) as e:
+        except (BadRequestError, UnauthorizedError, InternalServerError, ServiceUnavailableError) as e:
             raise e
         
         except ValueError as e:
@@ -180,6 +298,143 @@ class AuthService:
             raise InternalServerError(str(e))
     
 
+    async def _get_batch_profiles(self, subjects: list[int | str]) -> dict[int | str, Row]:
+        """
+        Fetch the stored facial embeddings of several users in one query.
+
+        Args:
+            subjects: User IDs and emails
+
+        Returns:
+            dict[int | str, Row]: (id, email, facial_embedding) rows, keyed by
+            both the ID and the email of each user found
+        """
+        ids = [subject for subject in subjects if isinstance(subject, int)]
+        emails = [subject for subject in subjects if isinstance(subject, str)]
+        statement = (
+            select(User.id, User.email, BiometricProfile.facial_embedding)
+            .outerjoin(BiometricProfile, BiometricProfile.user_id == User.id)
+            .where(or_(col(User.id).in_(ids), col(User.email).in_(emails)))
+        )
+
+        profiles = {}
+        for row in (await self.session.exec(statement)).all():
+            profiles[row.id] = profiles[row.email] = row
+        return profiles
+
+
+    async def verify_batch(self, request: BatchVerificationDto, trusted: bool = False) -> BatchVerificationResultDto:
+        """
+        Verify several (subject, image) pairs, e.g. a burst of frames from a gate.
+
+        Every image is embedded in one job for the inference pool, the claimed
+        users' embeddings are loaded with one query, and all pairs are compared
+        at once. A failing item, such as an unknown subject or an image without
+        a face, is reported in its own result without failing the others.
+
+        Only trusted callers, presenting a service API key, get the user IDs,
+        distances, threshold and reasons, and can have tokens issued. Others
+        only learn whether each item matched, with the login's generic error,
+        so the endpoint can't tell which emails exist or guide a spoofed face
+        closer to the threshold.
+
+        Args:
+            request: The subjects and images to verify, and whether to issue tokens
+            trusted: Whether the caller presented a service API key
+
+        Returns:
+            BatchVerificationResultDto: The threshold and the result of each item
+
+        Raises:
+            UnauthorizedError: If tokens are requested by an untrusted caller
+        """
+        try:
+            if request.issue_tokens and not trusted:
+                raise UnauthorizedError("Issuing tokens requires a service API key")
+
+            count = len(request.subjects)
+            results = [BatchVerificationItemDto(subject=subject, match=False) for subject in request.subjects]
+
+            # A subject made of digits is a user ID, anything else must be an email
+            subjects: list[int | str | None] = [None] * count
+            for index, subject in enumerate(request.subjects):
+                try:
+                    subjects[index] = int(subject) if subject.isdigit() else email_adapter.validate_python(subject)
+                except ValidationError:
+                    results[index].error = "Invalid email or user ID"
+
+            images: list = [None] * count
+            for index, upload in enumerate(request.images):
+                try:
+                    images[index] = validate_image_data(upload)
+                except ValueError as e:
+                    results[index].error = str(e)
+
+            profiles = await self._get_batch_profiles([subject for subject in subjects if subject is not None])
+
+            # Only embed the images of items that can still match
+            pending = []
+            for index, subject in enumerate(subjects):
+                if results[index].error is not None:
+                    continue
+                profile = profiles.get(subject)
+                if profile is None:
+                    results[index].error = "User not found"
+                elif profile.facial_embedding is None:
+                    results[index].user_id = profile.id
+                    results[index].error = "No biometric profile found for this user"
+                else:
+                    results[index].user_id = profile.id
+                    pending.append(index)
+
+            embeddings = await embedding_batcher.submit_many([images[index] for index in pending]) if pending else []
+
+            compared, probes, enrolled = [], [], []
+            for index, embedding in zip(pending, embeddings):
+                if isinstance(embedding, ValueError):
+                    results[index].error = str(embedding)
+                else:
+                    compared.append(index)
+                    probes.append(embedding)
+                    enrolled.append(profiles[subjects[index]].facial_embedding)
+
+            threshold = get_verification_threshold()
+            if compared:
+                with track_stage("cosine_verify"):
+                    distances = embedding_codec.cosine_distances(
+                        probes, enrolled, settings.face_verification_template_reduction
+                    )
+
+                for index, distance in zip(compared, distances):
+                    if np.isnan(distance):
+                        results[index].error = "Facial embeddings were produced by different models"
+                        continue
+                    # Rounding can take identical faces slightly below zero
+                    results[index].distance = max(float(distance), 0.0)
+                    results[index].match = bool(distance <= threshold)
+                    if results[index].match and request.issue_tokens:
+                        results[index].access_token, results[index].refresh_token = self._generate_auth_tokens(
+                            str(results[index].user_id)
+                        )
+
+            if not trusted:
+                for result in results:
+                    result.user_id = result.distance = None
+                    result.error = None if result.match else "Facial authentication failed"
+                return BatchVerificationResultDto(results=results)
+
+            return BatchVerificationResultDto(threshold=threshold, results=results)
+
+        except (BadRequestError, UnauthorizedError, InternalServerError, ServiceUnavailableError) as e:
+            raise e
+
+        except ValueError as e:
+            raise BadRequestError(str(e))
+
+        except Exception as e:
+            raise InternalServerError(str(e))
+
+
     async def refresh(
         self, 
         request: Request, 
@@ -207,14 +462,27 @@ class AuthService:
             # Verify the refresh token
             refresh_payload = self._verify_token(token, token_location, "refresh")
 
-            # Create new access token
-            access_token = self.authx.create_access_token(
-                uid=str(refresh_payload.sub),
-                expiry=self.authx.config.JWT_ACCESS_TOKEN_EXPIRES
-            )
+            if not settings.refresh_token_rotation:
+                # Create new access token
+                with track_stage("jwt_issue"):
+                    access_token = token_service.issue_access_token(str(refresh_payload.sub))
 
-            # Return the new access token
-            return NewAccessTokenDto(access_token=access_token)
+                # Return the new access token
+                return NewAccessTokenDto(access_token=access_token)
+
+            # Tokens issued before rotation was enabled have no family, they start their own
+            family = getattr(refresh_payload, "fam", None) or refresh_payload.jti
+            if refresh_token_store.path:
+                # The store then reads and writes its SQLite file, keep it off the event loop
+                await asyncio.to_thread(self._use_refresh_token, refresh_payload, family)
+            else:
+                self._use_refresh_token(refresh_payload, family)
+
+            # Replace the used refresh token with a new one of the same family
+            with track_stage("jwt_issue"):
+                access_token, refresh_token = token_service.issue_pair(str(refresh_payload.sub), family)
+
+            return NewAccessTokenDto(access_token=access_token, refresh_token=refresh_token)
         
         except (BadRequestError, UnauthorizedError, InternalServerError) as e:
             raise e
@@ -223,23 +491,55 @@ class AuthService:
             raise InternalServerError(str(e))
         
 
-    async def get_current_user(self, request: Request) -> UserDto:
+    def _use_refresh_token(self, refresh_payload: TokenPayload, family: str) -> None:
+        """
+        Record the exchange of a refresh token, revoking its family if it was already used.
+
+        Raises:
+            UnauthorizedError: If the family was revoked or the token already used
+        """
+        if refresh_token_store.is_family_revoked(family):
+            raise UnauthorizedError("Refresh token has been revoked")
+
+        # A refresh token is exchanged once. Seeing it again means it was copied, so end the whole session
+        if not refresh_token_store.use(refresh_payload.jti, refresh_payload.expiry_datetime.timestamp()):
+            refresh_token_store.revoke_family(family, time.time() + token_service.refresh_token_expires)
+            raise UnauthorizedError("Refresh token has already been used")
+
+
+    async def get_current_user(self, token_payload: TokenPayload) -> UserDto:
+        """
+        Return the user an access token was issued to.
+
+        The token is verified by the route dependency, and the profile comes
+        from the user cache when possible, so a repeated call costs neither a
+        second verification nor a database query.
+
+        Args:
+            token_payload: The payload of the verified access token
+
+        Returns:
+            UserDto: The current user
+
+        Raises:
+            NotFoundError: If the user no longer exists
+        """
         try:
-            # Get the token from the Authorization header
-            auth_header = request.headers.get("Authorization")
-            token = auth_header.split(" ")[1]
+            user_id = int(token_payload.sub)
 
-            # Verify the access token
-            token_payload = self._verify_token(token, "headers", "access")
+            user = user_cache.get(user_id)
+            if user is None:
+                # Fetch the user by ID from the database
+                db_user = await self.session.get(User, user_id)
 
-            # Fetch the user by ID from the database
-            user = self.session.get(User, token_payload.sub)
+                # If the user is not found, raise an error
+                if not db_user:
+                    raise NotFoundError("User not found")
 
-            # If the user is not found, raise an error
-            if not user:
-                raise NotFoundError("User not found")
+                user = UserDto.model_validate(db_user)
+                user_cache.put(user)
 
-            return UserDto.model_validate(user)
+            return user
         
         except (NotFoundError, UnauthorizedError, InternalServerError) as e:
             raise e
@@ -1,68 +1,272 @@
-import io
+import time
+from typing import Optional
+import cv2
 import numpy as np
-from deepface import DeepFace
-from deepface.modules.verification import find_cosine_distance, find_threshold
-from PIL import Image
-from fastapi import UploadFile
-from api.constants import DEFAULT_MODEL_NAME
+from api.config import settings
+from api.constants import DEFAULT_MODEL_NAME, MIN_IMAGE_RESOLUTION
+from api.utils.embedding_codec import embedding_codec
+from api.utils.image_utils import DecodedImage
+from api.utils.verification_threshold import verification_threshold
 
-def generate_facial_embedding(image_file: UploadFile) -> bytes:
+# DeepFace, and TensorFlow with it, is imported by the functions that run the
+# models, so API processes using a remote inference server never load it
+
+def warm_up_facial_model() -> None:
     """
-    Generate facial embedding from an uploaded image file.
+    Build the face detector and recognition model and run a dummy inference.
 
-    Args:
-        image_file: UploadFile containing the image data
+    The first call pays for loading the weights and the detector model and
+    for allocating the model buffers, so requests served afterwards don't.
+    Also used as the initializer of process-based inference workers.
+    """
+    from deepface import DeepFace
+    from deepface.modules import preprocessing
+
+    client = DeepFace.build_model(DEFAULT_MODEL_NAME)
+
+    # Run the detector once on a blank image to load it
+    blank_image = np.zeros((MIN_IMAGE_RESOLUTION[1], MIN_IMAGE_RESOLUTION[0], 3), dtype=np.uint8)
+    face_objs = DeepFace.extract_faces(
+        img_path=blank_image,
+        detector_backend=settings.face_detector_backend,
+        enforce_detection=False,
+        align=settings.face_detector_align
+    )
+
+    # Run a forward pass with the same preprocessing as real requests
+    target_size = client.input_shape
+    face = preprocessing.resize_image(img=face_objs[0]["face"], target_size=(target_size[1], target_size[0]))
+    client.model(preprocessing.normalize_input(img=face, normalization="base"), training=False)
+
+def _downscale(array: np.ndarray, max_side: int) -> tuple[np.ndarray, float]:
+    """
+    Shrink an image so its longest side is at most max_side pixels.
 
     Returns:
-        bytes: Facial embedding as a byte array
-    
-    Raises:
-        ValueError: If the image cannot be processed or embedding generation fails
+        tuple[np.ndarray, float]: (image, scale), the scale mapping the
+        returned image coordinates back to the input ones
     """
-    try:
-        # Read image data
-        image_data = image_file.file.read()
-        image_file.file.seek(0)  # Reset file pointer for potential future reads
+    height, width = array.shape[:2]
+    if max_side <= 0 or max(height, width) <= max_side:
+        return array, 1.0
+
+    ratio = max_side / max(height, width)
+    size = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+    return cv2.resize(array, size, interpolation=cv2.INTER_AREA), 1 / ratio
+
+def _crop_face_region(array: np.ndarray, facial_area: dict, scale: float, margin: float, target_side: int) -> np.ndarray:
+    """
+    Crop the region around a face found on a downscaled copy out of the original image.
+
+    The box is mapped back to the original coordinates and grown by margin on
+    each side, so the detector can find the face again in the crop. The crop
+    is then shrunk to about twice the model input around the face, which is
+    all the detail the model can use.
+    """
+    height, width = array.shape[:2]
+    x, y = facial_area["x"] * scale, facial_area["y"] * scale
+    w, h = facial_area["w"] * scale, facial_area["h"] * scale
+
+    left, top = max(0, int(x - margin * w)), max(0, int(y - margin * h))
+    right, bottom = min(width, int(x + w + margin * w)), min(height, int(y + h + margin * h))
+    crop = array[top:bottom, left:right]
+
+    max_side = int(2 * target_side * (1 + 2 * margin))
+    return _downscale(crop, max_side)[0]
+
+def detect_face(
+    image: DecodedImage,
+    target_size: tuple[int, int],
+    detector_backend: Optional[str] = None,
+    align: Optional[bool] = None,
+    max_side: Optional[int] = None
+) -> np.ndarray:
+    """
+    Detect the single face in an image and preprocess it for the recognition model.
+
+    Detection runs on a copy downscaled to max_side. When the face found
+    there is smaller than the model input, it loses detail the model could
+    use, so the face region is cropped out of the original image and
+    detected again on that small crop instead.
+
+    Mirrors the preprocessing done by DeepFace.represent, so the batched and
+    single-image paths produce the same embeddings.
+
+    Args:
+        image: The validated uploaded image
+        target_size: Input size (height, width) expected by the model
+        detector_backend: DeepFace detector, defaults to face_detector_backend
+        align: Align the face on the eyes, defaults to face_detector_align
+        max_side: Longest side of the detection copy, defaults to face_detection_max_side
 
-        # Convert to PIL Image
-        image = Image.open(io.BytesIO(image_data))
+    Returns:
+        np.ndarray: Preprocessed face tensor of shape (1, height, width, 3)
 
-        # Convert to RGB if necessary (DeepFace expects RGB)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+    Raises:
+        ValueError: If no face or more than one face is detected
+    """
+    from deepface import DeepFace
+    from deepface.modules import preprocessing
 
-        # Convert PIL Image to numpy array
-        image_array = np.array(image)
+    detector_backend = detector_backend or settings.face_detector_backend
+    align = settings.face_detector_align if align is None else align
+    max_side = settings.face_detection_max_side if max_side is None else max_side
 
-        # Generate embedding using DeepFace
-        embedding_result = DeepFace.represent(
-            img_path=image_array,
-            model_name=DEFAULT_MODEL_NAME,  # Using Facenet512 for high-quality embeddings
-            detector_backend="opencv",
+    try:
+        # Detect and align faces on the reduced image, decoding the pixels on first use
+        array = image.array
+        reduced, scale = _downscale(array, max_side)
+        face_objs = DeepFace.extract_faces(
+            img_path=reduced,
+            detector_backend=detector_backend,
             enforce_detection=True,
-            align=True
+            align=align
         )
-        
-        # DeepFace.represent returns a list of dictionaries, extract the embedding vector
-        if not embedding_result:
+
+        if not face_objs:
             raise ValueError("No face detected in the provided image.")
-        
+
         # Check if multiple faces are detected (only one face is allowed for biometric authentication)
-        if len(embedding_result) > 1:
-            raise ValueError(f"Multiple faces detected in the image. Only one face is allowed for biometric authentication. Found {len(embedding_result)} faces.")
-        
-        # Get the first face's embedding (assuming single face)
-        embedding_vector = embedding_result[0]["embedding"]
-        
-        # Convert embedding to numpy array and then to bytes
-        embedding_array = np.array(embedding_vector, dtype=np.float32)
-        embedding_bytes = embedding_array.tobytes()
-
-        return embedding_bytes
-    
-    except ValueError as e:
+        if len(face_objs) > 1:
+            raise ValueError(f"Multiple faces detected in the image. Only one face is allowed for biometric authentication. Found {len(face_objs)} faces.")
+
+        face = face_objs[0]["face"]
+        facial_area = face_objs[0]["facial_area"]
+        if scale > 1 and min(facial_area["w"], facial_area["h"]) < min(target_size):
+            crop = _crop_face_region(array, facial_area, scale, settings.face_detection_crop_margin, max(target_size))
+            crop_objs = DeepFace.extract_faces(
+                img_path=crop,
+                detector_backend=detector_backend,
+                enforce_detection=False,
+                align=align
+            )
+
+            # Keep the face from the reduced image if the crop is inconclusive
+            if len(crop_objs) == 1 and crop_objs[0]["confidence"] > 0:
+                face = crop_objs[0]["face"]
+
+        # Same channel order, resize and normalization as DeepFace.represent
+        face = face[:, :, ::-1]
+        face = preprocessing.resize_image(img=face, target_size=(target_size[1], target_size[0]))
+        return preprocessing.normalize_input(img=face, normalization="base")
+
+    except (ValueError, OSError) as e:
         raise ValueError(f"Failed to generate facial embedding from the provided image.")
+
+def generate_facial_embeddings_with_timings(
+    images: list[DecodedImage]
+) -> tuple[list[bytes | ValueError], list[dict[str, float]]]:
+    """
+    Generate facial embeddings for several images with one forward pass of the model,
+    and report how long each stage took.
+
+    Face detection runs per image, then all detected faces are stacked into a
+    single batch for the recognition model. A failing image doesn't fail the
+    whole batch: its slot in the result holds the error instead.
+
+    This call is CPU bound and blocking; async callers should run it through
+    the inference pool instead of calling it on the event loop.
+
+    Args:
+        images: The validated uploaded images
+
+    Returns:
+        tuple[list[bytes | ValueError], list[dict[str, float]]]: For each image,
+        the facial embedding encoded with the embedding codec or the ValueError
+        explaining why it couldn't be generated, and the seconds spent in each
+        stage it went through ("decode", "face_detection", "embedding"). For
+        failed images, the last stage listed is the one that failed.
+    """
+    from deepface import DeepFace
+
+    client = DeepFace.build_model(DEFAULT_MODEL_NAME)
+    results: list[bytes | ValueError] = [None] * len(images)
+    timings: list[dict[str, float]] = [{} for _ in images]
+    faces: list[np.ndarray] = []
+    face_indices: list[int] = []
+
+    for index, image in enumerate(images):
+        started_at = time.perf_counter()
+        stage = "decode"
+        try:
+            # Decode first, so detection is timed on its own
+            image.array
+            decoded_at = time.perf_counter()
+            timings[index]["decode"] = decoded_at - started_at
+            started_at, stage = decoded_at, "face_detection"
+
+            faces.append(detect_face(image, client.input_shape))
+            face_indices.append(index)
+        except ValueError as e:
+            results[index] = e
+        timings[index][stage] = time.perf_counter() - started_at
+
+    if faces:
+        # Single batched forward pass over every detected face
+        started_at = time.perf_counter()
+        embeddings = client.model(np.concatenate(faces, axis=0), training=False).numpy().astype(np.float32)
+
+        # Normalize once here, so comparisons later are plain dot products
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), np.finfo(np.float32).eps)
+        for index, embedding in zip(face_indices, embeddings):
+            results[index] = embedding_codec.encode(embedding, normalized=True)
+
+        # Every image of the batch waits for the whole forward pass
+        elapsed = time.perf_counter() - started_at
+        for index in face_indices:
+            timings[index]["embedding"] = elapsed
+
+    return results, timings
+
+def generate_facial_embeddings(images: list[DecodedImage]) -> list[bytes | ValueError]:
+    """
+    Generate facial embeddings for several images with one forward pass of the model.
+
+    See generate_facial_embeddings_with_timings, which also reports stage durations.
+
+    Args:
+        images: The validated uploaded images
+
+    Returns:
+        list[bytes | ValueError]: For each image, the facial embedding encoded
+        with the embedding codec, or the ValueError explaining why it couldn't
+        be generated
+    """
+    return generate_facial_embeddings_with_timings(images)[0]
+
+def generate_facial_embedding(image: DecodedImage) -> bytes:
+    """
+    Generate facial embedding from an uploaded image.
+
+    This call is CPU bound and blocking; async callers should go through the
+    embedding batcher instead of calling it on the event loop.
+
+    Args:
+        image: The validated uploaded image
+
+    Returns:
+        bytes: Facial embedding encoded with the embedding codec
+    
+    Raises:
+        ValueError: If the image cannot be processed or embedding generation fails
+    """
+    result = generate_facial_embeddings([image])[0]
+    if isinstance(result, ValueError):
+        raise result
+    return result
     
+def get_verification_threshold() -> float:
+    """
+    Get the maximum cosine distance accepted as a match for the model.
+
+    Resolved once and cached, see VerificationThreshold for the precedence
+    between the override, the operating-point table and the model default.
+
+    Returns:
+        float: The cosine distance threshold for the default model
+    """
+    return verification_threshold.value
+
 def verify_facial_embeddings(
     embedding1: bytes,
     embedding2: bytes,
@@ -70,22 +274,84 @@ def verify_facial_embeddings(
     """
     Compare two facial embeddings and determine if they match.
 
+    Embeddings normalized at enrollment are compared with a single dot
+    product. The embeddings may be stored with different dtypes; quantized
+    ones are compared without converting them back to float32 when possible.
+    When the stored embedding is a template set, the new embedding is
+    compared with every template at once, and the minimum or mean distance
+    (face_verification_template_reduction) decides.
+
     Args:
-        embedding1: First facial embedding as bytes
-        embedding2: Second facial embedding as bytes
+        embedding1: First facial embedding as stored by the embedding codec
+        embedding2: Second facial embedding or template set as stored by the embedding codec
 
     Returns:
         bool: True if embeddings match, False otherwise
+
+    Raises:
+        ValueError: If the embeddings come from different models
     """
-    # Convert bytes back to numpy arrays
-    embedding1_array = np.frombuffer(embedding1, dtype=np.float32)
-    embedding2_array = np.frombuffer(embedding2, dtype=np.float32)
+    if embedding_codec.is_template_set(embedding2):
+        cosine_distance = float(embedding_codec.cosine_distances(
+            [embedding1], [embedding2], settings.face_verification_template_reduction
+        )[0])
+        if np.isnan(cosine_distance):
+            raise ValueError("Facial embeddings were produced by different models")
+    else:
+        cosine_distance = embedding_codec.cosine_distance(embedding1, embedding2)
+
+    # Determine verification result
+    return cosine_distance <= get_verification_threshold()
 
-    # Calculate cosine distance between embeddings
-    cosine_distance = find_cosine_distance(embedding1_array, embedding2_array)
+def aggregate_facial_embeddings(
+    embeddings: list[bytes],
+    aggregation: Optional[str] = None,
+    max_templates: Optional[int] = None,
+    threshold: Optional[float] = None
+) -> bytes:
+    """
+    Combine the embeddings of several enrollment frames into the one stored for the user.
 
-    # Get decision threshold for your model (pre-tuned values)
-    threshold = find_threshold(DEFAULT_MODEL_NAME, "cosine")
+    Frames are checked against the medoid, the frame closest to all others:
+    those farther than the verification threshold (a blink, a blurred frame,
+    someone else in view) are dropped, and more than half of the frames must
+    remain. The remaining frames are stored as their normalized centroid, or
+    as a template set of the frames closest to the centroid.
 
-    # Determine verification result
-    return cosine_distance <= threshold
+    Args:
+        embeddings: Facial embeddings of the frames, as encoded by the embedding codec
+        aggregation: 'centroid' or 'templates', defaults to face_enrollment_aggregation
+        max_templates: Most templates kept, defaults to face_enrollment_max_templates
+        threshold: Consistency threshold, defaults to the verification threshold
+
+    Returns:
+        bytes: A single embedding, or a template set
+
+    Raises:
+        ValueError: If the frames don't consistently show the same face
+    """
+    if len(embeddings) == 1:
+        return embeddings[0]
+
+    aggregation = aggregation or settings.face_enrollment_aggregation
+    max_templates = max_templates or settings.face_enrollment_max_templates
+    threshold = get_verification_threshold() if threshold is None else threshold
+
+    vectors = np.stack([embedding_codec.to_float32(embedding) for embedding in embeddings])
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), np.finfo(np.float32).eps)
+
+    # Keep the frames matching the medoid
+    similarities = vectors @ vectors.T
+    medoid = vectors[np.argmax(similarities.sum(axis=1))]
+    consistent = vectors[1.0 - vectors @ medoid <= threshold]
+    if len(consistent) * 2 <= len(vectors):
+        raise ValueError("The enrollment images don't consistently show the same face")
+
+    centroid = consistent.mean(axis=0)
+    centroid /= max(float(np.linalg.norm(centroid)), float(np.finfo(np.float32).eps))
+    if aggregation == 'centroid' or len(consistent) == 1:
+        return embedding_codec.encode(centroid, normalized=True)
+
+    # The frames closest to the centroid are the most typical of the user
+    closest = np.argsort(1.0 - consistent @ centroid)[:max_templates]
+    return embedding_codec.encode_templates(consistent[closest], normalized=True)
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from typing import Optional
+from api.config import settings
+from api.errors import ServiceUnavailableError
+from api.utils.deepface_utils import generate_facial_embeddings_with_timings
+from api.utils.embedding_cache import EmbeddingCache, embedding_cache
+from api.utils.image_utils import DecodedImage
+from api.utils.inference_pool import InferencePool, inference_pool
+from api.utils.metrics import Histogram, observe_stage
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler for facial embedding generation.
+
+    Concurrent requests are gathered for a short window (or until the batch is
+    full) and sent to the inference pool as a single job, so the recognition
+    model runs one batched forward pass instead of one pass per image. Each
+    request gets back the embedding of its own image, along with the time its
+    image spent in each stage, recorded in the request's own context so the
+    stage metrics are attributed to the right endpoint.
+
+    Images already embedded recently are answered from the cache without
+    being queued.
+    """
+
+    def __init__(
+        self,
+        pool: InferencePool,
+        window_ms: float = 10,
+        max_batch_size: int = 8,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.pool = pool
+        self.cache = cache
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_pending = pool.max_queue_size * max_batch_size
+        self.batch_size_histogram = Histogram(buckets=(1, 2, 4, 8, 16, 32, 64))
+        self.wait_time_histogram = Histogram(buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5))
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._batches: set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of images waiting for the next batch."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the batch collector on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._collector is not None and not self._collector.done() and self._collector.get_loop() is loop:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """Stop collecting and wait for batches already sent to the pool."""
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+            self._collector = None
+
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    async def submit(self, image: DecodedImage) -> bytes:
+        """
+        Queue an image for the next batch and await its facial embedding.
+
+        Args:
+            image: The validated uploaded image
+
+        Returns:
+            bytes: Facial embedding as a byte array
+
+        Raises:
+            ValueError: If the embedding couldn't be generated for this image
+            ServiceUnavailableError: If too many images are already waiting
+        """
+        cache_key = None
+        if self.cache is not None and self.cache.enabled:
+            cache_key = self.cache.key(image)
+            cached_embedding = self.cache.get(cache_key)
+            if cached_embedding is not None:
+                return cached_embedding
+
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+
+        try:
+            self._queue.put_nowait((image, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise ServiceUnavailableError(
+                "Facial recognition is busy. Please, try again later.",
+                retry_after=self.pool.retry_after_seconds
+            )
+
+        result, timings = await future
+        self._observe_stages(result, timings)
+
+        if isinstance(result, BaseException):
+            raise result
+
+        embedding = result
+        if cache_key is not None:
+            self.cache.put(cache_key, embedding)
+        return embedding
+
+    async def submit_many(self, images: list[DecodedImage]) -> list[bytes | ValueError]:
+        """
+        Embed the images of a single request together, in one job.
+
+        The images already make a batch, so they skip the batching window and
+        go to the inference pool directly, apart from those answered by the cache.
+
+        Args:
+            images: The validated uploaded images
+
+        Returns:
+            list[bytes | ValueError]: For each image, its facial embedding or the
+            ValueError explaining why it couldn't be generated
+
+        Raises:
+            ServiceUnavailableError: If the inference pool is full
+        """
+        results: list[bytes | ValueError] = [None] * len(images)
+        cache_keys: list[Optional[bytes]] = [None] * len(images)
+        misses = []
+
+        for index, image in enumerate(images):
+            if self.cache is not None and self.cache.enabled:
+                cache_keys[index] = self.cache.key(image)
+                results[index] = self.cache.get(cache_keys[index])
+            if results[index] is None:
+                misses.append(index)
+
+        if misses:
+            self.batch_size_histogram.observe(len(misses))
+            embeddings, timings = await self.pool.run(
+                generate_facial_embeddings_with_timings,
+                [images[index] for index in misses]
+            )
+
+            for index, embedding, image_timings in zip(misses, embeddings, timings):
+                self._observe_stages(embedding, image_timings)
+                results[index] = embedding
+                if cache_keys[index] is not None and not isinstance(embedding, BaseException):
+                    self.cache.put(cache_keys[index], embedding)
+
+        return results
+
+    @staticmethod
+    def _observe_stages(result: bytes | BaseException, timings: dict[str, float]) -> None:
+        # The last stage of a failed image is the one that failed
+        last_stage = next(reversed(timings), None)
+        for stage, seconds in timings.items():
+            failed = isinstance(result, BaseException) and stage == last_stage
+            observe_stage(stage, seconds, "error" if failed else "success")
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            # Block until the first item, then fill the batch until the window closes
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window_seconds
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Don't wait for the batch to finish, so other workers can take the next one
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: list[tuple[DecodedImage, asyncio.Future, float]]) -> None:
+        dispatched_at = time.perf_counter()
+        self.batch_size_histogram.observe(len(batch))
+        for _, _, queued_at in batch:
+            self.wait_time_histogram.observe(dispatched_at - queued_at)
+
+        try:
+            results, timings = await self.pool.run(
+                generate_facial_embeddings_with_timings,
+                [image for image, _, _ in batch]
+            )
+        except Exception as e:
+            results, timings = [e] * len(batch), [{} for _ in batch]
+
+        for (_, future, queued_at), result, image_timings in zip(batch, results, timings):
+            # The request may have been cancelled while waiting
+            if future.done():
+                continue
+            future.set_result((result, {"inference_queue": dispatched_at - queued_at, **image_timings}))
+
+    def stats(self) -> dict:
+        """Return the batch size and queue wait time histograms."""
+        return {
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "wait_time_seconds": self.wait_time_histogram.snapshot()
+        }
+
+
+# Global embedding batcher instance
+embedding_batcher = EmbeddingBatcher(
+    pool=inference_pool,
+    window_ms=settings.embedding_batch_window_ms,
+    max_batch_size=settings.embedding_batch_max_size,
+    cache=embedding_cache
+)
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from api.config import settings
+from api.constants import DEFAULT_MODEL_NAME
+from api.utils.image_utils import DecodedImage
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of facial embeddings keyed by image content.
+
+    Clients retrying a face login after a network blip usually resend the
+    exact same frame, so the embedding computed for the first attempt can be
+    reused instead of running the model again. Entries expire after a TTL and
+    the least recently used ones are evicted once the byte budget is reached.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[bytes, tuple[bytes, float]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image: DecodedImage, model_name: str = DEFAULT_MODEL_NAME) -> bytes:
+        """Hash the uploaded bytes together with the model that embeds them."""
+        digest = hashlib.blake2b(model_name.encode(), digest_size=16)
+        digest.update(image.data)
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Return the cached embedding for a key, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, embedding: bytes) -> None:
+        """Store an embedding, evicting the least recently used entries if needed."""
+        size = len(key) + len(embedding)
+        if not self.enabled or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+
+            self._entries[key] = (embedding, time.monotonic() + self.ttl_seconds)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _evict(self, key: bytes) -> None:
+        embedding, _ = self._entries.pop(key)
+        self._size -= len(key) + len(embedding)
+
+    def clear(self) -> None:
+        """Drop every cached embedding."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Return hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# Global embedding cache instance
+embedding_cache = EmbeddingCache(
+    max_bytes=int(settings.embedding_cache_max_mb * 1024 * 1024),
+    ttl_seconds=settings.embedding_cache_ttl_seconds,
+    enabled=settings.embedding_cache_enabled
+)
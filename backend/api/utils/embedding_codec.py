@@ -0,0 +1,322 @@
+import struct
+from dataclasses import dataclass
+from typing import Literal
+import numpy as np
+from api.config import settings
+from api.constants import DEFAULT_MODEL_NAME
+
+EmbeddingDType = Literal['float32', 'float16', 'int8']
+
+@dataclass(slots=True)
+class Embedding:
+    """A decoded facial embedding, still in its stored (possibly quantized) form."""
+
+    model_name: str
+    dimension: int
+    dtype: EmbeddingDType
+    normalized: bool
+    values: np.ndarray
+    scale: float = 1.0
+
+    def to_float32(self) -> np.ndarray:
+        """Return the embedding as a float32 vector, dequantizing it if needed."""
+        vector = self.values.astype(np.float32)
+        if self.dtype == 'int8':
+            vector *= self.scale
+        return vector
+
+
+class EmbeddingCodec:
+    """
+    Versioned binary format for stored facial embeddings.
+
+    Each blob starts with a header recording the format version, the model
+    that produced the embedding, its dimension, storage dtype and whether it
+    was L2-normalized, followed by the values:
+
+        magic "FEMB" | version u8 | dtype u8 | flags u8 | dimension u16 |
+        model name length u8 | model name | scale f32 | values
+
+    Values are stored as float32, float16 (half the size) or int8 with a
+    per-vector scale (about a quarter of the size). Blobs without the header
+    are raw float32 embeddings written before this format existed, and are
+    still decoded as such.
+
+    A user enrolled from several frames may instead have a template set: the
+    normalized centroid of the templates followed by the templates, each
+    encoded as above and prefixed with its length:
+
+        magic "FEMS" | version u8 | count u8 | (length u16 | embedding) * (count + 1)
+
+    Decoding a template set yields its centroid, so code working with one
+    vector per user reads it like any other embedding.
+    """
+
+    MAGIC = b"FEMB"
+    SET_MAGIC = b"FEMS"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBBBH")
+    SET_HEADER = struct.Struct("<4sBB")
+    MEMBER_LENGTH = struct.Struct("<H")
+    SCALE = struct.Struct("<f")
+    DTYPES: dict[str, int] = {'float32': 0, 'float16': 1, 'int8': 2}
+    FLAG_NORMALIZED = 0x01
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, dtype: EmbeddingDType = 'float32'):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.model_name = model_name
+        self.dtype = dtype
+
+        # Parsed headers by their bytes up to the scale, which only vary with the model and dtype
+        self._layouts: dict[bytes, tuple[str, int, str, np.dtype, bool, int]] = {}
+
+    @staticmethod
+    def quantize(vector: np.ndarray, dtype: EmbeddingDType) -> tuple[np.ndarray, float]:
+        """
+        Convert a float32 vector to the given storage dtype.
+
+        Returns:
+            tuple[np.ndarray, float]: (values, scale), where scale maps int8
+            values back to floats and is 1.0 for the other dtypes
+        """
+        if dtype == 'float32':
+            return vector.astype(np.float32), 1.0
+        if dtype == 'float16':
+            return vector.astype(np.float16), 1.0
+
+        # Symmetric int8 quantization, the largest component maps to +/-127
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127 if peak > 0 else 1.0
+        values = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return values, scale
+
+    def encode(self, vector: np.ndarray, normalized: bool = False) -> bytes:
+        """
+        Serialize an embedding with the codec's model name and storage dtype.
+
+        Args:
+            vector: The embedding as produced by the model
+            normalized: Whether the vector has already been L2-normalized
+
+        Returns:
+            bytes: The header followed by the stored values
+        """
+        values, scale = self.quantize(np.asarray(vector, dtype=np.float32).ravel(), self.dtype)
+        model_name = self.model_name.encode("ascii")
+        flags = self.FLAG_NORMALIZED if normalized else 0
+
+        return b"".join((
+            self.HEADER.pack(self.MAGIC, self.VERSION, self.DTYPES[self.dtype], flags, len(values)),
+            bytes((len(model_name),)),
+            model_name,
+            self.SCALE.pack(scale),
+            values.tobytes()
+        ))
+
+    def encode_templates(self, vectors: np.ndarray, normalized: bool = False) -> bytes:
+        """
+        Serialize several embeddings of one user as a template set.
+
+        Args:
+            vectors: The embeddings, one per row
+            normalized: Whether the rows have already been L2-normalized
+
+        Returns:
+            bytes: The template set, starting with the normalized centroid
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        centroid = vectors.mean(axis=0)
+        centroid /= max(float(np.linalg.norm(centroid)), float(np.finfo(np.float32).eps))
+
+        members = [self.encode(centroid, normalized=True)]
+        members += [self.encode(vector, normalized=normalized) for vector in vectors]
+        return b"".join([
+            self.SET_HEADER.pack(self.SET_MAGIC, self.VERSION, len(vectors)),
+            *(self.MEMBER_LENGTH.pack(len(member)) + member for member in members)
+        ])
+
+    def is_template_set(self, blob: bytes) -> bool:
+        """Whether a stored blob is a template set rather than a single embedding."""
+        return blob.startswith(self.SET_MAGIC)
+
+    def _members(self, blob: bytes) -> list[bytes]:
+        """Split a template set into its centroid and templates."""
+        magic, version, count = self.SET_HEADER.unpack_from(blob)
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported template set version: {version}")
+
+        members, offset = [], self.SET_HEADER.size
+        for _ in range(count + 1):
+            (length,) = self.MEMBER_LENGTH.unpack_from(blob, offset)
+            offset += self.MEMBER_LENGTH.size
+            members.append(blob[offset:offset + length])
+            offset += length
+        return members
+
+    def decode_templates(self, blob: bytes) -> list[Embedding]:
+        """
+        Parse the templates of a stored blob.
+
+        Returns:
+            list[Embedding]: The templates of a template set, or the embedding
+            itself for a single embedding
+        """
+        if not self.is_template_set(blob):
+            return [self.decode(blob)]
+        return [self.decode(member) for member in self._members(blob)[1:]]
+
+    def decode(self, blob: bytes) -> Embedding:
+        """
+        Parse a stored embedding without dequantizing it.
+
+        Template sets are decoded to their centroid.
+
+        Raises:
+            ValueError: If the blob has a header but is malformed
+        """
+        if self.is_template_set(blob):
+            return self.decode(self._members(blob)[0])
+
+        if not blob.startswith(self.MAGIC):
+            # Raw float32 embedding from before the versioned format
+            values = np.frombuffer(blob, dtype=np.float32)
+            return Embedding(DEFAULT_MODEL_NAME, len(values), 'float32', False, values)
+
+        model_name, dimension, dtype, numpy_dtype, normalized, offset = self._layout(blob)
+        (scale,) = self.SCALE.unpack_from(blob, offset)
+        values = np.frombuffer(blob, dtype=numpy_dtype, count=dimension, offset=offset + self.SCALE.size)
+        return Embedding(model_name, dimension, dtype, normalized, values, scale)
+
+    def _prefix(self, blob: bytes) -> bytes:
+        """Header bytes of a blob up to the scale."""
+        return blob[:self.HEADER.size + 1 + blob[self.HEADER.size]]
+
+    def _layout(self, blob: bytes) -> tuple[str, int, str, np.dtype, bool, int]:
+        """Header fields of a blob: (model name, dimension, dtype, NumPy dtype, normalized, scale offset)."""
+        prefix = self._prefix(blob)
+        layout = self._layouts.get(prefix)
+        if layout is None:
+            layout = self._layouts[prefix] = self._parse_layout(prefix)
+        return layout
+
+    def _parse_layout(self, prefix: bytes) -> tuple[str, int, str, np.dtype, bool, int]:
+        """Parse the header bytes preceding the scale."""
+        magic, version, dtype_code, flags, dimension = self.HEADER.unpack_from(prefix)
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported embedding format version: {version}")
+
+        dtype = next((name for name, code in self.DTYPES.items() if code == dtype_code), None)
+        if dtype is None:
+            raise ValueError(f"Unsupported embedding dtype code: {dtype_code}")
+
+        model_name = prefix[self.HEADER.size + 1:].decode("ascii")
+        return model_name, dimension, dtype, np.dtype(dtype), bool(flags & self.FLAG_NORMALIZED), len(prefix)
+
+    def to_float32(self, blob: bytes) -> np.ndarray:
+        """Decode a stored embedding into a float32 vector."""
+        return self.decode(blob).to_float32()
+
+    def cosine_distance(self, blob1: bytes, blob2: bytes) -> float:
+        """
+        Cosine distance between two stored embeddings.
+
+        Two normalized embeddings are compared with a single dot product (times
+        the int8 scales). Otherwise, two int8 embeddings are compared on their
+        integer values, since the per-vector scales cancel out in the cosine,
+        and other combinations are compared in float32.
+
+        Raises:
+            ValueError: If the embeddings come from different models or dimensions
+        """
+        if blob1.startswith(self.MAGIC) and blob2.startswith(self._prefix(blob1)):
+            # Same model, dtype and flags: read the values without building Embedding objects
+            model_name, dimension, dtype, numpy_dtype, normalized, offset = self._layout(blob1)
+            if normalized and dtype == 'float32':
+                offset += self.SCALE.size
+                values1 = np.frombuffer(blob1, dtype=numpy_dtype, count=dimension, offset=offset)
+                values2 = np.frombuffer(blob2, dtype=numpy_dtype, count=dimension, offset=offset)
+                return 1.0 - float(values1 @ values2)
+
+        embedding1, embedding2 = self.decode(blob1), self.decode(blob2)
+        if embedding1.model_name != embedding2.model_name or embedding1.dimension != embedding2.dimension:
+            raise ValueError("Facial embeddings were produced by different models")
+
+        if embedding1.normalized and embedding2.normalized:
+            if embedding1.dtype == embedding2.dtype == 'float32':
+                similarity = embedding1.values @ embedding2.values
+            elif embedding1.dtype == embedding2.dtype == 'int8':
+                dot = int(embedding1.values.astype(np.int32) @ embedding2.values.astype(np.int32))
+                similarity = dot * embedding1.scale * embedding2.scale
+            else:
+                similarity = embedding1.to_float32() @ embedding2.to_float32()
+            return 1.0 - float(similarity)
+
+        if embedding1.dtype == embedding2.dtype == 'int8':
+            vector1 = embedding1.values.astype(np.int32)
+            vector2 = embedding2.values.astype(np.int32)
+        else:
+            vector1, vector2 = embedding1.to_float32(), embedding2.to_float32()
+
+        denominator = np.sqrt(float(vector1 @ vector1) * float(vector2 @ vector2))
+        if denominator == 0:
+            return 1.0
+        return 1.0 - float(vector1 @ vector2) / denominator
+
+    def cosine_distances(
+        self,
+        blobs1: list[bytes],
+        blobs2: list[bytes],
+        reduction: Literal['min', 'mean'] = 'min'
+    ) -> np.ndarray:
+        """
+        Cosine distances between two lists of stored embeddings, pair by pair.
+
+        The second list may hold template sets: the embedding paired with a
+        set is compared with each of its templates, and those distances are
+        reduced to their minimum or mean. Every comparison is made at once,
+        with the pairs decoded into two float32 matrices compared row by row.
+
+        Returns:
+            np.ndarray: The distance of each pair, NaN for pairs whose embeddings
+            come from different models or dimensions
+        """
+        if not blobs1:
+            return np.empty(0, dtype=np.float32)
+
+        # One row per (embedding, template) comparison, owned by its pair
+        rows1, rows2, owners = [], [], []
+        for index, (blob1, blob2) in enumerate(zip(blobs1, blobs2)):
+            embedding1 = self.decode(blob1)
+            for embedding2 in self.decode_templates(blob2):
+                rows1.append(embedding1)
+                rows2.append(embedding2)
+                owners.append(index)
+        distances = np.full(len(rows1), np.nan, dtype=np.float32)
+
+        # Stack the comparable rows of each dimension into matrices
+        groups: dict[int, list[int]] = {}
+        for row, (embedding1, embedding2) in enumerate(zip(rows1, rows2)):
+            if embedding1.model_name == embedding2.model_name and embedding1.dimension == embedding2.dimension:
+                groups.setdefault(embedding1.dimension, []).append(row)
+
+        for rows in groups.values():
+            matrix1 = np.stack([rows1[row].to_float32() for row in rows])
+            matrix2 = np.stack([rows2[row].to_float32() for row in rows])
+            dots = np.einsum("ij,ij->i", matrix1, matrix2)
+            norms = np.linalg.norm(matrix1, axis=1) * np.linalg.norm(matrix2, axis=1)
+            distances[rows] = np.where(norms > 0, 1.0 - dots / np.maximum(norms, np.finfo(np.float32).tiny), 1.0)
+
+        if len(distances) == len(blobs1):
+            return distances
+
+        # Reduce the rows of each pair, which are contiguous; NaN rows make the pair NaN
+        owners = np.asarray(owners)
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+        if reduction == 'min':
+            return np.minimum.reduceat(distances, starts)
+        return (np.add.reduceat(distances, starts) / np.diff(np.r_[starts, len(owners)])).astype(np.float32)
+
+
+# Global embedding codec instance
+embedding_codec = EmbeddingCodec(model_name=DEFAULT_MODEL_NAME, dtype=settings.embedding_storage_dtype)
@@ -0,0 +1,337 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+from itertools import islice
+from typing import Iterable, Optional
+import numpy as np
+from sqlalchemy import text
+from sqlmodel import Session, select, col, func, or_
+from api.config import settings
+from api.database import engine, IS_SQLITE
+from api.indexes import FaceIndex, FaceMatch, ExactFaceIndex, IVFFaceIndex, EmbeddingSnapshot, SnapshotPosition
+from api.models import BiometricProfile
+
+logger = logging.getLogger("uvicorn.error")
+
+# Profiles changed this long before a saved index was loaded are still added again when restoring it
+RECONCILE_SLACK = timedelta(seconds=5)
+
+
+def create_face_index() -> FaceIndex:
+    """Create the face index backend selected in the settings."""
+    if settings.face_index_backend == 'ivf':
+        return IVFFaceIndex(
+            dtype=settings.face_index_dtype,
+            n_lists=settings.face_index_ivf_lists,
+            n_probes=settings.face_index_ivf_probes
+        )
+    return ExactFaceIndex(dtype=settings.face_index_dtype)
+
+
+def create_embedding_snapshot() -> Optional[EmbeddingSnapshot]:
+    """Create the embedding snapshot, if face_index_snapshot_path is set."""
+    if not settings.face_index_snapshot_path:
+        return None
+    return EmbeddingSnapshot(settings.face_index_snapshot_path, dtype=settings.face_index_dtype)
+
+
+def _snapshot_profiles(profiles: list[tuple[int, int, bytes]]) -> None:
+    """Append (id, user_id, facial_embedding) rows to the embedding snapshot."""
+    prepared = [face_index.prepare(facial_embedding) for _, _, facial_embedding in profiles]
+    embedding_snapshot.append(
+        np.array([profile_id for profile_id, _, _ in profiles], dtype=np.int64),
+        np.array([user_id for _, user_id, _ in profiles], dtype=np.int64),
+        np.stack([row for row, _ in prepared]),
+        np.array([scale for _, scale in prepared], dtype=np.float32)
+    )
+
+
+def _append_profiles(profiles: Iterable[tuple[int, int, bytes]]) -> None:
+    """Add (id, user_id, facial_embedding) rows to the face index and the snapshot, a chunk at a time."""
+    profiles = iter(profiles)
+    while chunk := list(islice(profiles, FaceIndex.CHUNK_SIZE)):
+        for _, user_id, facial_embedding in chunk:
+            face_index.add(user_id, facial_embedding)
+        _snapshot_profiles(chunk)
+
+
+def _rebuild_embedding_snapshot(session: Session) -> None:
+    """Write the snapshot from every biometric profile, then fill the face index from it."""
+    empty = np.zeros(0, dtype=np.int64)
+    embedding_snapshot.write(empty, empty, np.zeros((0, face_index.dimension), dtype=face_index.dtype), empty)
+
+    statement = select(BiometricProfile.id, BiometricProfile.user_id, BiometricProfile.facial_embedding)
+    profiles = iter(session.exec(statement.order_by(BiometricProfile.id)))
+    while chunk := list(islice(profiles, FaceIndex.CHUNK_SIZE)):
+        _snapshot_profiles(chunk)
+
+    content = embedding_snapshot.read(follow=True)
+    face_index.load_rows(content.user_ids, content.rows, content.scales)
+    _follow_embedding_snapshot(content.position)
+
+
+def _highest_profile_id(session: Session) -> Optional[int]:
+    """
+    Return the highest biometric profile ID ever given out, or None if IDs may be reused.
+
+    On SQLite, the ID of the last profile deleted is reused unless the table
+    is AUTOINCREMENT, which tables created by earlier versions aren't; their
+    highest ID is known from sqlite_sequence instead of the remaining rows.
+    """
+    if not IS_SQLITE:
+        return session.exec(select(func.max(BiometricProfile.id))).one() or 0
+
+    table = BiometricProfile.__tablename__
+    definition = session.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"), {"table": table})
+    if definition is None or "AUTOINCREMENT" not in definition.upper():
+        return None
+    return session.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = :table"), {"table": table}) or 0
+
+
+def _load_embedding_snapshot(session: Session) -> None:
+    """
+    Fill the face index from the embedding snapshot, and bring both up to date with the database.
+
+    Profiles inserted since the snapshot was written have higher IDs than any
+    of its records and are appended. Aggregates over the older profiles, read
+    from the user_id index without touching the embeddings, tell whether any
+    of them were deleted or replaced meanwhile; only then are the profile IDs
+    compared user by user. This relies on IDs never being reused: with a
+    SQLite table that would reuse them, the snapshot is rebuilt every time.
+    """
+    highest_profile_id = _highest_profile_id(session)
+    try:
+        content = embedding_snapshot.read(follow=True)
+    except (OSError, ValueError):
+        content = None
+
+    # Missing, unusable, ahead of the database and so written for another one, or unverifiable
+    if content is None or highest_profile_id is None or content.sequence > highest_profile_id:
+        if content is not None:
+            content.position.file.close()
+        _rebuild_embedding_snapshot(session)
+        return
+
+    # Superseded records only slow down startups, drop them once they outnumber the live ones
+    if content.dead_records > len(content.user_ids):
+        content.position.file.close()
+        embedding_snapshot.compact()
+        content = embedding_snapshot.read(follow=True)
+
+    face_index.load_rows(content.user_ids, content.rows, content.scales)
+    _follow_embedding_snapshot(content.position)
+
+    statement = select(func.count(), func.sum(BiometricProfile.id), func.sum(BiometricProfile.user_id)).where(
+        BiometricProfile.id <= content.sequence
+    )
+    count, id_sum, user_id_sum = session.exec(statement).one()
+    if (count, id_sum or 0, user_id_sum or 0) != (len(content.user_ids), int(content.sequences.sum()), int(content.user_ids.sum())):
+        stored = dict(session.exec(
+            select(BiometricProfile.user_id, BiometricProfile.id).where(BiometricProfile.id <= content.sequence)
+        ).all())
+        snapshotted = dict(zip(content.user_ids.tolist(), content.sequences.tolist()))
+
+        removed = list(snapshotted.keys() - stored.keys())
+        for user_id in removed:
+            face_index.remove(user_id)
+        embedding_snapshot.append_removals(np.array(removed, dtype=np.int64))
+
+        replaced = [profile_id for user_id, profile_id in stored.items() if snapshotted.get(user_id) != profile_id]
+        statement = select(BiometricProfile.id, BiometricProfile.user_id, BiometricProfile.facial_embedding)
+        _append_profiles(session.exec(statement.where(col(BiometricProfile.id).in_(replaced))))
+
+    statement = select(BiometricProfile.id, BiometricProfile.user_id, BiometricProfile.facial_embedding)
+    _append_profiles(session.exec(statement.where(BiometricProfile.id > content.sequence).order_by(BiometricProfile.id)))
+
+
+def _restore_face_index() -> Optional[float]:
+    """Memory-map the saved face index, returning the time it was saved as of, or None if there is no usable copy."""
+    if not (isinstance(face_index, IVFFaceIndex) and settings.face_index_path and os.path.isdir(settings.face_index_path)):
+        return None
+
+    try:
+        return face_index.restore(settings.face_index_path)
+    except (OSError, ValueError):
+        return None
+
+
+def _reconcile_face_index(session: Session, as_of: float) -> None:
+    """
+    Bring a restored face index up to date with the database.
+
+    Users whose profile is gone are removed. Profiles missing from the index,
+    or created or updated since it was loaded, are added again, replacing
+    the embedding saved for their user.
+    """
+    stored_ids = set(session.exec(select(BiometricProfile.user_id)))
+    indexed_ids = face_index.user_ids()
+
+    for user_id in indexed_ids - stored_ids:
+        face_index.remove(user_id)
+
+    # Database timestamps may be truncated to the second, and written with another clock
+    since = datetime.fromtimestamp(as_of, UTC) - RECONCILE_SLACK
+    statement = select(BiometricProfile.user_id, BiometricProfile.facial_embedding).where(
+        or_(
+            col(BiometricProfile.user_id).in_(stored_ids - indexed_ids),
+            col(BiometricProfile.created_at) >= since,
+            col(BiometricProfile.updated_at) >= since
+        )
+    )
+    for user_id, facial_embedding in session.exec(statement):
+        face_index.add(user_id, facial_embedding)
+
+
+def load_face_index() -> None:
+    """
+    Fill the global face index with every biometric profile in the database.
+
+    When the index can be persisted and face_index_path holds a saved copy, it
+    is memory-mapped instead of rebuilt, then reconciled with the profiles
+    added, removed or replaced since it was loaded. A saved copy that can't be used, for
+    instance one written with another face_index_dtype, is rebuilt instead.
+
+    Otherwise, when face_index_snapshot_path is set, the index is filled from
+    the embedding snapshot, see _load_embedding_snapshot.
+
+    Either way, when face_index_snapshot_path is set, the index then follows
+    the snapshot to pick up the profiles other workers add, see sync_face_index.
+    """
+    global _loaded_at
+    # Changes committed from here on may be missed by this load, a later restore catches up from this time
+    _loaded_at = time.time()
+
+    with Session(engine) as session:
+        as_of = _restore_face_index()
+        if as_of is None and embedding_snapshot is not None:
+            _load_embedding_snapshot(session)
+            # Profiles other workers added while this one was starting
+            sync_face_index()
+            return
+
+        if as_of is None:
+            statement = select(BiometricProfile.user_id, BiometricProfile.facial_embedding)
+            face_index.load(session.exec(statement))
+            return
+
+        _reconcile_face_index(session, as_of)
+
+    if embedding_snapshot is not None:
+        try:
+            _follow_embedding_snapshot(embedding_snapshot.read(follow=True).position)
+        except (OSError, ValueError):
+            pass
+
+
+def _follow_embedding_snapshot(position: SnapshotPosition) -> None:
+    """Record the position in the embedding snapshot up to which its records are in the face index."""
+    global _snapshot_position
+    if _snapshot_position is not None and _snapshot_position.file is not position.file:
+        _snapshot_position.file.close()
+    _snapshot_position = position
+
+
+def _apply_snapshot_records(records: np.ndarray) -> None:
+    """Apply snapshot records to the face index, in file order."""
+    for user_id, flags, row, scale in zip(
+        records["user_id"].tolist(), records["flags"].tolist(), records["vector"], records["scale"].tolist()
+    ):
+        if flags == EmbeddingSnapshot.REMOVED:
+            face_index.remove(user_id)
+        else:
+            face_index.add_row(user_id, row, scale)
+
+
+def sync_face_index() -> None:
+    """
+    Apply the records appended to the embedding snapshot since the face index last read it.
+
+    Each worker process holds its own face index, and only adds the profiles
+    it registers itself. The others reach it through the shared snapshot:
+    the records appended since the last sync are applied, or the whole index
+    is reloaded if the file was replaced, by a compaction or a rebuild in a
+    worker starting. When nothing was appended, this costs two stat calls.
+    """
+    if embedding_snapshot is None or _snapshot_position is None:
+        return
+
+    with _snapshot_lock:
+        try:
+            appended = embedding_snapshot.read_since(_snapshot_position)
+            if appended is None:
+                content = embedding_snapshot.read(follow=True)
+                face_index.load_rows(content.user_ids, content.rows, content.scales)
+                _follow_embedding_snapshot(content.position)
+                return
+        except (OSError, ValueError):
+            # Keep serving from the index as it is, the next sync tries again
+            return
+
+        records, position = appended
+        _apply_snapshot_records(records)
+        _follow_embedding_snapshot(position)
+
+
+def identify_face(facial_embedding: bytes, threshold: float, min_margin: float = 0.0) -> Optional[FaceMatch]:
+    """
+    Identify the enrolled user matching an embedding, including the profiles other workers added.
+
+    Blocks on the snapshot file and scans the index, run it in a worker thread.
+    See FaceIndex.identify for the arguments. The distance and margin of
+    the best candidate are logged, to tune face_identification_min_margin.
+    """
+    sync_face_index()
+    match = face_index.closest(facial_embedding)
+    if match is None:
+        return None
+
+    accepted = face_index.accepts(match, threshold, min_margin)
+    logger.info(
+        "Face identification %s: distance %.4f, margin %.4f (threshold %.4f, min margin %.4f)",
+        "accepted" if accepted else "rejected", match.distance, match.margin, threshold, min_margin
+    )
+    return match if accepted else None
+
+
+def index_profile(profile_id: int, user_id: int, facial_embedding: bytes) -> None:
+    """
+    Make a newly stored biometric profile available for identification.
+
+    Appending to the embedding snapshot waits for its file lock, so this is
+    run in a worker thread rather than on the event loop.
+
+    Args:
+        profile_id: ID of the stored biometric profile
+        user_id: The user the profile belongs to
+        facial_embedding: The stored embedding
+    """
+    face_index.add(user_id, facial_embedding)
+
+    if embedding_snapshot is not None:
+        try:
+            _snapshot_profiles([(profile_id, user_id, facial_embedding)])
+        except OSError:
+            # The profile is caught up from the database at the next startup
+            pass
+
+
+def save_face_index() -> None:
+    """Persist the global face index to face_index_path, when supported."""
+    if isinstance(face_index, IVFFaceIndex) and settings.face_index_path:
+        face_index.save(settings.face_index_path, as_of=_loaded_at)
+
+
+# Global face index instance
+face_index = create_face_index()
+
+# When the face index was last loaded from the database, saved with it
+_loaded_at = 0.0
+
+# Global embedding snapshot instance
+embedding_snapshot = create_embedding_snapshot()
+
+# Where the face index is up to in the embedding snapshot, and the lock serializing syncs
+_snapshot_position: Optional[SnapshotPosition] = None
+_snapshot_lock = threading.Lock()
@@ -1,35 +1,104 @@
 import io
 import base64
+import cv2
+import numpy as np
 from PIL import Image
 from typing import Optional
-from api.constants import ALLOWED_IMAGE_FORMATS
+from api.constants import ALLOWED_IMAGE_FORMATS, MAX_IMAGE_PIXELS
+
+# Let Pillow refuse oversized images on open as well
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+class DecodedImage:
+    """
+    Uploaded image shared by validation and embedding generation.
+
+    Opening the image only parses its header, which is enough for the format
+    and resolution checks. The pixels are decoded lazily, once, the first time
+    the RGB array is requested, and the array is then reused as is.
+
+    Decoding goes through OpenCV, which writes the pixels straight into the
+    NumPy array. Pillow would first build an intermediate bytes buffer and
+    then copy it into the array.
+
+    Images whose header declares more than MAX_IMAGE_PIXELS pixels are
+    rejected before decoding, so a small compressed file can't expand into a
+    huge pixel buffer.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._image: Optional[Image.Image] = Image.open(io.BytesIO(data))
+        self.format: str = (self._image.format or "").lower()
+        self.size: tuple[int, int] = self._image.size
+        self._array: Optional[np.ndarray] = None
+
+        if self.size[0] * self.size[1] > MAX_IMAGE_PIXELS:
+            raise ValueError("Image is too large to decode")
+
+    @property
+    def array(self) -> np.ndarray:
+        """Pixels as an RGB array of shape (height, width, 3), decoded on first access."""
+        if self._array is None:
+            # Keep the stored EXIF orientation, like Pillow does
+            array = cv2.imdecode(
+                np.frombuffer(self.data, dtype=np.uint8),
+                cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+            )
+
+            if array is not None and array.shape[0] * array.shape[1] > MAX_IMAGE_PIXELS:
+                # The header lied about the size, don't keep the buffer around
+                raise ValueError("Image is too large to decode")
+
+            if array is None:
+                # Formats OpenCV can't handle go through Pillow
+                image = self._image if self._image.mode == 'RGB' else self._image.convert('RGB')
+                array = np.asarray(image)
+            else:
+                # OpenCV decodes to BGR, swap the channels in place
+                cv2.cvtColor(array, cv2.COLOR_BGR2RGB, dst=array)
+
+            self._array = array
+
+            # Release the header parser, the array holds everything we need now
+            self._image = None
+
+        return self._array
+
+    def __getstate__(self) -> dict:
+        # Only ship the encoded bytes to other processes, they decode on their own
+        return {"data": self.data}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["data"])
+
 
 def validate_base64_image(image_data: str) -> tuple[bool, Optional[Exception]]:
     """
     Validates base64 encoded image data.
-    
+
     Args:
         image_data (str): Base64 encoded image string
-        
+
     Returns:
         tuple[bool, Optional[Exception]]: (is_valid, exception_object)
     """
     try:
         # Decode base64 data
         decoded_data = base64.b64decode(image_data, validate=True)
-        
-        # Open image to validate format
-        image = Image.open(io.BytesIO(decoded_data))
-        
+
+        # Parse the image header to validate format
+        image = DecodedImage(decoded_data)
+
         # Check if image format is allowed
-        if image.format.lower() not in ALLOWED_IMAGE_FORMATS:
+        if image.format not in ALLOWED_IMAGE_FORMATS:
             return False, ValueError("Image must be either JPEG or PNG")
-        
+
         return True, None
-        
+
     except (ValueError, TypeError) as e:
         return False, ValueError("Image data must be a valid base64 encoded string")
     except IOError as e:
         return False, ValueError("Invalid image data")
     except Exception as e:
-        return False, e 
\ No newline at end of file
+        return False, e
@@ -0,0 +1,220 @@
+import asyncio
+import functools
+import multiprocessing
+import queue
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.connection import Client, Connection
+from typing import Any, Callable, Literal, Optional
+from api.config import settings
+from api.errors import ServiceUnavailableError
+from api.utils.deepface_utils import generate_facial_embeddings_with_timings, warm_up_facial_model
+from api.utils.verification_threshold import model_default_threshold
+
+# Functions an inference server runs on behalf of remote pools, by name
+REMOTE_FUNCTIONS: dict[str, Callable[..., Any]] = {
+    fn.__name__: fn for fn in (warm_up_facial_model, generate_facial_embeddings_with_timings, model_default_threshold)
+}
+
+class InferencePool:
+    """
+    Bounded executor that keeps blocking facial inference off the event loop.
+
+    Jobs beyond the workers' capacity wait in a queue of limited depth. Once
+    that queue is full, new jobs are rejected with an HTTP 503 carrying a
+    Retry-After header instead of piling up behind the model.
+    """
+
+    def __init__(
+        self,
+        kind: Literal['thread', 'process'] = 'thread',
+        max_workers: int = 2,
+        max_queue_size: int = 16,
+        retry_after_seconds: int = 5
+    ):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.retry_after_seconds = retry_after_seconds
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self.ready = False
+        self.warm_up_seconds: Optional[float] = None
+        self.warm_up_error: Optional[str] = None
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of jobs running or waiting at the same time."""
+        return self.max_workers + self.max_queue_size
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs submitted but not yet finished."""
+        return self._pending
+
+    def start(self) -> None:
+        """Create the underlying executor if it isn't running yet."""
+        if self._executor is not None:
+            return
+
+        if self.kind == 'process':
+            # Spawn instead of fork: TensorFlow state doesn't survive a fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up_facial_model
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+
+    async def warm_up(self) -> None:
+        """
+        Load and exercise the facial models in the workers, then mark the pool ready.
+
+        Failures are recorded instead of raised, so the API keeps serving
+        non-biometric endpoints while readiness reports the model as unavailable.
+        """
+        started_at = time.perf_counter()
+        try:
+            # Process workers each hold their own model, so warm up all of them
+            jobs = self.max_workers if self.kind == 'process' else 1
+            await asyncio.gather(*(self.run(warm_up_facial_model) for _ in range(jobs)))
+            self.ready = True
+            self.warm_up_error = None
+        except Exception as e:
+            self.ready = False
+            self.warm_up_error = f"{type(e).__name__}: {e}"
+        finally:
+            self.warm_up_seconds = time.perf_counter() - started_at
+
+    def shutdown(self) -> None:
+        """Stop the executor, waiting for running jobs to finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self.ready = False
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking function in the pool and await its result.
+
+        Args:
+            fn: The function to run; must be picklable for process pools
+            *args: Positional arguments passed to the function
+
+        Returns:
+            The value returned by the function
+
+        Raises:
+            ServiceUnavailableError: If the pool and its queue are full
+        """
+        if self._pending >= self.capacity:
+            raise ServiceUnavailableError(
+                "Facial recognition is busy. Please, try again later.",
+                retry_after=self.retry_after_seconds
+            )
+
+        self.start()
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._job(fn, args))
+        finally:
+            self._pending -= 1
+
+    def _job(self, fn: Callable[..., Any], args: tuple) -> Callable[[], Any]:
+        """Wrap a call into the job handed to the executor."""
+        return functools.partial(fn, *args)
+
+
+class RemoteInferencePool(InferencePool):
+    """
+    Inference pool backed by a separate inference server on a Unix socket.
+
+    Every API worker process connects to the same server, which alone loads
+    TensorFlow and the model weights, so the workers stay small however many
+    of them run. Jobs are sent by function name over authenticated
+    multiprocessing connections, one per worker thread, and the server runs
+    them with its own bounded concurrency.
+
+    Only the functions listed in REMOTE_FUNCTIONS can be run remotely.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        authkey: Optional[str],
+        max_workers: int = 2,
+        max_queue_size: int = 16,
+        retry_after_seconds: int = 5
+    ):
+        super().__init__('thread', max_workers, max_queue_size, retry_after_seconds)
+        self.kind = 'remote'
+        self.address = address
+        self.authkey = authkey.encode() if authkey else None
+        self._connections: queue.SimpleQueue[Connection] = queue.SimpleQueue()
+
+    def start(self) -> None:
+        """Create the threads that talk to the server, connecting lazily."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference-client"
+            )
+
+    def shutdown(self) -> None:
+        """Stop the client threads and close the connections to the server."""
+        super().shutdown()
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+    def _job(self, fn: Callable[..., Any], args: tuple) -> Callable[[], Any]:
+        if REMOTE_FUNCTIONS.get(fn.__name__) is not fn:
+            raise TypeError(f"{fn.__name__} can't run on the inference server")
+        return functools.partial(self._call, fn.__name__, args)
+
+    def _call(self, name: str, args: tuple) -> Any:
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            connection = None
+
+        try:
+            if connection is None:
+                connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            connection.send((name, args))
+            succeeded, result = connection.recv()
+        except (OSError, EOFError) as e:
+            if connection is not None:
+                connection.close()
+            raise ServiceUnavailableError(
+                "Facial recognition is unavailable. Please, try again later.",
+                retry_after=self.retry_after_seconds
+            ) from e
+
+        # Only connections in a known state go back to the idle list
+        self._connections.put(connection)
+        if not succeeded:
+            raise result
+        return result
+
+
+# Global inference pool instance
+if settings.inference_executor == 'remote':
+    inference_pool = RemoteInferencePool(
+        address=settings.inference_server_socket,
+        authkey=settings.inference_server_authkey,
+        max_workers=settings.inference_max_workers,
+        max_queue_size=settings.inference_max_queue_size,
+        retry_after_seconds=settings.inference_retry_after_seconds
+    )
+else:
+    inference_pool = InferencePool(
+        kind=settings.inference_executor,
+        max_workers=settings.inference_max_workers,
+        max_queue_size=settings.inference_max_queue_size,
+        retry_after_seconds=settings.inference_retry_after_seconds
+    )
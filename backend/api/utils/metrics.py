@@ -0,0 +1,221 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Sequence
+
+class Histogram:
+    """
+    Cumulative bucket histogram, safe to observe from several threads.
+
+    Buckets follow the Prometheus convention: each bucket counts the
+    observations less than or equal to its upper bound, plus an implicit
+    +Inf bucket holding the total count.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Return the current state of the histogram.
+
+        Returns:
+            dict: Cumulative bucket counts keyed by upper bound, plus sum and count
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+
+        return {
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+            "sum": total,
+            "count": running
+        }
+
+
+class MetricFamily:
+    """A histogram name with one child Histogram per combination of label values."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], factory: Callable[[], Histogram]):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: dict[tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels: str) -> Histogram:
+        """Return the child for the given label values, creating it on first use."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def children(self) -> list[tuple[dict[str, str], Histogram]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in items]
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered in the Prometheus text exposition format.
+
+    Histograms are updated by the code they measure. Gauges, counters and
+    externally owned histograms are read through callbacks at scrape time, so
+    components keep their own state and the registry only reports it.
+    """
+
+    def __init__(self):
+        self._families: list[MetricFamily] = []
+        self._callbacks: list[tuple[str, str, str, Callable[[], Optional[float]]]] = []
+        self._histograms: list[tuple[str, str, Histogram]] = []
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]) -> MetricFamily:
+        family = MetricFamily(name, help, labelnames, lambda: Histogram(buckets))
+        self._families.append(family)
+        return family
+
+    def gauge(self, name: str, help: str, callback: Callable[[], Optional[float]]) -> None:
+        """Expose a value read at scrape time; None leaves the gauge out."""
+        self._callbacks.append((name, help, "gauge", callback))
+
+    def counter(self, name: str, help: str, callback: Callable[[], Optional[float]]) -> None:
+        """
+        Expose a count that only ever increases, read at scrape time.
+
+        The name must end with _total, as Prometheus expects of counters so
+        that rate() and counter reset handling apply to it.
+        """
+        if not name.endswith("_total"):
+            raise ValueError(f"Counter name {name} must end with _total")
+        self._callbacks.append((name, help, "counter", callback))
+
+    def register_histogram(self, name: str, help: str, histogram: Histogram) -> None:
+        """Expose a histogram owned by another component."""
+        self._histograms.append((name, help, histogram))
+
+    @staticmethod
+    def _format_labels(labels: dict[str, str]) -> str:
+        if not labels:
+            return ""
+        pairs = []
+        for name, value in labels.items():
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            pairs.append(f'{name}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+    def _render_histogram(self, lines: list[str], name: str, labels: dict[str, str], histogram: Histogram) -> None:
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{self._format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{self._format_labels(labels)} {snapshot['sum']}")
+        lines.append(f"{name}_count{self._format_labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        lines: list[str] = []
+
+        for family in self._families:
+            lines += [f"# HELP {family.name} {family.help}", f"# TYPE {family.name} histogram"]
+            for labels, child in family.children():
+                self._render_histogram(lines, family.name, labels, child)
+
+        for name, help, histogram in self._histograms:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            self._render_histogram(lines, name, {}, histogram)
+
+        for name, help, kind, callback in self._callbacks:
+            value = callback()
+            if value is not None:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {float(value)}"]
+
+        return "\n".join(lines) + "\n"
+
+
+# Endpoint of the request being served, set by the metrics middleware
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="none")
+
+# Buckets from half a millisecond, for DB queries, to ten seconds, for a cold model
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "success") -> None:
+    """Record the duration of a pipeline stage for the current endpoint."""
+    stage_duration.labels(endpoint=current_endpoint.get(), stage=stage, outcome=outcome).observe(seconds)
+
+
+@dataclass
+class TrackedStage:
+    """Outcome of a stage timed by track_stage, which the enclosed block may change."""
+
+    outcome: str = "success"
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[TrackedStage]:
+    """Time the enclosed block as a pipeline stage, failed if it raises."""
+    started_at = time.perf_counter()
+    tracked = TrackedStage()
+    try:
+        yield tracked
+    except BaseException:
+        tracked.outcome = "error"
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started_at, tracked.outcome)
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """Resident set size of the current process, or None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
+
+stage_duration = metrics.histogram(
+    "auth_stage_duration_seconds",
+    "Duration of each stage of the authentication pipeline",
+    labelnames=("endpoint", "stage", "outcome"),
+    buckets=LATENCY_BUCKETS
+)
+
+request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests, from the first byte received to the last byte sent",
+    labelnames=("endpoint", "method", "outcome"),
+    buckets=LATENCY_BUCKETS
+)
+
+metrics.gauge(
+    "process_resident_memory_bytes",
+    "Resident memory size of this worker process",
+    resident_memory_bytes
+)
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
+from api.config import settings
+from api.utils.metrics import track_stage
+
+class AsyncPasswordHasher:
+    """
+    Runs Argon2 hashing and verification in a bounded thread pool.
+
+    Each Argon2 call needs memory_cost KiB of RAM and tens of milliseconds of
+    CPU. Running it in worker threads keeps the event loop free (the native
+    code releases the GIL), and the pool size caps how many calls can hold
+    their memory at once, so a login burst queues instead of exhausting RAM.
+    """
+
+    def __init__(self, hasher: PasswordHasher, memory_budget_mb: int):
+        self.hasher = hasher
+        self.max_concurrency = max(1, min(
+            os.cpu_count() or 1,
+            memory_budget_mb * 1024 // hasher.memory_cost
+        ))
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="argon2"
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        # Timed from submission, so waiting for a free worker counts too
+        with track_stage("argon2") as stage:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+            # A wrong password is an ordinary outcome, "error" is kept for hashing faults
+            if result is False:
+                stage.outcome = "mismatch"
+            return result
+
+    def _verify(self, password_hash: str, password: str) -> bool:
+        try:
+            return self.hasher.verify(password_hash, password)
+        except VerifyMismatchError:
+            return False
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured Argon2 parameters."""
+        return await self._run(self.hasher.hash, password)
+
+    async def verify(self, password_hash: str, password: str) -> bool:
+        """
+        Check a password against its stored hash.
+
+        Returns:
+            bool: True if the password matches, False otherwise
+        """
+        try:
+            return await self._run(self._verify, password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether a stored hash was made with different parameters than the current ones."""
+        return self.hasher.check_needs_rehash(password_hash)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Global password hasher instance
+password_hasher = AsyncPasswordHasher(
+    hasher=PasswordHasher(
+        time_cost=3,          # Number of iterations
+        memory_cost=65536,    # Memory usage (64MB)
+        parallelism=2,        # Number of parallel threads
+        hash_len=32,          # Hash length (32 bytes = 256 bits)
+        salt_len=16           # Salt length (16 bytes = 128 bits)
+    ),
+    memory_budget_mb=settings.password_hashing_memory_budget_mb
+)
@@ -0,0 +1,167 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Optional
+from api.config import settings
+
+class RefreshTokenStore:
+    """
+    Records used refresh tokens and revoked token families, for refresh token rotation.
+
+    Each refresh token can be exchanged once: its jti is recorded until the
+    token expires, and presenting it again means it was stolen, so its whole
+    family (every token descending from the same login) is revoked.
+
+    Used jtis are kept as 64-bit digests in sets bucketed by expiry time.
+    Since a refresh token's exp is known when it's presented, a lookup is a
+    single set membership test, and expired entries are dropped a whole
+    bucket at a time. A Bloom filter would be smaller, but its false positives
+    would reject legitimate refreshes and revoke their family.
+
+    With a path, entries are also written to a SQLite file shared by every
+    worker process, which then decides which worker used a token first, and
+    they are reloaded at startup.
+    """
+
+    def __init__(self, bucket_seconds: int = 60, path: Optional[str] = None):
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.path = path
+        self._used: dict[int, set[int]] = {}
+        self._revoked_families: dict[str, float] = {}
+        self._evicted_until = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @staticmethod
+    def _digest(jti: str) -> int:
+        return int.from_bytes(hashlib.blake2b(jti.encode(), digest_size=8).digest(), "little")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS used_refresh_tokens (jti TEXT PRIMARY KEY, expires_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_token_families (family TEXT PRIMARY KEY, expires_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._connection = connection
+        return self._connection
+
+    def load(self) -> None:
+        """Read the entries still valid from the SQLite file, if any."""
+        if not self.path:
+            return
+
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            for jti, expires_at in connection.execute("SELECT jti, expires_at FROM used_refresh_tokens WHERE expires_at >= ?", (now,)):
+                self._used.setdefault(int(expires_at // self.bucket_seconds), set()).add(self._digest(jti))
+            for family, expires_at in connection.execute("SELECT family, expires_at FROM revoked_token_families WHERE expires_at >= ?", (now,)):
+                self._revoked_families[family] = expires_at
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _evict(self, now: float) -> None:
+        """Drop the buckets and families that have expired. Called with the lock held."""
+        current = int(now // self.bucket_seconds)
+        if current <= self._evicted_until:
+            return
+
+        for bucket in [bucket for bucket in self._used if bucket < current]:
+            del self._used[bucket]
+        for family in [family for family, expires_at in self._revoked_families.items() if expires_at < now]:
+            del self._revoked_families[family]
+        self._evicted_until = current
+
+        if self.path:
+            connection = self._connect()
+            connection.execute("DELETE FROM used_refresh_tokens WHERE expires_at < ?", (now,))
+            connection.execute("DELETE FROM revoked_token_families WHERE expires_at < ?", (now,))
+
+    def use(self, jti: str, expires_at: float) -> bool:
+        """
+        Record that a refresh token was exchanged.
+
+        Args:
+            jti: The token's unique identifier
+            expires_at: The token's expiry, as a UNIX timestamp
+
+        Returns:
+            bool: True the first time, False if the token was already used
+        """
+        digest = self._digest(jti)
+        bucket = int(expires_at // self.bucket_seconds)
+
+        with self._lock:
+            self._evict(time.time())
+            used = self._used.setdefault(bucket, set())
+            if digest in used:
+                return False
+
+            # The shared file decides when another worker used it first
+            if self.path:
+                try:
+                    self._connect().execute(
+                        "INSERT INTO used_refresh_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at)
+                    )
+                except sqlite3.IntegrityError:
+                    used.add(digest)
+                    return False
+
+            used.add(digest)
+            return True
+
+    def revoke_family(self, family: str, expires_at: float) -> None:
+        """
+        Revoke every refresh token of a family.
+
+        Args:
+            family: The family identifier shared by the tokens
+            expires_at: When the last token of the family expires at the latest
+        """
+        with self._lock:
+            self._revoked_families[family] = max(expires_at, self._revoked_families.get(family, 0.0))
+            if self.path:
+                self._connect().execute(
+                    "INSERT INTO revoked_token_families (family, expires_at) VALUES (?, ?) "
+                    "ON CONFLICT (family) DO UPDATE SET expires_at = max(expires_at, excluded.expires_at)",
+                    (family, expires_at)
+                )
+
+    def is_family_revoked(self, family: str) -> bool:
+        """Return whether the tokens of a family were revoked."""
+        with self._lock:
+            if family in self._revoked_families:
+                return True
+            if not self.path:
+                return False
+
+            # Possibly revoked by another worker
+            row = self._connect().execute(
+                "SELECT expires_at FROM revoked_token_families WHERE family = ?", (family,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._revoked_families[family] = row[0]
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(used) for used in self._used.values())
+
+
+# Global refresh token store instance
+refresh_token_store = RefreshTokenStore(
+    bucket_seconds=settings.refresh_token_store_bucket_seconds,
+    path=settings.refresh_token_store_path
+)
@@ -0,0 +1,151 @@
+import base64
+import json
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, Optional
+import jwt
+from authx import AuthXConfig
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+from jwt.algorithms import requires_cryptography
+from api.config import settings
+
+def _base64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+class TokenService:
+    """
+    Issues the JWT access and refresh tokens, with signing material prepared once.
+
+    authx signs each token through PyJWT, which rebuilds the header, looks up
+    the algorithm and, for asymmetric algorithms, parses the PEM private key
+    on every call. Here the key is loaded once, the encoded header is kept,
+    and an access/refresh pair is signed in one call sharing the timestamp.
+
+    Refresh tokens also carry a "fam" claim, shared by every token rotated
+    from the same login, so a reused one can revoke the whole session.
+
+    HMAC (HS256/384/512), ECDSA (ES256/384/512), RSA and EdDSA are supported.
+    Asymmetric algorithms need a PEM private key; the public key is derived
+    from it unless given. The tokens carry the same claims as authx's, and
+    configure() points authx at the prepared verification key, so the route
+    dependencies keep verifying them without parsing the key per request.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        access_token_expires: timedelta,
+        refresh_token_expires: timedelta,
+        secret_key: Optional[str] = None,
+        private_key_pem: Optional[bytes] = None,
+        public_key_pem: Optional[bytes] = None,
+        csrf: bool = True
+    ):
+        self.algorithm = algorithm
+        self.access_token_expires = access_token_expires.total_seconds()
+        self.refresh_token_expires = refresh_token_expires.total_seconds()
+        self.csrf = csrf
+        self.asymmetric = algorithm in requires_cryptography
+        self._algorithm = jwt.get_algorithm_by_name(algorithm)
+
+        if not self.asymmetric:
+            if not secret_key:
+                raise ValueError(f"JWT algorithm {algorithm} requires a secret key")
+            self._signing_key = self._verification_key = self._algorithm.prepare_key(secret_key)
+        else:
+            if private_key_pem is None:
+                raise ValueError(f"JWT algorithm {algorithm} requires a private key, set JWT_PRIVATE_KEY_FILE")
+            self._signing_key = self._algorithm.prepare_key(load_pem_private_key(private_key_pem, password=None))
+            self._verification_key = self._algorithm.prepare_key(
+                load_pem_public_key(public_key_pem) if public_key_pem else self._signing_key.public_key()
+            )
+
+        header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":")).encode()
+        self._header = _base64url(header) + b"."
+
+    @property
+    def verification_key(self) -> Any:
+        """The prepared key verifying the tokens."""
+        return self._verification_key
+
+    def configure(self, config: AuthXConfig) -> None:
+        """
+        Make authx verify tokens with the prepared key and algorithm.
+
+        The values are assigned after validation: AuthXConfig only accepts PEM
+        strings and doesn't list EdDSA, but PyJWT takes key objects and EdDSA.
+        """
+        config.JWT_ALGORITHM = self.algorithm
+        if self.asymmetric:
+            config.JWT_PRIVATE_KEY = self._signing_key
+            config.JWT_PUBLIC_KEY = self._verification_key
+
+        # authx only checks the CSRF claim of tokens read from cookies
+        self.csrf = config.has_location("cookies") and config.JWT_COOKIE_CSRF_PROTECT
+
+    def _encode(self, claims: dict) -> str:
+        signing_input = self._header + _base64url(json.dumps(claims, separators=(",", ":")).encode())
+        signature = self._algorithm.sign(signing_input, self._signing_key)
+        return (signing_input + b"." + _base64url(signature)).decode()
+
+    def _claims(self, user_id: str, token_type: str, issued_at: float, expires: float, family: Optional[str] = None) -> dict:
+        claims = {"sub": user_id, "jti": str(uuid.uuid4()), "type": token_type}
+        if token_type == "access":
+            claims["fresh"] = False
+        if family is not None:
+            claims["fam"] = family
+        if self.csrf:
+            claims["csrf"] = str(uuid.uuid4())
+        claims["iat"] = int(issued_at)
+        claims["exp"] = issued_at + expires
+        return claims
+
+    def issue_access_token(self, user_id: str) -> str:
+        """Issue an access token for a user."""
+        return self._encode(self._claims(user_id, "access", time.time(), self.access_token_expires))
+
+    def issue_refresh_token(self, user_id: str, family: Optional[str] = None) -> str:
+        """Issue a refresh token for a user, starting a new token family unless one is given."""
+        return self._encode(self._claims(
+            user_id, "refresh", time.time(), self.refresh_token_expires, family or str(uuid.uuid4())
+        ))
+
+    def issue_pair(self, user_id: str, family: Optional[str] = None) -> tuple[str, str]:
+        """
+        Issue an access and a refresh token for a user.
+
+        Args:
+            user_id: The user ID the tokens are issued to
+            family: The token family of the refresh token being rotated,
+                a new family is started for a login
+
+        Returns:
+            tuple[str, str]: (access_token, refresh_token)
+        """
+        issued_at = time.time()
+        return (
+            self._encode(self._claims(user_id, "access", issued_at, self.access_token_expires)),
+            self._encode(self._claims(
+                user_id, "refresh", issued_at, self.refresh_token_expires, family or str(uuid.uuid4())
+            ))
+        )
+
+
+def _read_key_file(path: Optional[str]) -> Optional[bytes]:
+    if not path:
+        return None
+    with open(path, "rb") as file:
+        return file.read()
+
+
+# Global token service instance
+token_service = TokenService(
+    algorithm=settings.jwt_algorithm,
+    access_token_expires=settings.jwt_access_token_expires,
+    refresh_token_expires=settings.jwt_refresh_token_expires,
+    secret_key=settings.jwt_secret_key,
+    private_key_pem=_read_key_file(settings.jwt_private_key_file),
+    public_key_pem=_read_key_file(settings.jwt_public_key_file)
+)
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from api.config import settings
+from api.models import User
+from api.schemas import UserDto
+
+class UserCache:
+    """
+    Bounded LRU cache of user profiles keyed by user ID.
+
+    The frontend polls /auth/me, so the profile behind a valid access token
+    is kept for a short TTL instead of being loaded on every call. Entries
+    are dropped as soon as a user row is updated or deleted through this
+    process; the TTL bounds how stale a change made by another worker or
+    process can look.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[UserDto, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[UserDto]:
+        """Return the cached profile of a user, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user: UserDto) -> None:
+        """Store a profile, evicting the least recently used ones if needed."""
+        if not self.enabled or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user.id)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the cached profile of a user."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Drop every cached profile."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Global user cache instance
+user_cache = UserCache(
+    max_entries=settings.user_cache_max_entries,
+    ttl_seconds=settings.user_cache_ttl_seconds,
+    enabled=settings.user_cache_enabled
+)
+
+# Invalidate on changes to loaded User objects
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target: User) -> None:
+    user_cache.invalidate(target.id)
+
+# Bulk UPDATE and DELETE statements don't say which rows they touch, drop everything
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_changes(orm_execute_state) -> None:
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            user_cache.clear()
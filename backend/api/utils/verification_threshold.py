@@ -0,0 +1,126 @@
+import json
+from dataclasses import dataclass
+from typing import Literal, Optional
+from api.config import settings
+from api.constants import DEFAULT_MODEL_NAME
+
+def model_default_threshold(model_name: str) -> float:
+    """
+    DeepFace's pre-tuned cosine threshold for a model.
+
+    Looking it up imports DeepFace and TensorFlow, so processes using a
+    remote inference server ask the server instead.
+    """
+    from deepface.modules.verification import find_threshold
+
+    return float(find_threshold(model_name, "cosine"))
+
+
+@dataclass(frozen=True)
+class OperatingPoint:
+    """Error rates measured at one cosine distance threshold."""
+
+    threshold: float
+    far: float
+    frr: float
+
+
+class VerificationThreshold:
+    """
+    Maximum cosine distance accepted as a face match, resolved once per model.
+
+    The threshold comes from, in order of precedence:
+    - an explicit per-deployment override
+    - the operating-point table of the deployment (FAR/FRR measured per
+      threshold on its own data), picking the threshold with the lowest FRR
+      whose FAR doesn't exceed the target
+    - DeepFace's pre-tuned threshold for the model
+
+    Args:
+        model_name: Recognition model the threshold applies to
+        override: Threshold to use as is
+        operating_points_path: JSON file with a list of {"threshold", "far", "frr"} objects
+        target_far: Highest false acceptance rate allowed when using the table
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        override: Optional[float] = None,
+        operating_points_path: Optional[str] = None,
+        target_far: Optional[float] = None
+    ):
+        self.model_name = model_name
+        self.override = override
+        self.operating_points_path = operating_points_path
+        self.target_far = target_far
+        self.operating_points: list[OperatingPoint] = []
+        self.source: Optional[Literal['override', 'operating_point', 'model_default']] = None
+        self._value: Optional[float] = None
+
+    @property
+    def value(self) -> float:
+        """The resolved threshold, resolving it on first access."""
+        if self._value is None:
+            self.resolve()
+        return self._value
+
+    def load_operating_points(self, path: str) -> list[OperatingPoint]:
+        """
+        Read an operating-point table, sorted by threshold.
+
+        Raises:
+            OSError: If the file can't be read
+            ValueError: If the file isn't a list of operating points
+        """
+        with open(path, encoding="utf-8") as file:
+            rows = json.load(file)
+
+        try:
+            points = [OperatingPoint(float(row["threshold"]), float(row["far"]), float(row["frr"])) for row in rows]
+        except (TypeError, KeyError) as e:
+            raise ValueError(f"Invalid operating-point table {path}: {e}")
+        return sorted(points, key=lambda point: point.threshold)
+
+    @property
+    def needs_model_default(self) -> bool:
+        """Whether resolving falls back to the model's pre-tuned threshold."""
+        return self.override is None and not (self.operating_points_path and self.target_far is not None)
+
+    def resolve(self, model_default: Optional[float] = None) -> float:
+        """
+        Determine the threshold and cache it.
+
+        Args:
+            model_default: The model's pre-tuned threshold when already known,
+                looked up with model_default_threshold otherwise
+
+        Raises:
+            ValueError: If the operating-point table has no point meeting the target FAR
+        """
+        if self.operating_points_path:
+            self.operating_points = self.load_operating_points(self.operating_points_path)
+
+        if self.override is not None:
+            self._value, self.source = self.override, 'override'
+        elif self.operating_points and self.target_far is not None:
+            # FRR falls as the threshold grows, so take the largest threshold within the FAR target
+            accepted = [point for point in self.operating_points if point.far <= self.target_far]
+            if not accepted:
+                raise ValueError(f"No operating point has a FAR of at most {self.target_far}")
+            self._value, self.source = accepted[-1].threshold, 'operating_point'
+        else:
+            if model_default is None:
+                model_default = model_default_threshold(self.model_name)
+            self._value, self.source = model_default, 'model_default'
+
+        return self._value
+
+
+# Global verification threshold instance
+verification_threshold = VerificationThreshold(
+    model_name=DEFAULT_MODEL_NAME,
+    override=settings.face_verification_threshold,
+    operating_points_path=settings.face_verification_operating_points_path,
+    target_far=settings.face_verification_target_far
+)
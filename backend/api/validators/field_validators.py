@@ -1,7 +1,9 @@
-import io
 from typing import Optional
 from fastapi import UploadFile
-from PIL import Image, UnidentifiedImageError
+from PIL import UnidentifiedImageError
+from PIL.Image import DecompressionBombError
+from api.utils.image_utils import DecodedImage
+from api.utils.metrics import track_stage
 from api.constants import ALLOWED_IMAGE_FORMATS, MAX_IMAGE_SIZE_MB, MIN_IMAGE_RESOLUTION, MAX_IMAGE_RESOLUTION
 
 def validate_password(
@@ -55,7 +57,7 @@ def validate_password(
     
     return password
 
-def validate_image_data(image_data: Optional[UploadFile]) -> Optional[UploadFile]:
+def validate_image_data(image_data: Optional[UploadFile]) -> Optional[DecodedImage]:
     """
     Validate uploaded image data according to application requirements.
     
@@ -65,11 +67,16 @@ def validate_image_data(image_data: Optional[UploadFile]) -> Optional[UploadFile
     - File size limits
     - Image integrity checks
     
+    The upload is read with a single read capped one byte past the size
+    limit, so an oversized file is rejected without being loaded whole.
+    Only the image header is parsed here. The returned DecodedImage is reused
+    for embedding generation, which decodes the pixels once when needed.
+    
     Args:
         image_data: The uploaded image file to validate, or None if no image provided
     
     Returns:
-        The validated UploadFile object if validation passes, or None if no image provided
+        The DecodedImage wrapping the upload if validation passes, or None if no image provided
     
     Raises:
         ValueError: If image doesn't meet any of the validation requirements:
@@ -79,23 +86,70 @@ def validate_image_data(image_data: Optional[UploadFile]) -> Optional[UploadFile
             - Unsupported image format
             - File size exceeds maximum allowed size
             - Invalid or corrupted image data
-    
-    Note:
-        The function resets the file pointer after reading, so the image data
-        can be read again by subsequent operations.
     """
     if image_data is None:
         return None
     
-    # Read the image data
-    image_bytes = image_data.file.read()
+    max_size = MAX_IMAGE_SIZE_MB * 1024 * 1024
+
+    # The spooled upload knows its size, reject it before reading anything
+    if image_data.size is not None and image_data.size > max_size:
+        raise ValueError(f"Image size must not exceed {MAX_IMAGE_SIZE_MB} MB")
+
+    with track_stage("upload_read"):
+        image_data.file.seek(0)
+        image_bytes = image_data.file.read(max_size + 1)
+
+    with track_stage("image_validation"):
+        return validate_image_bytes(image_bytes)
+
+def validate_image_list(images: Optional[list[UploadFile]]) -> Optional[list[DecodedImage]]:
+    """
+    Validate several uploaded images, each like validate_image_data.
+
+    Args:
+        images: The uploaded image files to validate, or None if none provided
+
+    Returns:
+        The DecodedImage wrapping each upload if all pass validation, or None if none provided
+
+    Raises:
+        ValueError: If any image doesn't meet the validation requirements
+    """
+    if images is None:
+        return None
+
+    validated = []
+    for index, image in enumerate(images):
+        try:
+            validated.append(validate_image_data(image))
+        except ValueError as e:
+            raise ValueError(f"Image {index + 1}: {e}")
+    return validated
+
+def validate_image_bytes(image_bytes: bytes) -> DecodedImage:
+    """
+    Validate encoded image bytes against the application image requirements.
+    
+    Shared by upload validation and bulk enrollment, so both accept exactly
+    the same images.
     
-    # Reset file pointer for potential future reads
-    image_data.file.seek(0)
+    Args:
+        image_bytes: The encoded image file content
+    
+    Returns:
+        The DecodedImage wrapping the bytes if validation passes
+    
+    Raises:
+        ValueError: If the image doesn't meet any of the validation requirements
+    """
+    # Check if image size is within limits before parsing anything
+    if len(image_bytes) > MAX_IMAGE_SIZE_MB * 1024 * 1024:
+        raise ValueError(f"Image size must not exceed {MAX_IMAGE_SIZE_MB} MB")
     
     # Try to open the image to validate it
     try:
-        image = Image.open(io.BytesIO(image_bytes))
+        image = DecodedImage(image_bytes)
         
         # Check if image is empty
         if image.size == (0, 0):
@@ -113,14 +167,10 @@ def validate_image_data(image_data: Optional[UploadFile]) -> Optional[UploadFile
             raise ValueError(f"Image resolution must not exceed {max_width}x{max_height} pixels")
         
         # Check if image format is allowed
-        if image.format.lower() not in ALLOWED_IMAGE_FORMATS:
+        if image.format not in ALLOWED_IMAGE_FORMATS:
             raise ValueError("Image must be either JPEG, PNG or WebP")
         
-        # Check if image size is within limits
-        if len(image_bytes) > MAX_IMAGE_SIZE_MB * 1024 * 1024:
-            raise ValueError(f"Image size must not exceed {MAX_IMAGE_SIZE_MB} MB")
-        
-        return image_data
+        return image
     
-    except UnidentifiedImageError:
+    except (UnidentifiedImageError, DecompressionBombError):
         raise ValueError("Invalid image data provided")
@@ -0,0 +1,426 @@
+"""
+Load test of the authentication endpoints, in process or against a real server.
+
+Seeds a fresh SQLite database with users enrolled from synthetic face
+images, then measures throughput and p50/p95/p99 latency for each scenario
+at several concurrency levels:
+
+    register        new user with password and face image
+    password_login  email and password of a seeded user
+    face_login      email and a new capture (jittered image) of a seeded user
+    face_identify   face image alone, identified against the whole gallery
+    refresh         new access token from a refresh token
+    me              current user from an access token
+
+In "asgi" mode the app runs in this process behind an in-memory transport,
+which isolates the application from the network and server. In "uvicorn"
+mode a real server is started on a free local port and driven over HTTP.
+
+Synthetic faces are drawn with a seeded generator, so every run sends the
+same images. OpenCV's detector won't find drawn faces, so detection is
+skipped unless real photos are given with --faces (one face per image,
+cycled over the users). Face logins send a lightly jittered copy of the
+enrolled image, which also keeps them out of the embedding cache.
+
+Results are written as JSON with the commit and configuration they were
+measured with; --compare prints the change against an earlier result file.
+
+Usage (from the backend directory):
+    python -m benchmarks.auth_endpoints [--mode asgi|uvicorn] [--concurrency 1 8 32] [--requests 100]
+        [--users 32] [--scenarios register me ...] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+import httpx
+import numpy as np
+from PIL import Image, ImageDraw
+
+FACE_SIZE = 224
+PASSWORD = "Benchmark-Passw0rd!"
+SCENARIOS = ["register", "password_login", "face_login", "face_identify", "refresh", "me"]
+
+# A request to send: method, path and httpx keyword arguments
+RequestSpec = tuple[str, str, dict]
+
+
+class FaceImages:
+    """Deterministic face images, synthetic or cycled from a directory of photos."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.photos: list[bytes] = []
+        if directory:
+            for name in sorted(os.listdir(directory)):
+                if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+                    with open(os.path.join(directory, name), "rb") as file:
+                        self.photos.append(file.read())
+            if not self.photos:
+                raise ValueError(f"No images found in {directory}")
+
+    def enrolled(self, identity: int) -> bytes:
+        """The image a user enrolls with."""
+        if self.photos:
+            return self.photos[identity % len(self.photos)]
+        return self._encode(self._draw(identity))
+
+    def capture(self, identity: int, attempt: int) -> bytes:
+        """A new capture of an enrolled face: its image with a little pixel noise."""
+        image = np.asarray(Image.open(io.BytesIO(self.enrolled(identity))).convert("RGB"), dtype=np.int16)
+        noise = np.random.default_rng((identity, attempt)).integers(-4, 5, image.shape, dtype=np.int16)
+        return self._encode(Image.fromarray(np.clip(image + noise, 0, 255).astype(np.uint8)))
+
+    @staticmethod
+    def _draw(identity: int) -> Image.Image:
+        rng = np.random.default_rng(identity)
+
+        def color(low: int, high: int) -> tuple[int, int, int]:
+            return tuple(int(v) for v in rng.integers(low, high, 3))
+
+        # Textured background, so identities stay apart in embedding space
+        pixels = rng.integers(0, 256, (FACE_SIZE // 8, FACE_SIZE // 8, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels).resize((FACE_SIZE, FACE_SIZE), Image.Resampling.BILINEAR)
+        draw = ImageDraw.Draw(image)
+
+        # Face, eyes, nose and mouth with per-identity proportions and colors
+        cx, cy = FACE_SIZE // 2 + int(rng.integers(-8, 9)), FACE_SIZE // 2 + int(rng.integers(-8, 9))
+        width, height = int(rng.integers(60, 80)), int(rng.integers(80, 100))
+        draw.ellipse((cx - width, cy - height, cx + width, cy + height), fill=color(120, 240))
+        eye_dx, eye_y, eye_r = int(rng.integers(20, 35)), cy - int(rng.integers(15, 35)), int(rng.integers(6, 12))
+        for x in (cx - eye_dx, cx + eye_dx):
+            draw.ellipse((x - eye_r, eye_y - eye_r, x + eye_r, eye_y + eye_r), fill=color(0, 90))
+        draw.polygon([(cx, eye_y + 10), (cx - 8, cy + 15), (cx + 8, cy + 15)], fill=color(90, 200))
+        mouth_w, mouth_y = int(rng.integers(18, 35)), cy + int(rng.integers(35, 55))
+        draw.arc((cx - mouth_w, mouth_y - 12, cx + mouth_w, mouth_y + 12), 0, 180, fill=color(100, 200), width=5)
+        return image
+
+    @staticmethod
+    def _encode(image: Image.Image) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+@dataclass
+class SeededUser:
+    identity: int
+    email: str
+    access_token: str = ""
+    refresh_token: str = ""
+
+
+@dataclass
+class Scenario:
+    name: str
+    # Builds the request for the i-th call
+    build: Callable[[int], RequestSpec]
+    # Optional hook given the i-th call and its response, e.g. to keep rotated tokens
+    on_response: Optional[Callable[[int, httpx.Response], None]] = None
+    # Images are encoded ahead of time, outside the timed loop
+    prepare: Optional[Callable[[int], None]] = None
+
+
+@dataclass
+class LevelResult:
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+
+
+def upload(image: bytes) -> dict:
+    return {"image_data": ("face.png", image, "image/png")}
+
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def build_scenarios(users: list[SeededUser], faces: FaceImages) -> dict[str, Scenario]:
+    """Create the benchmark scenarios, cycling over the seeded users."""
+    identities = itertools.count(len(users))
+    registrations: dict[int, tuple[str, bytes]] = {}
+    captures: dict[int, bytes] = {}
+
+    def user(i: int) -> SeededUser:
+        return users[i % len(users)]
+
+    def prepare_registration(i: int) -> None:
+        identity = next(identities)
+        registrations[i] = (f"bench-{identity}@example.com", faces.enrolled(identity))
+
+    def prepare_capture(i: int) -> None:
+        captures[i] = faces.capture(user(i).identity, i)
+
+    def register(i: int) -> RequestSpec:
+        email, image = registrations.pop(i)
+        return "POST", "/auth/register", {"data": {"email": email, "password": PASSWORD}, "files": upload(image)}
+
+    def keep_refresh_token(i: int, response: httpx.Response) -> None:
+        # Keep working if refresh tokens are rotated
+        if response.is_success and "refresh_token" in response.json():
+            user(i).refresh_token = response.json()["refresh_token"]
+
+    return {
+        "register": Scenario("register", register, prepare=prepare_registration),
+        "password_login": Scenario(
+            "password_login",
+            lambda i: ("POST", "/auth/login", {"data": {"email": user(i).email, "password": PASSWORD}})
+        ),
+        "face_login": Scenario(
+            "face_login",
+            lambda i: ("POST", "/auth/login", {"data": {"email": user(i).email}, "files": upload(captures.pop(i))}),
+            prepare=prepare_capture
+        ),
+        "face_identify": Scenario(
+            "face_identify",
+            lambda i: ("POST", "/auth/login", {"files": upload(captures.pop(i))}),
+            prepare=prepare_capture
+        ),
+        "refresh": Scenario(
+            "refresh",
+            lambda i: ("POST", "/auth/refresh", {"headers": bearer(user(i).refresh_token)}),
+            on_response=keep_refresh_token
+        ),
+        "me": Scenario("me", lambda i: ("GET", "/auth/me", {"headers": bearer(user(i).access_token)}))
+    }
+
+
+async def run_level(client: httpx.AsyncClient, scenario: Scenario, offset: int, total: int, concurrency: int) -> tuple[LevelResult, float]:
+    """Send total requests with concurrency clients in flight, returning the results and wall time."""
+    if scenario.prepare is not None:
+        for i in range(offset, offset + total):
+            scenario.prepare(i)
+
+    result = LevelResult()
+    indices = iter(range(offset, offset + total))
+
+    async def worker() -> None:
+        for i in indices:
+            method, path, kwargs = scenario.build(i)
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            result.latencies.append(time.perf_counter() - started_at)
+            result.statuses[status] += 1
+            if response is not None and scenario.on_response is not None:
+                scenario.on_response(i, response)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return result, time.perf_counter() - started_at
+
+
+def summarize(scenario: str, concurrency: int, result: LevelResult, elapsed: float) -> dict:
+    latencies = np.asarray(result.latencies) * 1000
+    errors = sum(count for status, count in result.statuses.items() if not status.startswith("2"))
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(result.statuses),
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_ms": {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max())
+        }
+    }
+
+
+async def seed_users(client: httpx.AsyncClient, faces: FaceImages, count: int) -> list[SeededUser]:
+    """Register the users the login, refresh and /me scenarios act as."""
+    users = [SeededUser(identity=i, email=f"seed-{i}@example.com") for i in range(count)]
+    semaphore = asyncio.Semaphore(8)
+
+    async def register(user: SeededUser) -> None:
+        async with semaphore:
+            response = await client.post(
+                "/auth/register",
+                data={"email": user.email, "password": PASSWORD},
+                files=upload(faces.enrolled(user.identity))
+            )
+        if not response.is_success:
+            raise RuntimeError(f"Seeding {user.email} failed with {response.status_code}: {response.text}")
+        user.access_token = response.json()["access_token"]
+        user.refresh_token = response.json()["refresh_token"]
+
+    await asyncio.gather(*(register(user) for user in users))
+    return users
+
+
+async def run_benchmark(client: httpx.AsyncClient, args: argparse.Namespace) -> list[dict]:
+    faces = FaceImages(args.faces)
+    started_at = time.perf_counter()
+    users = await seed_users(client, faces, args.users)
+    print(f"Seeded {len(users)} users in {time.perf_counter() - started_at:.1f} s")
+
+    scenarios = build_scenarios(users, faces)
+    results, offset = [], 0
+    for name in args.scenarios:
+        scenario = scenarios[name]
+
+        # Warm up code paths and connections, unrecorded
+        await run_level(client, scenario, offset, args.warm_up, min(args.warm_up, max(args.concurrency)))
+        offset += args.warm_up
+
+        for concurrency in args.concurrency:
+            result, elapsed = await run_level(client, scenario, offset, args.requests, concurrency)
+            offset += args.requests
+            summary = summarize(name, concurrency, result, elapsed)
+            results.append(summary)
+            latency = summary["latency_ms"]
+            print(
+                f"{name:>14} c={concurrency:<4} {summary['throughput_rps']:>8.1f} req/s  "
+                f"p50 {latency['p50']:>8.1f} ms  p95 {latency['p95']:>8.1f} ms  p99 {latency['p99']:>8.1f} ms  "
+                f"errors {summary['errors']}"
+            )
+    return results
+
+
+async def run_asgi(args: argparse.Namespace) -> list[dict]:
+    # Imported here, after the environment has been configured
+    from api.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout) as client:
+            return await run_benchmark(client, args)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if (await client.get("/health/ready")).is_success:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout:.0f} s")
+
+
+async def run_uvicorn(args: argparse.Namespace) -> list[dict]:
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "api.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"
+        ],
+        env=os.environ.copy()
+    )
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout) as client:
+            await wait_until_ready(client, server, args.startup_timeout)
+            return await run_benchmark(client, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], mode: str, baseline_path: str) -> None:
+    """Print the throughput and p95 change of each scenario against an earlier run."""
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+
+    print(f"\nAgainst {baseline_path} ({(baseline['meta'].get('commit') or 'unknown')[:10]})")
+    if baseline["meta"]["mode"] != mode:
+        print(f"Warning: baseline was measured in {baseline['meta']['mode']} mode, not {mode}")
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        throughput = result["throughput_rps"] / before["throughput_rps"] - 1
+        p95 = result["latency_ms"]["p95"] / before["latency_ms"]["p95"] - 1
+        print(f"{result['scenario']:>14} c={result['concurrency']:<4} throughput {throughput:>+7.1%}  p95 {p95:>+7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warm-up", type=int, default=5, help="Unrecorded requests before each scenario")
+    parser.add_argument("--users", type=int, default=32, help="Users seeded before the scenarios run")
+    parser.add_argument("--faces", help="Directory of real photos, one face each, instead of synthetic faces")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes in uvicorn mode")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the server to be ready")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="auth-benchmark-") as directory:
+        # Fresh database and index, and settings that don't depend on the local .env
+        environment = {
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+            "FACE_INDEX_PATH": os.path.join(directory, "face_index"),
+            "FACE_DETECTOR_BACKEND": os.environ.get("FACE_DETECTOR_BACKEND", "opencv" if args.faces else "skip")
+        }
+        os.environ.update(environment)
+
+        started_at = datetime.now(timezone.utc)
+        results = asyncio.run(run_uvicorn(args) if args.mode == "uvicorn" else run_asgi(args))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at.isoformat(),
+            "mode": args.mode,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "face_detector_backend": environment["FACE_DETECTOR_BACKEND"],
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.mode, args.compare)
+
+
+if __name__ == "__main__":
+    main()
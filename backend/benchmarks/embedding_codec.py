@@ -0,0 +1,116 @@
+"""
+Accuracy and size report of the quantized embedding storage formats against float32.
+
+For every storage dtype, embeddings of a test set are encoded with
+EmbeddingCodec and compared with the float32 originals on:
+- bytes per stored embedding and compression ratio
+- absolute error of the cosine distance on genuine and impostor pairs
+- verification decisions flipped at the threshold
+- identification recall@1 of an ExactFaceIndex holding the quantized gallery
+
+The test set is either a local one, given as an .npy matrix of embeddings and
+an .npy vector of identity labels, or a synthetic one made of identities with
+several noisy samples each.
+
+Usage (from the backend directory):
+    python -m benchmarks.embedding_codec [--embeddings X.npy --labels y.npy] [--threshold 0.30]
+"""
+import argparse
+import numpy as np
+from api.indexes import ExactFaceIndex
+from api.utils.embedding_codec import EmbeddingCodec
+
+def make_test_set(identities: int, samples: int, noise: float, dimension: int = 512, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((identities, dimension), dtype=np.float32)
+    labels = np.repeat(np.arange(identities), samples)
+    embeddings = centers[labels] + noise * rng.standard_normal((len(labels), dimension), dtype=np.float32)
+    return embeddings, labels
+
+
+def make_pairs(labels: np.ndarray, count: int, seed: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """Draw genuine (same identity) and impostor (different identity) index pairs."""
+    rng = np.random.default_rng(seed)
+
+    # Genuine pairs: every two samples of the same identity
+    genuine = []
+    for label in np.unique(labels):
+        samples = np.flatnonzero(labels == label)
+        genuine.extend((a, b) for i, a in enumerate(samples) for b in samples[i + 1:])
+    genuine = np.array(genuine, dtype=np.int64).reshape(-1, 2)
+    genuine = genuine[rng.permutation(len(genuine))[:count]]
+
+    # Impostor pairs: random pairs of samples of different identities
+    first, second = rng.integers(0, len(labels), (2, count * 2))
+    different = labels[first] != labels[second]
+    impostor = np.stack([first[different], second[different]], axis=1)[:count]
+    return genuine, impostor
+
+
+def distances(codec: EmbeddingCodec, blobs: list[bytes], pairs: np.ndarray) -> np.ndarray:
+    return np.array([codec.cosine_distance(blobs[a], blobs[b]) for a, b in pairs])
+
+
+def identification_ranks(dtype: str, gallery: np.ndarray, queries: np.ndarray, codec: EmbeddingCodec) -> np.ndarray:
+    index = ExactFaceIndex(dimension=gallery.shape[1], dtype=dtype)
+    index.load((user_id, codec.encode(vector)) for user_id, vector in enumerate(gallery))
+    return np.array([index.search(codec.encode(query), k=1)[0][0] for query in queries])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help=".npy matrix of float32 embeddings, one per row")
+    parser.add_argument("--labels", help=".npy vector with the identity of each embedding")
+    parser.add_argument("--identities", type=int, default=2000, help="Synthetic identities")
+    parser.add_argument("--samples", type=int, default=4, help="Synthetic samples per identity")
+    parser.add_argument("--noise", type=float, default=0.6, help="Synthetic sample noise relative to unit-variance embeddings")
+    parser.add_argument("--pairs", type=int, default=5000, help="Genuine and impostor pairs each")
+    parser.add_argument("--threshold", type=float, default=0.30, help="Verification cosine distance threshold")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        embeddings = np.load(args.embeddings).astype(np.float32)
+        labels = np.load(args.labels) if args.labels else np.arange(len(embeddings))
+    else:
+        embeddings, labels = make_test_set(args.identities, args.samples, args.noise)
+
+    genuine, impostor = make_pairs(labels, args.pairs)
+
+    # First sample of each identity forms the gallery, the next one is the query
+    _, first = np.unique(labels, return_index=True)
+    with_query = first[(first + 1 < len(labels))]
+    with_query = with_query[labels[with_query + 1] == labels[with_query]]
+    gallery, queries = embeddings[with_query], embeddings[with_query + 1]
+    print(f"test set: {len(embeddings)} embeddings, {len(np.unique(labels))} identities, "
+          f"{len(genuine)} genuine / {len(impostor)} impostor pairs, {len(queries)} identification queries")
+
+    reference = EmbeddingCodec(dtype='float32')
+    reference_blobs = [reference.encode(vector) for vector in embeddings]
+    reference_genuine = distances(reference, reference_blobs, genuine)
+    reference_impostor = distances(reference, reference_blobs, impostor)
+    reference_ranks = identification_ranks('float32', gallery, queries, reference)
+    reference_size = len(reference_blobs[0])
+
+    for dtype in ('float32', 'float16', 'int8'):
+        codec = EmbeddingCodec(dtype=dtype)
+        blobs = [codec.encode(vector) for vector in embeddings]
+        genuine_distances = distances(codec, blobs, genuine)
+        impostor_distances = distances(codec, blobs, impostor)
+        errors = np.abs(np.concatenate([genuine_distances - reference_genuine, impostor_distances - reference_impostor]))
+
+        flipped = np.sum((genuine_distances <= args.threshold) != (reference_genuine <= args.threshold))
+        flipped += np.sum((impostor_distances <= args.threshold) != (reference_impostor <= args.threshold))
+        frr = np.mean(genuine_distances > args.threshold)
+        far = np.mean(impostor_distances <= args.threshold)
+        recall = np.mean(identification_ranks(dtype, gallery, queries, codec) == reference_ranks)
+
+        print(
+            f"{dtype:>7}: {len(blobs[0])} B/embedding ({reference_size / len(blobs[0]):.1f}x), "
+            f"|delta distance| mean {errors.mean():.2e} max {errors.max():.2e}, "
+            f"{flipped} decisions flipped, FAR {far:.4f} FRR {frr:.4f}, "
+            f"recall@1 vs float32 {recall:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Report on multi-frame enrollment, on synthetic identities.
+
+Each identity is a unit vector, and each capture of it adds noise whose
+scale varies from capture to capture (lognormal around a per-user level), to
+mimic pose, lighting and blur. Identities share a common component so that
+impostors sit at a realistic, not orthogonal, distance.
+
+For each enrollment configuration (a single frame, the centroid of k frames,
+a template set of k frames reduced with min or mean), users are enrolled with
+aggregate_facial_embeddings and then log in repeatedly, retrying with a fresh
+capture up to --max-attempts times. Reported per configuration:
+
+- FTE: enrollments rejected by the consistency gate
+- FRR@1: logins rejected on the first attempt
+- attempts: mean attempts per successful login
+- fail: logins still rejected after --max-attempts attempts
+- FAR: single-attempt acceptance of another user's capture
+- images/user: embeddings computed per user (enrollment frames plus every
+  login attempt), also relative to single-frame enrollment
+
+Usage (from the backend directory):
+    python -m benchmarks.enrollment_templates [--users 1000] [--logins 20] [--threshold 0.30]
+"""
+import argparse
+import numpy as np
+from api.utils.deepface_utils import aggregate_facial_embeddings
+from api.utils.embedding_codec import embedding_codec
+
+DIMENSIONS = 512
+
+CONFIGURATIONS = [
+    # name, frames, aggregation, reduction
+    ("single frame", 1, "centroid", "min"),
+    ("centroid k=3", 3, "centroid", "min"),
+    ("centroid k=5", 5, "centroid", "min"),
+    ("templates k=5 min", 5, "templates", "min"),
+    ("templates k=5 mean", 5, "templates", "mean"),
+]
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+class SyntheticPopulation:
+    """Identities and their noisy captures."""
+
+    def __init__(self, users: int, identity_spread: float, noise: float, noise_spread: float, seed: int):
+        self.rng = np.random.default_rng(seed)
+        common = self.rng.standard_normal(DIMENSIONS)
+        individual = self.rng.standard_normal((users, DIMENSIONS)) * identity_spread
+        self.identities = normalize(normalize(common) + individual / np.sqrt(DIMENSIONS))
+        # Some users are consistently harder to capture than others
+        self.user_noise = noise * self.rng.lognormal(0.0, noise_spread / 2, size=users)
+        self.noise_spread = noise_spread
+
+    def capture(self, user_ids: np.ndarray) -> np.ndarray:
+        """One capture per entry of user_ids, as normalized vectors."""
+        scales = self.user_noise[user_ids] * self.rng.lognormal(0.0, self.noise_spread, size=len(user_ids))
+        noise = self.rng.standard_normal((len(user_ids), DIMENSIONS)) / np.sqrt(DIMENSIONS)
+        return normalize(self.identities[user_ids] + noise * scales[:, None])
+
+
+def encode(vectors: np.ndarray) -> list[bytes]:
+    return [embedding_codec.encode(vector, normalized=True) for vector in vectors]
+
+
+def run_configuration(population: SyntheticPopulation, frames: int, aggregation: str, reduction: str, args) -> dict:
+    users = len(population.identities)
+
+    # Enroll every user, the gate may reject inconsistent bursts
+    enrolled: dict[int, bytes] = {}
+    for user_id in range(users):
+        captures = encode(population.capture(np.full(frames, user_id)))
+        try:
+            enrolled[user_id] = aggregate_facial_embeddings(
+                captures, aggregation=aggregation, max_templates=frames, threshold=args.threshold
+            )
+        except ValueError:
+            pass
+
+    user_ids = np.fromiter(enrolled, dtype=int)
+    templates = [enrolled[user_id] for user_id in user_ids]
+
+    # Every login attempt, genuine: (user, login, attempt)
+    attempts_per_user = args.logins * args.max_attempts
+    probe_owners = np.repeat(user_ids, attempts_per_user)
+    probes = encode(population.capture(probe_owners))
+    distances = embedding_codec.cosine_distances(probes, list(np.repeat(np.array(templates, dtype=object), attempts_per_user)), reduction)
+    accepted = (distances <= args.threshold).reshape(len(user_ids), args.logins, args.max_attempts)
+
+    succeeded = accepted.any(axis=2)
+    first_success = np.argmax(accepted, axis=2) + 1
+    attempts_made = np.where(succeeded, first_success, args.max_attempts)
+
+    # Impostors: captures of the next enrolled user against each template
+    impostor_owners = np.repeat(np.roll(user_ids, 1), args.impostors)
+    impostors = encode(population.capture(impostor_owners))
+    impostor_distances = embedding_codec.cosine_distances(impostors, list(np.repeat(np.array(templates, dtype=object), args.impostors)), reduction)
+
+    return {
+        "fte": 1.0 - len(user_ids) / users,
+        "frr_first": 1.0 - accepted[:, :, 0].mean(),
+        "attempts": first_success[succeeded].mean() if succeeded.any() else float("nan"),
+        "fail": 1.0 - succeeded.mean(),
+        "far": (impostor_distances <= args.threshold).mean(),
+        "images_per_user": frames + attempts_made.sum(axis=1).mean(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--logins", type=int, default=20, help="Logins per user")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Captures tried per login before giving up")
+    parser.add_argument("--impostors", type=int, default=20, help="Impostor captures per user")
+    parser.add_argument("--threshold", type=float, default=0.30, help="Cosine distance threshold (Facenet512's pre-tuned value)")
+    parser.add_argument("--identity-spread", type=float, default=0.7, help="Spread of identities around the common face")
+    parser.add_argument("--noise", type=float, default=0.4, help="Median capture noise, relative to an identity's norm")
+    parser.add_argument("--noise-spread", type=float, default=0.35, help="Lognormal sigma of the capture noise")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'configuration':<20} {'FTE':>6} {'FRR@1':>7} {'attempts':>9} {'fail':>7} {'FAR':>8} {'images/user':>12}")
+    baseline = None
+    for name, frames, aggregation, reduction in CONFIGURATIONS:
+        # Same population and capture noise for every configuration
+        population = SyntheticPopulation(args.users, args.identity_spread, args.noise, args.noise_spread, args.seed)
+        result = run_configuration(population, frames, aggregation, reduction, args)
+        baseline = baseline or result["images_per_user"]
+        print(
+            f"{name:<20} {result['fte']:>6.2%} {result['frr_first']:>7.2%} {result['attempts']:>9.3f} "
+            f"{result['fail']:>7.2%} {result['far']:>8.4%} {result['images_per_user']:>7.1f} ({result['images_per_user'] / baseline:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Latency and detection rate of the face detector backends on local fixtures.
+
+Runs detect_face, the detection and preprocessing stage of embedding
+generation, on every image of a fixture directory holding one face per image,
+for each detector backend and detection size. Reports the share of images
+where exactly one face was found, and the mean and p95 latency per image.
+Everything runs on the CPU; the first image of each configuration is
+detected once beforehand so model loading isn't timed.
+
+Usage (from the backend directory):
+    python -m benchmarks.face_detection FIXTURES_DIR [--backends opencv ssd yunet] [--max-sides 0 640 320]
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+# Keep TensorFlow-based detectors off any GPU, before TensorFlow gets imported
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+from api.utils.deepface_utils import detect_face
+from api.utils.image_utils import DecodedImage
+
+TARGET_SIZE = (160, 160)
+
+def load_fixtures(directory: str) -> list[tuple[str, bytes]]:
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
+            with open(os.path.join(directory, name), "rb") as file:
+                fixtures.append((name, file.read()))
+    return fixtures
+
+
+def run(fixtures: list[tuple[str, bytes]], backend: str, align: bool, max_side: int) -> tuple[float, np.ndarray]:
+    def detect(data: bytes) -> bool:
+        try:
+            detect_face(DecodedImage(data), TARGET_SIZE, detector_backend=backend, align=align, max_side=max_side)
+            return True
+        except ValueError:
+            return False
+
+    # Load the detector before timing
+    detect(fixtures[0][1])
+
+    detected, latencies = 0, []
+    for _, data in fixtures:
+        started_at = time.perf_counter()
+        detected += detect(data)
+        latencies.append(time.perf_counter() - started_at)
+    return detected / len(fixtures), np.asarray(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", help="Directory of images holding one face each")
+    parser.add_argument("--backends", nargs="+", default=["opencv", "ssd", "yunet", "mediapipe"])
+    parser.add_argument("--max-sides", type=int, nargs="+", default=[0, 640, 320], help="Detection sizes, 0 for full resolution")
+    parser.add_argument("--no-align", action="store_true", help="Skip face alignment")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"No images found in {args.fixtures}")
+    print(f"{len(fixtures)} fixtures, align={not args.no_align}")
+
+    for backend in args.backends:
+        for max_side in args.max_sides:
+            label = f"{backend:>10} max_side={max_side or 'full':>4}"
+            try:
+                rate, latencies = run(fixtures, backend, not args.no_align, max_side)
+            except Exception as e:
+                # Backends with optional dependencies that aren't installed
+                print(f"{label}: unavailable ({type(e).__name__}: {e})")
+                break
+            print(f"{label}: detected {rate:.1%}, {latencies.mean():.1f} ms mean, {np.percentile(latencies, 95):.1f} ms p95")
+
+
+if __name__ == "__main__":
+    main()
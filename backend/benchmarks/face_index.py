@@ -0,0 +1,79 @@
+"""
+Recall and latency benchmark of the approximate face index against exact search.
+
+Builds a synthetic gallery of random 512-d embeddings, and queries made of an
+enrolled embedding plus noise, which mimics a new photo of an enrolled user.
+Each IVF operating point (n_lists, n_probes) is compared with ExactFaceIndex
+on recall@1 (same best candidate as exact search) and per-query latency.
+
+Usage (from the backend directory):
+    python -m benchmarks.face_index [--size 200000] [--queries 500] [--lists 1024] [--probes 1 4 16 64]
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from api.indexes import ExactFaceIndex, IVFFaceIndex
+
+def make_gallery(size: int, dimension: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((size, dimension), dtype=np.float32)
+
+
+def make_queries(gallery: np.ndarray, count: int, noise: float, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    targets = gallery[rng.choice(len(gallery), count, replace=False)]
+    return targets + noise * rng.standard_normal(targets.shape, dtype=np.float32)
+
+
+def run_queries(index, queries: np.ndarray) -> tuple[list[int], float]:
+    best, started_at = [], time.perf_counter()
+    for query in queries:
+        best.append(index.search(query.tobytes(), k=1)[0][0])
+    return best, (time.perf_counter() - started_at) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.6, help="Query noise relative to unit-variance embeddings")
+    parser.add_argument("--lists", type=int, default=1024)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    gallery = make_gallery(args.size, 512)
+    queries = make_queries(gallery, args.queries, args.noise)
+    profiles = [(user_id, vector.tobytes()) for user_id, vector in enumerate(gallery)]
+
+    exact = ExactFaceIndex()
+    started_at = time.perf_counter()
+    exact.load(profiles)
+    print(f"exact: built in {time.perf_counter() - started_at:.2f} s")
+    expected, exact_ms = run_queries(exact, queries)
+    print(f"exact: {exact_ms:.3f} ms/query")
+
+    ivf = IVFFaceIndex(n_lists=args.lists)
+    started_at = time.perf_counter()
+    ivf.load(profiles)
+    print(f"ivf: trained and built in {time.perf_counter() - started_at:.2f} s")
+
+    for n_probes in args.probes:
+        ivf.n_probes = n_probes
+        found, ivf_ms = run_queries(ivf, queries)
+        recall = np.mean(np.asarray(found) == np.asarray(expected))
+        print(f"ivf n_lists={args.lists} n_probes={n_probes:>3}: recall@1 {recall:.3f}, {ivf_ms:.3f} ms/query ({exact_ms / ivf_ms:.1f}x)")
+
+    # Persistence round trip through a memory-mapped copy
+    with tempfile.TemporaryDirectory() as directory:
+        ivf.save(directory)
+        mapped = IVFFaceIndex(n_probes=args.probes[-1])
+        started_at = time.perf_counter()
+        mapped.restore(directory, mmap=True)
+        print(f"ivf: memory-mapped restore in {(time.perf_counter() - started_at) * 1000:.1f} ms")
+        found, mapped_ms = run_queries(mapped, queries)
+        print(f"ivf mmap n_probes={args.probes[-1]}: recall@1 {np.mean(np.asarray(found) == np.asarray(expected)):.3f}, {mapped_ms:.3f} ms/query")
+        del mapped
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Per-request allocation benchmark for the uploaded image pipeline.
+
+Compares the previous flow, where validation and embedding generation each
+read and decoded the upload, with the DecodedImage flow that reads the upload
+once, parses the header for validation and decodes the pixels once.
+
+Both flows stop at the RGB array handed to DeepFace, so the model isn't needed.
+Peak allocations are measured with tracemalloc, which sees Python objects and
+NumPy buffers but not the decoders' internal scratch memory.
+
+Usage (from the backend directory):
+    python -m benchmarks.image_pipeline [--width 1280] [--height 960] [--format jpeg]
+"""
+import argparse
+import io
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from api.utils.image_utils import DecodedImage
+
+def make_upload(width: int, height: int, image_format: str) -> io.BytesIO:
+    """Build a synthetic upload with noisy pixels so it doesn't compress to nothing."""
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format.upper())
+    buffer.seek(0)
+    return buffer
+
+
+def legacy_pipeline(upload: io.BytesIO) -> np.ndarray:
+    # Validation: read everything and open the image
+    image_bytes = upload.read()
+    upload.seek(0)
+    image = Image.open(io.BytesIO(image_bytes))
+    image.size, image.format
+
+    # Embedding: read again, reopen, convert and copy into an array
+    image_data = upload.read()
+    upload.seek(0)
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.array(image)
+
+
+def decoded_image_pipeline(upload: io.BytesIO) -> np.ndarray:
+    # Validation: read once and parse the header
+    image = DecodedImage(upload.read())
+    upload.seek(0)
+    image.size, image.format
+
+    # Embedding: decode the pixels once
+    return image.array
+
+
+def measure(pipeline, upload: io.BytesIO, repeat: int) -> dict:
+    # Warm up Pillow plugins and NumPy before measuring
+    pipeline(upload)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    result = pipeline(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        pipeline(upload)
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "peak_bytes": peak - baseline,
+        "ms_per_request": elapsed / repeat * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--format", default="jpeg", choices=["jpeg", "png", "webp"])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    upload = make_upload(args.width, args.height, args.format)
+    print(f"Upload: {args.width}x{args.height} {args.format}, {len(upload.getvalue())} bytes")
+
+    for name, pipeline in [("legacy", legacy_pipeline), ("decoded_image", decoded_image_pipeline)]:
+        stats = measure(pipeline, upload, args.repeat)
+        print(f"{name:>14}: {stats['peak_bytes'] / 1024:>10.1f} KiB allocated, {stats['ms_per_request']:.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
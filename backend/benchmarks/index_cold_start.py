@@ -0,0 +1,102 @@
+"""
+Cold start benchmark of the face index: database table scan against the embedding snapshot.
+
+Fills a temporary SQLite database with synthetic biometric profiles, writes
+the matching embedding snapshot, then times filling a fresh face index:
+
+- scan: read every profile and decode, normalize and quantize each embedding
+- snapshot: memory-map the snapshot and copy its rows into the index, plus
+  the aggregate query checking it against the database
+
+Both are timed with a warm page cache, as after a restart of the API.
+
+Usage (from the backend directory):
+    python -m benchmarks.index_cold_start [--size 100000] [--dtype float32 int8]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from sqlmodel import Session, SQLModel, create_engine, select, func
+from api.indexes import EmbeddingSnapshot, ExactFaceIndex
+from api.models import BiometricProfile, User
+from api.utils.embedding_codec import embedding_codec
+
+def fill_database(engine, size: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for start in range(0, size, 10_000):
+            count = min(10_000, size - start)
+            users = [User(email=f"user{start + i}@example.com", password="unused") for i in range(count)]
+            session.add_all(users)
+            session.flush()
+            vectors = rng.standard_normal((count, 512), dtype=np.float32)
+            session.add_all([
+                BiometricProfile(user_id=user.id, facial_embedding=embedding_codec.encode(vector))
+                for user, vector in zip(users, vectors)
+            ])
+            session.commit()
+
+
+def time_scan(engine, dtype: str) -> tuple[float, int]:
+    index = ExactFaceIndex(dtype=dtype)
+    started_at = time.perf_counter()
+    with Session(engine) as session:
+        index.load(session.exec(select(BiometricProfile.user_id, BiometricProfile.facial_embedding)))
+    return time.perf_counter() - started_at, len(index)
+
+
+def write_snapshot(engine, snapshot: EmbeddingSnapshot, dtype: str) -> None:
+    index = ExactFaceIndex(dtype=dtype)
+    with Session(engine) as session:
+        profiles = session.exec(select(BiometricProfile.id, BiometricProfile.user_id, BiometricProfile.facial_embedding)).all()
+    prepared = [index.prepare(facial_embedding) for _, _, facial_embedding in profiles]
+    snapshot.write(
+        np.array([profile_id for profile_id, _, _ in profiles]),
+        np.array([user_id for _, user_id, _ in profiles]),
+        np.stack([row for row, _ in prepared]),
+        np.array([scale for _, scale in prepared], dtype=np.float32)
+    )
+
+
+def time_snapshot(engine, snapshot: EmbeddingSnapshot, dtype: str) -> tuple[float, int]:
+    index = ExactFaceIndex(dtype=dtype)
+    started_at = time.perf_counter()
+    content = snapshot.read()
+    index.load_rows(content.user_ids, content.rows, content.scales)
+    with Session(engine) as session:
+        session.exec(select(func.count(), func.sum(BiometricProfile.id), func.sum(BiometricProfile.user_id))).one()
+    return time.perf_counter() - started_at, len(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dtype", nargs="+", default=["float32", "int8"], choices=["float32", "float16", "int8"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'profiles.db')}")
+        fill_database(engine, args.size)
+
+        for dtype in args.dtype:
+            snapshot = EmbeddingSnapshot(os.path.join(directory, f"{dtype}.snap"), dtype=dtype)
+            write_snapshot(engine, snapshot, dtype)
+
+            # First runs warm the page cache
+            time_scan(engine, dtype)
+            time_snapshot(engine, snapshot, dtype)
+
+            scan_seconds, scanned = time_scan(engine, dtype)
+            snapshot_seconds, loaded = time_snapshot(engine, snapshot, dtype)
+            assert scanned == loaded == args.size
+            print(
+                f"{dtype}: scan {scan_seconds * 1000:.0f} ms, snapshot {snapshot_seconds * 1000:.0f} ms "
+                f"({scan_seconds / snapshot_seconds:.0f}x), {os.path.getsize(snapshot.path) / 2**20:.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
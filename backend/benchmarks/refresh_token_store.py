@@ -0,0 +1,109 @@
+"""
+Latency and memory benchmark of the refresh token store at scale.
+
+Fills a RefreshTokenStore with --size used refresh tokens whose expiries are
+spread over the refresh token lifetime, as with that many outstanding
+sessions rotating, then times:
+
+- use: exchanging a new refresh token (the /auth/refresh fast path)
+- reuse: presenting a token already used
+- family: checking the family of a token
+
+in memory, and with the SQLite store (prefilled with --sqlite-size rows).
+Memory is the growth of the process RSS while filling the in-memory store.
+
+Usage (from the backend directory):
+    python -m benchmarks.refresh_token_store [--size 2000000] [--sqlite-size 200000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+import numpy as np
+from api.utils.metrics import resident_memory_bytes
+from api.utils.refresh_token_store import RefreshTokenStore
+
+LIFETIME_SECONDS = 30 * 60
+
+def fill(store: RefreshTokenStore, jtis: list[str], expiries: np.ndarray) -> None:
+    for jti, expires_at in zip(jtis, expiries.tolist()):
+        store.use(jti, expires_at)
+
+
+def percentiles_us(samples: list[float]) -> str:
+    p50, p99 = np.percentile(np.array(samples) * 1e6, [50, 99])
+    return f"p50 {p50:.1f} us, p99 {p99:.1f} us"
+
+
+def time_operations(store: RefreshTokenStore, used: list[str], expiries: np.ndarray, operations: int) -> None:
+    rng = np.random.default_rng(1)
+    now = time.time() + 300
+    new_jtis = [str(uuid.uuid4()) for _ in range(operations)]
+    new_expiries = now + rng.uniform(0, LIFETIME_SECONDS, operations)
+    reused = rng.choice(len(used), operations)
+    families = [str(uuid.uuid4()) for _ in range(operations)]
+
+    samples = {"use": [], "reuse": [], "family": []}
+    for i in range(operations):
+        started_at = time.perf_counter()
+        store.use(new_jtis[i], new_expiries[i])
+        samples["use"].append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        assert not store.use(used[reused[i]], expiries[reused[i]])
+        samples["reuse"].append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        store.is_family_revoked(families[i])
+        samples["family"].append(time.perf_counter() - started_at)
+
+    for name, values in samples.items():
+        print(f"  {name:<7} {percentiles_us(values)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2_000_000, help="Used tokens held in memory")
+    parser.add_argument("--sqlite-size", type=int, default=200_000, help="Used tokens prefilled in the SQLite store")
+    parser.add_argument("--operations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Expiries start a few minutes ahead so none expires during the run
+    now = time.time() + 300
+
+    jtis = [str(uuid.uuid4()) for _ in range(args.size)]
+    expiries = now + rng.uniform(0, LIFETIME_SECONDS, args.size)
+    store = RefreshTokenStore()
+    rss_before = resident_memory_bytes()
+    started_at = time.perf_counter()
+    fill(store, jtis, expiries)
+    fill_seconds = time.perf_counter() - started_at
+    rss_after = resident_memory_bytes()
+    memory = f", {(rss_after - rss_before) / len(store):.0f} bytes/token" if rss_before and rss_after else ""
+    print(f"memory: {len(store):,} tokens filled in {fill_seconds:.1f}s{memory}")
+    time_operations(store, jtis, expiries, args.operations)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "refresh_tokens.db")
+        store = RefreshTokenStore(path=path)
+        store.load()
+        sqlite_jtis, sqlite_expiries = jtis[:args.sqlite_size], expiries[:args.sqlite_size]
+        store._connect().executemany(
+            "INSERT INTO used_refresh_tokens (jti, expires_at) VALUES (?, ?)",
+            zip(sqlite_jtis, sqlite_expiries.tolist())
+        )
+        store.close()
+
+        # Reloaded like at startup
+        store = RefreshTokenStore(path=path)
+        started_at = time.perf_counter()
+        store.load()
+        print(f"sqlite: {len(store):,} tokens loaded in {time.perf_counter() - started_at:.2f}s")
+        time_operations(store, sqlite_jtis, sqlite_expiries, args.operations)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Throughput benchmark of JWT issuance and verification, per algorithm.
+
+For each algorithm, compares on one core:
+
+- issuing an access/refresh pair with authx (create_access_token then
+  create_refresh_token, the PEM key parsed by PyJWT on every call) against
+  TokenService.issue_pair
+- verifying an access token with authx configured with the PEM public key
+  against authx configured by TokenService.configure with the prepared key
+
+Keys are generated for the run: a random secret for HS256, P-256 for
+ES256, Ed25519 for EdDSA and RSA-2048 for RS256.
+
+Usage (from the backend directory):
+    python -m benchmarks.token_issuance [--seconds 2] [--algorithms HS256 ES256 EdDSA RS256]
+"""
+import argparse
+import secrets
+import time
+from datetime import timedelta
+from authx import AuthX, AuthXConfig, RequestToken
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from api.utils.token_service import TokenService
+
+ACCESS_EXPIRES = timedelta(minutes=15)
+REFRESH_EXPIRES = timedelta(minutes=30)
+
+def generate_private_key(algorithm: str):
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return None
+
+
+def make_authx(algorithm: str, secret_key: str, private_pem: str, public_pem: str) -> AuthX:
+    config = AuthXConfig(
+        JWT_SECRET_KEY=secret_key,
+        JWT_TOKEN_LOCATION=["headers", "cookies"],
+        JWT_ACCESS_TOKEN_EXPIRES=ACCESS_EXPIRES,
+        JWT_REFRESH_TOKEN_EXPIRES=REFRESH_EXPIRES
+    )
+    # Assigned like TokenService.configure does, as AuthXConfig doesn't list EdDSA
+    config.JWT_ALGORITHM = algorithm
+    config.JWT_PRIVATE_KEY = private_pem
+    config.JWT_PUBLIC_KEY = public_pem
+    return AuthX(config=config)
+
+
+def rate(fn, seconds: float) -> float:
+    """Calls per second of fn, measured for about the given duration."""
+    calls, started_at = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - started_at) < seconds:
+        for _ in range(50):
+            fn()
+        calls += 50
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Measuring time per case")
+    parser.add_argument("--algorithms", nargs="+", default=["HS256", "ES256", "EdDSA", "RS256"])
+    args = parser.parse_args()
+
+    print(f"{'algorithm':<10} {'authx pairs/s':>14} {'service pairs/s':>16} {'speedup':>8} {'authx verify/s':>15} {'cached verify/s':>16} {'speedup':>8}")
+    for algorithm in args.algorithms:
+        secret_key = secrets.token_hex(32)
+        private_key = generate_private_key(algorithm)
+        private_pem = public_pem = None
+        if private_key is not None:
+            private_pem = private_key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            ).decode()
+            public_pem = private_key.public_key().public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode()
+
+        authx = make_authx(algorithm, secret_key, private_pem, public_pem)
+        service = TokenService(
+            algorithm,
+            ACCESS_EXPIRES,
+            REFRESH_EXPIRES,
+            secret_key=secret_key,
+            private_key_pem=private_pem and private_pem.encode()
+        )
+        configured_authx = make_authx(algorithm, secret_key, private_pem, public_pem)
+        service.configure(configured_authx.config)
+
+        def authx_pair():
+            authx.create_access_token(uid="42", expiry=ACCESS_EXPIRES)
+            authx.create_refresh_token(uid="42", expiry=REFRESH_EXPIRES)
+
+        authx_issue = rate(authx_pair, args.seconds)
+        service_issue = rate(lambda: service.issue_pair("42"), args.seconds)
+
+        token = RequestToken(token=service.issue_access_token("42"), location="headers", type="access")
+        authx_verify = rate(lambda: authx.verify_token(token), args.seconds)
+        cached_verify = rate(lambda: configured_authx.verify_token(token), args.seconds)
+
+        print(
+            f"{algorithm:<10} {authx_issue:>14,.0f} {service_issue:>16,.0f} {service_issue / authx_issue:>7.1f}x "
+            f"{authx_verify:>15,.0f} {cached_verify:>16,.0f} {cached_verify / authx_verify:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
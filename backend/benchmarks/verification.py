@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of the 1:1 face verification path.
+
+Compares, per call, the previous verification (both raw float32 blobs parsed,
+DeepFace's cosine distance recomputing both norms, and the threshold looked
+up on every call) with verify_facial_embeddings on embeddings normalized at
+enrollment, for each storage dtype.
+
+Usage (from the backend directory):
+    python -m benchmarks.verification [--calls 100000]
+"""
+import argparse
+import time
+import numpy as np
+from deepface.modules.verification import find_cosine_distance, find_threshold
+from api.constants import DEFAULT_MODEL_NAME
+from api.utils.deepface_utils import verify_facial_embeddings
+from api.utils.embedding_codec import EmbeddingCodec
+
+def legacy_verify(embedding1: bytes, embedding2: bytes) -> bool:
+    distance = find_cosine_distance(np.frombuffer(embedding1, dtype=np.float32), np.frombuffer(embedding2, dtype=np.float32))
+    return distance <= find_threshold(DEFAULT_MODEL_NAME, "cosine")
+
+
+def time_calls(fn, embedding1: bytes, embedding2: bytes, calls: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        fn(embedding1, embedding2)
+    return (time.perf_counter() - started_at) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vector1 = rng.standard_normal(512, dtype=np.float32)
+    vector2 = vector1 + 0.3 * rng.standard_normal(512, dtype=np.float32)
+
+    legacy_us = time_calls(legacy_verify, vector1.tobytes(), vector2.tobytes(), args.calls)
+    print(f"legacy float32: {legacy_us:.2f} us/verify")
+
+    for dtype in ('float32', 'float16', 'int8'):
+        codec = EmbeddingCodec(dtype=dtype)
+        embedding1 = codec.encode(vector1 / np.linalg.norm(vector1), normalized=True)
+        embedding2 = codec.encode(vector2 / np.linalg.norm(vector2), normalized=True)
+        verify_us = time_calls(verify_facial_embeddings, embedding1, embedding2, args.calls)
+        print(f"normalized {dtype}: {verify_us:.2f} us/verify ({legacy_us / verify_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import io
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from api.config import settings
+from api.database import get_async_session
+from api.main import app
+from api.models import User
+from api.utils.verification_threshold import verification_threshold
+
+API_KEY = "kiosk-key"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A client on a database holding one user without a biometric profile."""
+    url = f"sqlite:///{tmp_path / 'batch.db'}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(email="bob@example.com", password="hash"))
+        session.commit()
+    engine.dispose()
+
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+
+    async def get_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    monkeypatch.setattr(settings, "batch_verification_api_keys", [API_KEY])
+    # Resolved as if configured, the model default would import DeepFace
+    monkeypatch.setattr(verification_threshold, "_value", 0.3)
+    app.dependency_overrides[get_async_session] = get_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def _image() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (160, 160), "gray").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _verify(client: TestClient, headers: dict = None, issue_tokens: bool = False):
+    return client.post(
+        "/auth/verify/batch",
+        data={"subjects": ["bob@example.com", "carol@example.com"], "issue_tokens": str(issue_tokens).lower()},
+        files=[("images", ("a.jpg", _image(), "image/jpeg")), ("images", ("b.jpg", _image(), "image/jpeg"))],
+        headers=headers or {}
+    )
+
+
+def test_untrusted_callers_only_get_pass_or_fail(client):
+    response = _verify(client)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["threshold"] is None
+    # An existing user without a face and an unknown email look the same
+    for result in body["results"]:
+        assert result["match"] is False
+        assert result["user_id"] is None
+        assert result["distance"] is None
+        assert result["error"] == "Facial authentication failed"
+
+
+def test_untrusted_callers_cannot_get_tokens(client):
+    assert _verify(client, issue_tokens=True).status_code == 401
+
+
+def test_trusted_callers_get_details(client):
+    response = _verify(client, headers={"X-API-Key": API_KEY})
+
+    assert response.status_code == 200
+    bob, carol = response.json()["results"]
+    assert bob["user_id"] is not None
+    assert bob["error"] == "No biometric profile found for this user"
+    assert carol["error"] == "User not found"
+
+
+def test_wrong_api_key_is_rejected(client):
+    assert _verify(client, headers={"X-API-Key": "wrong"}).status_code == 401
@@ -0,0 +1,14 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from api.database import get_async_database_url, _pool_options
+
+@pytest.mark.parametrize("database_url", ["sqlite://", "sqlite:///:memory:", "sqlite:////tmp/biometrics_auth.db"])
+def test_async_engine_accepts_pool_options(database_url):
+    engine = create_async_engine(get_async_database_url(database_url), **_pool_options(database_url))
+
+    assert engine.url.drivername == "sqlite+aiosqlite"
+
+
+def test_backend_without_async_driver_is_rejected():
+    with pytest.raises(ValueError):
+        get_async_database_url("postgresql://user@localhost/app")
@@ -0,0 +1,92 @@
+import numpy as np
+from api.indexes import EmbeddingSnapshot
+
+DIMENSION = 8
+
+def _rows(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+
+def _append(snapshot: EmbeddingSnapshot, sequences: list[int], user_ids: list[int], rows: np.ndarray) -> None:
+    snapshot.append(
+        np.array(sequences, dtype=np.int64),
+        np.array(user_ids, dtype=np.int64),
+        rows,
+        np.ones(len(user_ids), dtype=np.float32)
+    )
+
+
+def test_latest_record_of_each_user_wins(tmp_path):
+    snapshot = EmbeddingSnapshot(str(tmp_path / "faces.fsnp"), dimension=DIMENSION)
+    rows = _rows(4)
+    _append(snapshot, [1, 2, 3], [10, 20, 30], rows[:3])
+    _append(snapshot, [4], [20], rows[3:])
+    snapshot.append_removals(np.array([30], dtype=np.int64))
+
+    content = snapshot.read()
+
+    assert content.user_ids.tolist() == [10, 20]
+    assert content.sequences.tolist() == [1, 4]
+    np.testing.assert_array_equal(content.rows, rows[[0, 3]])
+    assert content.sequence == 4
+    assert content.dead_records == 3
+
+
+def test_append_drops_a_torn_record(tmp_path):
+    path = tmp_path / "faces.fsnp"
+    snapshot = EmbeddingSnapshot(str(path), dimension=DIMENSION)
+    rows = _rows(2)
+    _append(snapshot, [1], [10], rows[:1])
+
+    # A crash while appending leaves part of a record behind
+    with open(path, "ab") as file:
+        file.write(b"\xff" * (snapshot.record_dtype.itemsize // 2))
+    assert snapshot.read().user_ids.tolist() == [10]
+
+    _append(snapshot, [2], [20], rows[1:])
+
+    content = snapshot.read()
+    assert content.user_ids.tolist() == [10, 20]
+    np.testing.assert_array_equal(content.rows, rows)
+    assert path.stat().st_size == EmbeddingSnapshot.HEADER_SIZE + 2 * snapshot.record_dtype.itemsize
+
+
+def test_compact_keeps_latest_rows_and_later_appends(tmp_path):
+    path = tmp_path / "faces.fsnp"
+    snapshot = EmbeddingSnapshot(str(path), dimension=DIMENSION)
+    rows = _rows(4)
+    _append(snapshot, [1, 2], [10, 20], rows[:2])
+    _append(snapshot, [3], [10], rows[2:3])
+
+    snapshot.compact()
+    assert snapshot.read().dead_records == 0
+
+    _append(snapshot, [4], [30], rows[3:])
+
+    content = snapshot.read()
+    assert content.user_ids.tolist() == [20, 10, 30]
+    np.testing.assert_array_equal(content.rows, rows[[1, 2, 3]])
+    assert path.stat().st_size == EmbeddingSnapshot.HEADER_SIZE + 3 * snapshot.record_dtype.itemsize
+
+
+def test_read_since_follows_appends_until_the_file_is_replaced(tmp_path):
+    snapshot = EmbeddingSnapshot(str(tmp_path / "faces.fsnp"), dimension=DIMENSION)
+    rows = _rows(3)
+    _append(snapshot, [1], [10], rows[:1])
+    position = snapshot.read(follow=True).position
+
+    try:
+        records, position = snapshot.read_since(position)
+        assert len(records) == 0
+
+        _append(snapshot, [2], [20], rows[1:2])
+        snapshot.append_removals(np.array([10], dtype=np.int64))
+        records, position = snapshot.read_since(position)
+        assert records["user_id"].tolist() == [20, 10]
+        assert records["flags"].tolist() == [EmbeddingSnapshot.ADDED, EmbeddingSnapshot.REMOVED]
+        np.testing.assert_array_equal(records["vector"][0], rows[1])
+
+        snapshot.compact()
+        assert snapshot.read_since(position) is None
+    finally:
+        position.file.close()
@@ -0,0 +1,42 @@
+import numpy as np
+from api.indexes import ExactFaceIndex, FaceIndex, FaceMatch
+from api.utils.embedding_codec import embedding_codec
+
+DIMENSION = 8
+THRESHOLD = 0.3
+
+def _embedding(vector: list[float]) -> bytes:
+    return embedding_codec.encode(np.array(vector, dtype=np.float32))
+
+
+def _index(*vectors: list[float]) -> ExactFaceIndex:
+    index = ExactFaceIndex(dimension=DIMENSION)
+    for user_id, vector in enumerate(vectors, start=1):
+        index.add(user_id, _embedding(vector))
+    return index
+
+
+def test_single_close_face_is_identified():
+    index = _index([1, 0, 0, 0, 0, 0, 0, 0], [0, 1, 0, 0, 0, 0, 0, 0])
+
+    match = index.identify(_embedding([1, 0.1, 0, 0, 0, 0, 0, 0]), THRESHOLD, 0.05)
+
+    assert match is not None and match.user_id == 1
+
+
+def test_runner_up_within_threshold_is_ambiguous():
+    # Two enrolled faces close enough to the query, whatever the margin between them
+    index = _index([1, 0, 0, 0, 0, 0, 0, 0], [1, 0.6, 0, 0, 0, 0, 0, 0])
+
+    match = index.closest(_embedding([1, 0, 0, 0, 0, 0, 0, 0]))
+
+    assert match is not None and match.user_id == 1 and match.distance + match.margin < THRESHOLD
+    assert index.identify(_embedding([1, 0, 0, 0, 0, 0, 0, 0]), THRESHOLD, 0.0) is None
+
+
+def test_margin_below_minimum_is_rejected():
+    close_call = FaceMatch(user_id=1, distance=0.28, margin=0.03)
+
+    assert not FaceIndex.accepts(close_call, THRESHOLD, 0.05)
+    assert FaceIndex.accepts(close_call, THRESHOLD, 0.0)
+    assert not FaceIndex.accepts(None, THRESHOLD)
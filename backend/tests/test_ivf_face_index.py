@@ -0,0 +1,38 @@
+import threading
+import numpy as np
+from api.indexes import IVFFaceIndex
+
+DIMENSION = 8
+
+def _index(count: int, seed: int = 0) -> IVFFaceIndex:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = IVFFaceIndex(dimension=DIMENSION, n_lists=4, min_list_size=1)
+    index.load_rows(np.arange(1, count + 1, dtype=np.int64), vectors, np.ones(count, dtype=np.float32))
+    return index
+
+
+def test_restore_returns_the_time_saved_as_of(tmp_path):
+    _index(50).save(str(tmp_path), as_of=1234.5)
+
+    restored = IVFFaceIndex(dimension=DIMENSION)
+    as_of = restored.restore(str(tmp_path))
+
+    assert as_of == 1234.5
+    assert restored.user_ids() == set(range(1, 51))
+
+
+def test_concurrent_saves_leave_one_complete_copy(tmp_path):
+    indexes = [_index(40 + 10 * seed, seed) for seed in range(4)]
+    threads = [threading.Thread(target=index.save, args=(str(tmp_path), float(seed))) for seed, index in enumerate(indexes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    restored = IVFFaceIndex(dimension=DIMENSION)
+    as_of = restored.restore(str(tmp_path))
+
+    # Every file comes from the same save
+    assert restored.user_ids() == indexes[int(as_of)].user_ids()
+    assert not list(tmp_path.glob("*.tmp.npy"))
@@ -0,0 +1,60 @@
+import asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from api.models import User, BiometricProfile
+from api.services.AuthService import AuthService
+
+def _create_database(path) -> str:
+    """Create the tables in a SQLite file with one enrolled user, returning its URL."""
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email="alice@example.com", password="hash")
+        session.add(user)
+        session.flush()
+        session.add(BiometricProfile(user_id=user.id, facial_embedding=b"embedding"))
+        session.commit()
+    engine.dispose()
+    return url
+
+
+def _get_login_credentials(url: str, email: str) -> tuple[object, list[str]]:
+    """Run the login credentials lookup, returning its result and the statements it issued."""
+    statements = []
+
+    async def run():
+        engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+        event.listen(
+            engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement)
+        )
+        try:
+            async with AsyncSession(engine) as session:
+                return await AuthService(session, authx=None)._get_login_credentials(email)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run()), statements
+
+
+def test_login_credentials_use_one_statement(tmp_path):
+    url = _create_database(tmp_path / "login.db")
+
+    credentials, statements = _get_login_credentials(url, "alice@example.com")
+
+    assert len(statements) == 1
+    assert credentials.password == "hash"
+    assert credentials.facial_embedding == b"embedding"
+
+
+def test_unknown_email_uses_one_statement(tmp_path):
+    url = _create_database(tmp_path / "login.db")
+
+    credentials, statements = _get_login_credentials(url, "bob@example.com")
+
+    assert len(statements) == 1
+    assert credentials is None
@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from api.utils.metrics import MetricsRegistry, stage_duration
+from api.utils.password_hasher import password_hasher
+
+def test_counters_render_with_counter_type():
+    registry = MetricsRegistry()
+    registry.counter("cache_hits_total", "Cache hits", lambda: 3)
+
+    assert registry.render().splitlines() == [
+        "# HELP cache_hits_total Cache hits",
+        "# TYPE cache_hits_total counter",
+        "cache_hits_total 3.0"
+    ]
+
+
+def test_counter_names_need_total_suffix():
+    with pytest.raises(ValueError):
+        MetricsRegistry().counter("cache_hits", "Cache hits", lambda: 3)
+
+
+def _argon2_count(outcome: str) -> int:
+    for labels, histogram in stage_duration.children():
+        if labels["stage"] == "argon2" and labels["outcome"] == outcome:
+            return histogram.snapshot()["count"]
+    return 0
+
+
+def test_wrong_password_is_recorded_as_mismatch():
+    password_hash = asyncio.run(password_hasher.hash("correct horse"))
+    mismatches, errors = _argon2_count("mismatch"), _argon2_count("error")
+
+    assert asyncio.run(password_hasher.verify(password_hash, "wrong")) is False
+    assert _argon2_count("mismatch") == mismatches + 1
+    assert _argon2_count("error") == errors
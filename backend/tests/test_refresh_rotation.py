@@ -0,0 +1,48 @@
+import asyncio
+import importlib
+import pytest
+from fastapi.testclient import TestClient
+from api.main import app
+from api.utils.refresh_token_store import RefreshTokenStore
+from api.utils.token_service import token_service
+
+# The package re-exports the class under the module's name
+auth_service_module = importlib.import_module("api.services.AuthService")
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A refresh token store backed by a SQLite file, recording whether it was used on the event loop."""
+    store = RefreshTokenStore(path=str(tmp_path / "refresh_tokens.db"))
+    store.calls_on_event_loop = 0
+    use = store.use
+
+    def recording_use(jti: str, expires_at: float) -> bool:
+        try:
+            asyncio.get_running_loop()
+            store.calls_on_event_loop += 1
+        except RuntimeError:
+            pass
+        return use(jti, expires_at)
+
+    monkeypatch.setattr(store, "use", recording_use)
+    monkeypatch.setattr(auth_service_module, "refresh_token_store", store)
+    yield store
+    store.close()
+
+
+def _refresh(client: TestClient, refresh_token: str):
+    return client.post("/auth/refresh", headers={"Authorization": f"Bearer {refresh_token}"})
+
+
+def test_reused_refresh_token_revokes_its_family(store):
+    client = TestClient(app)
+    _, refresh_token = token_service.issue_pair("1")
+
+    first = _refresh(client, refresh_token)
+    replayed = _refresh(client, refresh_token)
+    successor = _refresh(client, first.json()["refresh_token"])
+
+    assert first.status_code == 200
+    assert replayed.status_code == 401
+    assert successor.status_code == 401
+    assert store.calls_on_event_loop == 0
@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+from api import main
+from api.utils.verification_threshold import VerificationThreshold
+
+class UnreachablePool:
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    async def run(self, fn, *args):
+        raise ConnectionRefusedError("inference server is down")
+
+
+def test_remote_deployment_fails_startup_without_the_model_default(monkeypatch):
+    threshold = VerificationThreshold()
+    monkeypatch.setattr(main, "verification_threshold", threshold)
+    monkeypatch.setattr(main, "inference_pool", UnreachablePool("remote"))
+
+    with pytest.raises(RuntimeError, match="FACE_VERIFICATION_THRESHOLD"):
+        asyncio.run(main.resolve_verification_threshold())
+    assert threshold.source is None
+
+
+def test_configured_threshold_needs_no_inference_server(monkeypatch):
+    threshold = VerificationThreshold(override=0.35)
+    monkeypatch.setattr(main, "verification_threshold", threshold)
+    monkeypatch.setattr(main, "inference_pool", UnreachablePool("remote"))
+
+    asyncio.run(main.resolve_verification_threshold())
+
+    assert (threshold.value, threshold.source) == (0.35, 'override')